@@ -0,0 +1,417 @@
+"""
+Append-only audit log of user mutations with a batched asynchronous writer
+
+Repository mutators only append a compact event to an in-memory buffer.
+A background task writes the buffer in one transaction per batch to a sink
+that never touches the user databases: a separate SQLite file or
+append-only JSONL segment files. The buffer is bounded: when it is full a
+mutation waits up to ``block_seconds`` for the writer, and the event is
+dropped (and counted) if the writer still has not caught up.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Sequence
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Same operation names as the change feed
+AUDIT_ACTIONS = ("create", "update", "deactivate", "activate", "password_change", "delete")
+
+class AuditEvent:
+    """Who (actor_id) did what (action, changed field names) to which user, and when"""
+
+    __slots__ = ("at", "actor_id", "user_id", "action", "fields", "tenant")
+
+    def __init__(
+        self,
+        at: str,
+        actor_id: Optional[int],
+        user_id: int,
+        action: str,
+        fields: Optional[str] = None,
+        tenant: Optional[str] = None
+    ):
+        self.at = at
+        self.actor_id = actor_id
+        self.user_id = user_id
+        self.action = action
+        # Comma-separated names only: values may be personal data or secrets
+        self.fields = fields
+        self.tenant = tenant
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+def audit_timestamp(moment: Optional[datetime] = None) -> str:
+    """UTC ISO timestamp with microseconds: sorts as text in both sinks"""
+    return (moment or datetime.utcnow()).isoformat(timespec="microseconds")
+
+class SQLiteAuditSink:
+    """
+    Events in their own SQLite file, indexed by time
+
+    Writes use one long-lived connection (only the writer task uses it);
+    every query opens a short read connection, which WAL lets run
+    alongside a batch being written.
+    """
+
+    name = "sqlite"
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS audit_events ("
+        "id INTEGER PRIMARY KEY, at TEXT NOT NULL, actor_id INTEGER, user_id INTEGER NOT NULL, "
+        "action TEXT NOT NULL, fields TEXT, tenant TEXT)",
+        "CREATE INDEX IF NOT EXISTS ix_audit_events_at ON audit_events (at)",
+        "CREATE INDEX IF NOT EXISTS ix_audit_events_user_at ON audit_events (user_id, at)",
+        "CREATE INDEX IF NOT EXISTS ix_audit_events_actor_at ON audit_events (actor_id, at)",
+    )
+    INSERT = (
+        "INSERT INTO audit_events (at, actor_id, user_id, action, fields, tenant) "
+        "VALUES (?, ?, ?, ?, ?, ?)"
+    )
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def write(self, events: Sequence[AuditEvent]) -> None:
+        """All events in one transaction"""
+        conn = self._connection()
+        with conn:
+            conn.executemany(self.INSERT, [
+                (e.at, e.actor_id, e.user_id, e.action, e.fields, e.tenant) for e in events
+            ])
+
+    def query(
+        self,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        user_id: Optional[int] = None,
+        actor_id: Optional[int] = None,
+        action: Optional[str] = None,
+        tenant: Optional[str] = None,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """Events in [start, end), newest first"""
+        if not os.path.exists(self.path):
+            return []
+        criteria, params = [], []
+        for clause, value in (
+            ("at >= ?", start), ("at < ?", end), ("user_id = ?", user_id),
+            ("actor_id = ?", actor_id), ("action = ?", action), ("tenant = ?", tenant),
+        ):
+            if value is not None:
+                criteria.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(criteria)} " if criteria else ""
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            rows = conn.execute(
+                "SELECT at, actor_id, user_id, action, fields, tenant FROM audit_events "
+                f"{where}ORDER BY at DESC, id DESC LIMIT ?",
+                (*params, limit)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [AuditEvent(*row).as_dict() for row in rows]
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+class JsonlAuditSink:
+    """
+    Events as JSON lines in append-only segment files
+
+    A segment is named after the timestamp of its first event and a new one
+    starts once the current one reaches ``segment_bytes``. The sorted names
+    are the time index: a query only reads the segments whose range
+    [own start, next segment's start) overlaps the requested one.
+    """
+
+    name = "jsonl"
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024):
+        self.directory = os.path.abspath(directory)
+        self.segment_bytes = segment_bytes
+
+    @staticmethod
+    def _segment_name(at: str) -> str:
+        return f"audit-{at.replace(':', '-')}.jsonl"
+
+    @staticmethod
+    def _segment_start(name: str) -> str:
+        stamp = name[len("audit-"):-len(".jsonl")]
+        return stamp[:11] + stamp[11:].replace("-", ":")
+
+    def segments(self) -> List[str]:
+        """Segment file names, oldest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            name for name in os.listdir(self.directory)
+            if name.startswith("audit-") and name.endswith(".jsonl")
+        )
+
+    def write(self, events: Sequence[AuditEvent]) -> None:
+        """One append (and fsync) per batch"""
+        os.makedirs(self.directory, exist_ok=True)
+        segments = self.segments()
+        path = os.path.join(self.directory, segments[-1]) if segments else None
+        if path is None or os.path.getsize(path) >= self.segment_bytes:
+            path = os.path.join(self.directory, self._segment_name(events[0].at))
+        data = "".join(json.dumps(e.as_dict(), separators=(",", ":")) + "\n" for e in events)
+        with open(path, "a", encoding="utf-8") as segment:
+            segment.write(data)
+            segment.flush()
+            os.fsync(segment.fileno())
+
+    def query(
+        self,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        user_id: Optional[int] = None,
+        actor_id: Optional[int] = None,
+        action: Optional[str] = None,
+        tenant: Optional[str] = None,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """Events in [start, end), newest first"""
+        segments = self.segments()
+        starts = [self._segment_start(name) for name in segments]
+        wanted = {"user_id": user_id, "actor_id": actor_id, "action": action, "tenant": tenant}
+        wanted = {key: value for key, value in wanted.items() if value is not None}
+
+        found: List[Dict[str, Any]] = []
+        for index in range(len(segments) - 1, -1, -1):
+            if end is not None and starts[index] >= end:
+                continue
+            if start is not None and index + 1 < len(starts) and starts[index + 1] <= start:
+                break
+            with open(os.path.join(self.directory, segments[index]), encoding="utf-8") as segment:
+                lines = segment.readlines()
+            for line in reversed(lines):
+                event = json.loads(line)
+                if (start is not None and event["at"] < start) or (end is not None and event["at"] >= end):
+                    continue
+                if all(event[key] == value for key, value in wanted.items()):
+                    found.append(event)
+                    if len(found) >= limit:
+                        return found
+        return found
+
+    def close(self) -> None:
+        pass
+
+class AuditLog:
+    """
+    Bounded buffer of audit events plus the task that writes it
+
+    Events are written every ``flush_interval`` seconds, as soon as
+    ``batch_size`` are pending, and on shutdown. At most ``max_pending``
+    events wait in memory (plus the batch being written).
+    """
+
+    def __init__(
+        self,
+        sink,
+        max_pending: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        block_seconds: float = 0.5
+    ):
+        self.sink = sink
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_seconds = block_seconds
+        self._pending: Deque[AuditEvent] = deque()
+        self._oldest: Optional[float] = None
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.blocked = 0
+        self.errors = 0
+        self.last_flush_at: Optional[str] = None
+        self.last_flush_ms: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        """Events are only buffered while a writer drains them"""
+        return self._task is not None
+
+    async def record(
+        self,
+        action: str,
+        user_id: int,
+        actor_id: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+        tenant: Optional[str] = None
+    ) -> bool:
+        """
+        Buffer an event; False if it was not recorded
+
+        Only waits when the buffer is full (backpressure on the mutation
+        rather than unbounded memory).
+        """
+        if not self.running:
+            return False
+        if len(self._pending) >= self.max_pending and not await self._wait_for_room():
+            self.dropped += 1
+            logger.warning(f"Audit buffer full ({self.max_pending} events), {action} of user {user_id} dropped")
+            return False
+
+        self._pending.append(AuditEvent(
+            audit_timestamp(), actor_id, user_id, action,
+            ",".join(sorted(fields)) if fields else None, tenant
+        ))
+        self.recorded += 1
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    async def _wait_for_room(self) -> bool:
+        self.blocked += 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.block_seconds
+        while len(self._pending) >= self.max_pending:
+            remaining = deadline - loop.time()
+            if remaining <= 0 or not self.running:
+                return False
+            self._drained.clear()
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._drained.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        return True
+
+    async def flush(self) -> int:
+        """Write everything pending; returns the number of events written"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            events = list(self._pending)
+            self._pending.clear()
+            self._oldest = None
+            self._drained.set()
+
+            start = time.perf_counter()
+            try:
+                await asyncio.to_thread(self.sink.write, events)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Could not write {len(events)} audit events: {e}")
+                # Back in front of newer events, as far as the buffer allows
+                room = max(self.max_pending - len(self._pending), 0)
+                self.dropped += max(len(events) - room, 0)
+                if room:
+                    self._pending.extendleft(reversed(events[-room:]))
+                    self._oldest = time.monotonic()
+                return 0
+
+            self.batches += 1
+            self.written += len(events)
+            self.last_flush_ms = round((time.perf_counter() - start) * 1000, 2)
+            self.last_flush_at = datetime.utcnow().isoformat()
+            return len(events)
+
+    async def query(self, **filters) -> List[Dict[str, Any]]:
+        """Events matching the filters (see the sinks); pending events are written first"""
+        await self.flush()
+        return await asyncio.to_thread(self.sink.query, **filters)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(
+                f"Audit log writing to {self.sink.name} every {self.flush_interval}s "
+                f"or {self.batch_size} events"
+            )
+
+    async def stop(self) -> None:
+        """Stop the writer and write what is pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        await asyncio.to_thread(self.sink.close)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                # Shielded: stop() cancels this task, not a batch half-way through its write
+                await asyncio.shield(self.flush())
+            except Exception as e:
+                logger.error(f"Audit flush failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Summary for health endpoints, including the write lag"""
+        return {
+            "running": self.running,
+            "sink": self.sink.name,
+            "pending": len(self._pending),
+            "flush_lag_seconds": round(time.monotonic() - self._oldest, 3) if self._oldest else 0.0,
+            "recorded": self.recorded,
+            "written": self.written,
+            "batches": self.batches,
+            "blocked": self.blocked,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "last_flush_at": self.last_flush_at,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+def build_audit_log() -> AuditLog:
+    """Audit log with the sink selected by AUDIT_SINK"""
+    if settings.AUDIT_SINK == "jsonl":
+        sink = JsonlAuditSink(settings.AUDIT_JSONL_DIR, settings.AUDIT_SEGMENT_BYTES)
+    else:
+        sink = SQLiteAuditSink(settings.AUDIT_SQLITE_PATH)
+    return AuditLog(
+        sink,
+        max_pending=settings.AUDIT_MAX_PENDING,
+        batch_size=settings.AUDIT_BATCH_SIZE,
+        flush_interval=settings.AUDIT_FLUSH_SECONDS,
+        block_seconds=settings.AUDIT_BLOCK_SECONDS
+    )
+
+# Global audit log
+audit_log = build_audit_log()
@@ -0,0 +1,294 @@
+"""
+Avatar storage: streamed uploads, content-addressed files, thumbnails and range responses
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import anyio
+from starlette.responses import Response
+
+from app.core.config import settings
+from app.core.exceptions import PayloadTooLargeException, ValidationException
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Optional dependency: originals only, no thumbnails
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Accepted formats, detected from the first bytes (never from the client's Content-Type)
+SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+CONTENT_TYPES = {"png": "image/png", "jpg": "image/jpeg", "gif": "image/gif", "webp": "image/webp"}
+# Thumbnails keep photos as JPEG; everything else becomes PNG
+THUMBNAIL_FORMATS = {"jpg": ("JPEG", "jpg"), "webp": ("WEBP", "webp")}
+AVATAR_NAME = re.compile(r"^([0-9a-f]{64})\.(png|jpg|gif|webp)$")
+
+def detect_format(head: bytes) -> Optional[str]:
+    """Image extension from the leading bytes, or None when not supported"""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    for signature, ext in SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    return None
+
+def parse_range(value: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive (start, end) of a single ``bytes=`` range
+
+    Returns None for ranges this server ignores (other units, several
+    ranges), which are answered with the full body. Raises ValueError
+    when the range cannot be satisfied.
+    """
+    unit, _, spec = value.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise ValueError(value)
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        raise ValueError(value)
+    if start >= size or end < start:
+        raise ValueError(value)
+    return start, min(end, size - 1)
+
+class FileRangeResponse(Response):
+    """File response with a strong ETag, conditional GET and single byte ranges.
+
+    The body is read from disk in chunks as it is sent, so large files
+    never sit in memory; ``If-Range`` falls back to the full file when the
+    client's validator no longer matches.
+    """
+
+    chunk_size = settings.AVATAR_CHUNK_SIZE
+
+    def __init__(self, path: str, request_headers, etag: str, media_type: str,
+                 cache_control: str):
+        self.path = path
+        self.range: Optional[Tuple[int, int]] = None
+        self.file_size = os.stat(path).st_size
+        headers = {"etag": etag, "cache-control": cache_control, "accept-ranges": "bytes"}
+
+        if etag in _etags(request_headers.get("if-none-match", "")):
+            super().__init__(status_code=304, headers=headers)
+            self.send_file = False
+            return
+
+        status_code = 200
+        requested = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if requested and (if_range is None or if_range == etag):
+            try:
+                self.range = parse_range(requested, self.file_size)
+            except ValueError:
+                headers["content-range"] = f"bytes */{self.file_size}"
+                super().__init__(status_code=416, headers=headers)
+                self.send_file = False
+                return
+            if self.range is not None:
+                status_code = 206
+                headers["content-range"] = f"bytes {self.range[0]}-{self.range[1]}/{self.file_size}"
+
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        start, end = self.range or (0, self.file_size - 1)
+        self.headers["content-length"] = str(end - start + 1)
+        self.send_file = True
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.send_file or scope.get("method") == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+        start, end = self.range or (0, self.file_size - 1)
+        remaining = end - start + 1
+        async with await anyio.open_file(self.path, "rb") as f:
+            await f.seek(start)
+            while remaining > 0:
+                chunk = await f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # File shorter than announced (should not happen: files are immutable)
+            await send({"type": "http.response.body", "body": b""})
+
+def _etags(value: str) -> List[str]:
+    return [tag.strip() for tag in value.split(",") if tag.strip()]
+
+class AvatarStore:
+    """Content-addressed avatar files with square thumbnails.
+
+    Uploads are streamed to a temporary file while their SHA-256 is
+    computed; the file is then renamed to ``<sha256>.<ext>``, so the same
+    image uploaded twice is stored once and never changes afterwards
+    (safe to cache forever). Thumbnails are rendered in a dedicated
+    thread pool, off the event loop, when Pillow is installed.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, thumbnail_sizes: List[int],
+                 workers: int = 2):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.thumbnail_sizes = sorted(set(thumbnail_sizes)) if Image is not None else []
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.uploads = 0
+        self.deduplicated = 0
+        self.rejected = 0
+
+    async def save(self, chunks: AsyncIterator[bytes], declared_size: Optional[int] = None) -> str:
+        """Store a streamed upload and return its file name (``<sha256>.<ext>``)"""
+        if declared_size is not None and declared_size > self.max_bytes:
+            self.rejected += 1
+            raise self._too_large()
+
+        os.makedirs(self.directory, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        head = b""
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async for chunk in chunks:
+                    if not chunk:
+                        continue
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        self.rejected += 1
+                        raise self._too_large()
+                    if len(head) < 16:
+                        head += chunk[:16]
+                    digest.update(chunk)
+                    await asyncio.to_thread(f.write, chunk)
+
+            ext = detect_format(head)
+            if ext is None:
+                self.rejected += 1
+                raise ValidationException(
+                    "Formato de imagen no soportado",
+                    details={"allowed": sorted(CONTENT_TYPES)}
+                )
+
+            name = f"{digest.hexdigest()}.{ext}"
+            path = self.path_for(name)
+            if os.path.exists(path):
+                self.deduplicated += 1
+            else:
+                os.replace(temp_path, path)
+                temp_path = None
+                await self._render_thumbnails(name)
+            self.uploads += 1
+            return name
+        finally:
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def path_for(self, name: str, size: Optional[int] = None) -> str:
+        """Path of an avatar (or of one of its thumbnails)"""
+        if size is None:
+            return os.path.join(self.directory, name)
+        digest, ext = AVATAR_NAME.match(name).groups()
+        _, thumb_ext = THUMBNAIL_FORMATS.get(ext, ("PNG", "png"))
+        return os.path.join(self.directory, f"{digest}_{size}.{thumb_ext}")
+
+    def resolve(self, name: str, size: Optional[int] = None) -> Optional[Tuple[str, str, str]]:
+        """(path, etag, media type) of a stored avatar, or None when missing
+
+        Without that thumbnail (unknown size or no Pillow) the original is served.
+        """
+        match = AVATAR_NAME.match(name)
+        if match is None:
+            return None
+        digest, ext = match.groups()
+        if size is not None and size in self.thumbnail_sizes:
+            path = self.path_for(name, size)
+            if os.path.exists(path):
+                _, thumb_ext = THUMBNAIL_FORMATS.get(ext, ("PNG", "png"))
+                return path, f'"{digest}-{size}"', CONTENT_TYPES[thumb_ext]
+        path = self.path_for(name)
+        if not os.path.exists(path):
+            return None
+        return path, f'"{digest}"', CONTENT_TYPES[ext]
+
+    async def _render_thumbnails(self, name: str) -> None:
+        if not self.thumbnail_sizes:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="avatar-thumb")
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(self._executor, self._render_thumbnail, name, size)
+            for size in self.thumbnail_sizes
+        ), return_exceptions=True)
+        for size, result in zip(self.thumbnail_sizes, results):
+            if isinstance(result, Exception):
+                # The original is still served for that size
+                logger.warning(f"Thumbnail {size}px of {name} failed: {result}")
+
+    def _render_thumbnail(self, name: str, size: int) -> None:
+        digest, ext = AVATAR_NAME.match(name).groups()
+        image_format, _ = THUMBNAIL_FORMATS.get(ext, ("PNG", "png"))
+        target = self.path_for(name, size)
+        with Image.open(self.path_for(name)) as image:
+            image = ImageOps.exif_transpose(image)
+            if image_format == "JPEG":
+                image = image.convert("RGB")
+            thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+            temp_path = f"{target}.tmp"
+            thumbnail.save(temp_path, format=image_format)
+        os.replace(temp_path, target)
+
+    def _too_large(self) -> PayloadTooLargeException:
+        return PayloadTooLargeException(
+            f"El avatar supera el tamaño máximo de {self.max_bytes} bytes",
+            details={"max_bytes": self.max_bytes}
+        )
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "thumbnails_available": Image is not None,
+            "thumbnail_sizes": self.thumbnail_sizes,
+            "uploads": self.uploads,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+        }
+
+def avatar_url(name: str) -> str:
+    """Public URL of a stored avatar"""
+    return f"{settings.AVATAR_URL_PREFIX.rstrip('/')}/{name}"
+
+def thumbnail_sizes(value: str) -> List[int]:
+    return [int(size) for size in value.split(",") if size.strip()]
+
+# Global avatar store
+avatar_store = AvatarStore(
+    settings.AVATAR_DIR,
+    settings.AVATAR_MAX_BYTES,
+    thumbnail_sizes(settings.AVATAR_THUMBNAIL_SIZES),
+    settings.AVATAR_THUMBNAIL_WORKERS
+)
@@ -0,0 +1,306 @@
+"""
+Online SQLite backups (backup API in page steps), retention and restore
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.database import get_sqlite_path
+
+logger = logging.getLogger(__name__)
+
+class BackupError(Exception):
+    """Backup could not be created, verified or restored"""
+
+class _StepDeadlineExceeded(Exception):
+    """Raised from the progress callback to abandon a stepped copy"""
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def integrity_check(path: str) -> str:
+    """Result of PRAGMA integrity_check ("ok" when the file is sound)"""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("PRAGMA integrity_check").fetchall()
+        return "; ".join(row[0] for row in rows)
+    except sqlite3.DatabaseError as e:
+        # Badly damaged files fail before the check can report anything
+        return str(e)
+    finally:
+        conn.close()
+
+def copy_database(source_path: str, target_path: str) -> None:
+    """Whole-database copy through the backup API, including commits still in the -wal"""
+    source = sqlite3.connect(source_path)
+    try:
+        target = sqlite3.connect(target_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+    finally:
+        source.close()
+
+class BackupManager:
+    """Consistent snapshots of a live SQLite database.
+
+    The copy uses the SQLite online backup API in steps of
+    ``pages_per_step`` pages and sleeps between steps, so writers only
+    wait for a single step at a time. SQLite restarts a stepped copy when
+    another connection writes to the source; if the copy cannot finish
+    within ``max_seconds`` it falls back to one single-step pass. Every
+    backup is verified with ``PRAGMA integrity_check`` and stored next to
+    a JSON manifest with its SHA-256.
+
+    ``unavailable`` disables creating and restoring backups with that
+    reason, for layouts where the main file does not hold the user data.
+    """
+
+    def __init__(self, db_path: Optional[str], backup_dir: str, retention: int,
+                 pages_per_step: int = 256, step_sleep_ms: float = 10,
+                 max_seconds: float = 300, unavailable: Optional[str] = None):
+        self.db_path = db_path
+        self.unavailable = unavailable
+        self.backup_dir = backup_dir
+        self.retention = retention
+        self.pages_per_step = pages_per_step
+        self.step_sleep_ms = step_sleep_ms
+        self.max_seconds = max_seconds
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.last_backup: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+
+    async def create_backup(self, label: str = "manual") -> Dict[str, Any]:
+        """Create, verify and register a snapshot; prunes beyond retention"""
+        if self.unavailable:
+            raise BackupError(self.unavailable)
+        if self.db_path is None:
+            raise BackupError("Backups are only available for file-based SQLite databases")
+
+        async with self._lock:
+            try:
+                manifest = await asyncio.to_thread(self._create_backup_sync, label)
+            except Exception as e:
+                self.last_error = str(e)
+                raise
+            self.last_backup = manifest
+            self.last_error = None
+            await asyncio.to_thread(self._prune)
+            return manifest
+
+    def _create_backup_sync(self, label: str) -> Dict[str, Any]:
+        os.makedirs(self.backup_dir, exist_ok=True)
+        created_at = datetime.utcnow()
+        name = f"users_{created_at.strftime('%Y%m%d_%H%M%S_%f')}_{label}.db"
+        final_path = os.path.join(self.backup_dir, name)
+        tmp_path = final_path + ".tmp"
+
+        start = time.perf_counter()
+        steps = self._copy(tmp_path)
+        duration = time.perf_counter() - start
+
+        check = integrity_check(tmp_path)
+        if check != "ok":
+            os.remove(tmp_path)
+            raise BackupError(f"Backup failed integrity check: {check}")
+
+        os.replace(tmp_path, final_path)
+        manifest = {
+            "name": name,
+            "label": label,
+            "source": self.db_path,
+            "created_at": created_at.isoformat(),
+            "size_bytes": os.path.getsize(final_path),
+            "sha256": file_sha256(final_path),
+            "duration_seconds": round(duration, 3),
+            "steps": steps,
+            "integrity_check": check,
+        }
+        with open(final_path + ".json", "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        logger.info(f"Backup created: {name} ({manifest['size_bytes']} bytes, {duration:.2f}s, {steps} steps)")
+        return manifest
+
+    def _copy(self, tmp_path: str) -> int:
+        """Copy the live database into tmp_path; returns the number of steps"""
+        steps = 0
+        deadline = time.monotonic() + self.max_seconds
+        pause = self.step_sleep_ms / 1000
+
+        def progress(status, remaining, total):
+            nonlocal steps
+            steps += 1
+            if remaining and time.monotonic() > deadline:
+                raise _StepDeadlineExceeded()
+            if remaining and pause:
+                # Runs in a worker thread: sleeping here lets writers in between steps
+                time.sleep(pause)
+
+        source = sqlite3.connect(self.db_path)
+        try:
+            for pages in (self.pages_per_step, -1):
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                target = sqlite3.connect(tmp_path)
+                try:
+                    source.backup(target, pages=pages, progress=progress)
+                    return steps
+                except _StepDeadlineExceeded:
+                    logger.warning("Stepped backup kept restarting under writes; falling back to a single step")
+                finally:
+                    target.close()
+        finally:
+            source.close()
+        return steps
+
+    def list_backups(self) -> List[Dict[str, Any]]:
+        """Registered backups, newest first"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        manifests = []
+        for entry in os.scandir(self.backup_dir):
+            if entry.name.endswith(".db.json"):
+                try:
+                    with open(entry.path) as f:
+                        manifests.append(json.load(f))
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Unreadable backup manifest {entry.name}: {e}")
+        manifests.sort(key=lambda manifest: manifest["created_at"], reverse=True)
+        return manifests
+
+    def resolve(self, name: str) -> str:
+        """Path of a registered backup by name (never outside backup_dir)"""
+        path = os.path.join(self.backup_dir, os.path.basename(name))
+        if not os.path.isfile(path) or not os.path.isfile(path + ".json"):
+            raise BackupError(f"Unknown backup: {name}")
+        return path
+
+    def verify(self, path: str) -> Dict[str, Any]:
+        """Check a backup against its manifest checksum and with integrity_check"""
+        manifest_path = path + ".json"
+        if not os.path.isfile(manifest_path):
+            raise BackupError(f"Missing manifest for {path}")
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+        sha256 = file_sha256(path)
+        check = integrity_check(path)
+        return {
+            "name": os.path.basename(path),
+            "checksum_ok": sha256 == manifest["sha256"],
+            "integrity_check": check,
+            "valid": sha256 == manifest["sha256"] and check == "ok",
+        }
+
+    def restore(self, path: str, target_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Validate a backup and atomically swap it in place of the database
+
+        Must run while the application is stopped. The current database is
+        kept as ``<target>.pre-restore-<timestamp>``, copied with the backup
+        API so commits not yet checkpointed from its -wal are part of it;
+        only then are the -wal/-shm files removed so they cannot be replayed
+        onto the restored file.
+        """
+        if self.unavailable:
+            raise BackupError(self.unavailable)
+        target_path = target_path or self.db_path
+        if target_path is None:
+            raise BackupError("No target database to restore into")
+
+        result = self.verify(path)
+        if not result["valid"]:
+            raise BackupError(f"Backup failed validation: {result}")
+
+        staging = target_path + ".restore-tmp"
+        shutil.copyfile(path, staging)
+        if file_sha256(staging) != file_sha256(path) or integrity_check(staging) != "ok":
+            os.remove(staging)
+            raise BackupError("Staged copy does not match the backup")
+
+        previous = None
+        if os.path.exists(target_path):
+            previous = f"{target_path}.pre-restore-{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
+            copy_database(target_path, previous)
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(target_path + suffix):
+                os.remove(target_path + suffix)
+
+        os.replace(staging, target_path)
+        logger.info(f"Database restored from {path} (previous copy: {previous})")
+        return {"restored_from": path, "target": target_path, "previous_copy": previous}
+
+    def _prune(self) -> None:
+        for manifest in self.list_backups()[self.retention:]:
+            path = os.path.join(self.backup_dir, manifest["name"])
+            for file_path in (path, path + ".json"):
+                try:
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    pass
+            logger.info(f"Backup pruned by retention: {manifest['name']}")
+
+    def start_scheduler(self, interval_minutes: float) -> None:
+        """Take a snapshot every interval_minutes in the background"""
+        if interval_minutes <= 0 or self.db_path is None or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run_schedule(interval_minutes * 60))
+        logger.info(f"Scheduled backups every {interval_minutes} minutes (retention {self.retention})")
+
+    async def stop_scheduler(self) -> None:
+        """Cancel the background schedule"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run_schedule(self, interval_seconds: float) -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.create_backup(label="scheduled")
+            except Exception as e:
+                logger.error(f"Scheduled backup failed: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        """Summary for health and admin endpoints"""
+        return {
+            "available": not self.unavailable,
+            "unavailable_reason": self.unavailable,
+            "scheduled": self._task is not None,
+            "last_backup": self.last_backup,
+            "last_error": self.last_error,
+        }
+
+# Global backup manager
+backup_manager = BackupManager(
+    db_path=get_sqlite_path(),
+    backup_dir=settings.BACKUP_DIR,
+    retention=settings.BACKUP_RETENTION,
+    pages_per_step=settings.BACKUP_PAGES_PER_STEP,
+    step_sleep_ms=settings.BACKUP_STEP_SLEEP_MS,
+    max_seconds=settings.BACKUP_MAX_SECONDS,
+    unavailable=(
+        "Backups only copy the main database, not the shard files: "
+        "with SHARD_COUNT > 0 back up every file with the app stopped"
+    ) if settings.SHARD_COUNT > 0 else None
+)
@@ -0,0 +1,45 @@
+"""
+In-process notification for the user change feed
+"""
+import asyncio
+from typing import Optional
+
+class ChangeNotifier:
+    """Wake up live change-feed streams as soon as a change is committed.
+
+    Streams still poll on a timeout, so changes committed by other processes
+    are picked up within one heartbeat interval.
+    """
+
+    def __init__(self):
+        self._event: Optional[asyncio.Event] = None
+        self.generation = 0
+
+    def notify(self) -> None:
+        """Signal every waiting stream"""
+        self.generation += 1
+        if self._event is not None:
+            self._event.set()
+            self._event = None
+
+    async def wait(self, timeout: float, generation: Optional[int] = None) -> bool:
+        """
+        Wait for the next change; returns False on timeout
+
+        Pass the ``generation`` read before querying: a change notified
+        between the query and the wait then returns at once instead of
+        being missed until the timeout.
+        """
+        if generation is not None and generation != self.generation:
+            return True
+        if self._event is None:
+            self._event = asyncio.Event()
+        event = self._event
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+# Global notifier instance
+change_notifier = ChangeNotifier()
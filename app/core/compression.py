@@ -0,0 +1,294 @@
+"""
+Response compression (gzip, and brotli when installed) negotiated through Accept-Encoding
+"""
+import gzip
+import logging
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # Optional dependency: gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Content types worth compressing (images, archives and binaries already are)
+COMPRESSIBLE_TYPES = (
+    b"text/", b"application/json", b"application/x-ndjson", b"application/javascript",
+    b"application/xml", b"application/problem+json", b"image/svg+xml",
+)
+
+def parse_accept_encoding(value: bytes) -> Dict[str, float]:
+    """Map of coding -> q-value from an Accept-Encoding header"""
+    codings: Dict[str, float] = {}
+    for part in value.decode("latin-1").lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[coding.strip()] = q
+    return codings
+
+class _Compressor:
+    """Incremental compressor with the same interface for gzip and brotli"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits 16 + MAX_WBITS: gzip container
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        """Compress and flush, so each streamed chunk reaches the client now"""
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._zlib.flush(zlib.Z_FINISH)
+
+class CompressedCache:
+    """
+    LRU of compressed bodies keyed by path, query string, ETag and encoding
+
+    A stable ETag identifies the exact bytes of a response, so the same
+    compressed body can be reused without compressing it again.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, bytes, bytes, str], bytes]" = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, bytes, bytes, str]) -> Optional[bytes]:
+        body = self._entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key: Tuple[str, bytes, bytes, str], body: bytes) -> None:
+        if len(body) > self.max_bytes // 4 or key in self._entries:
+            return
+        self._entries[key] = body
+        self._size += len(body)
+        while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "bytes": self._size, "hits": self.hits, "misses": self.misses}
+
+class CompressionMiddleware:
+    """Pure ASGI middleware that compresses responses the client accepts compressed.
+
+    - Single-body responses smaller than ``minimum_size`` go out untouched.
+    - Streamed responses (``more_body``) are compressed chunk by chunk and
+      flushed after each one, so Server-Sent Events still arrive immediately.
+    - Responses already encoded, partial (206) or of non-text content types
+      are passed through.
+    - The ETag of a compressed response is made weak, since the bytes differ
+      from the identity representation. With a ``cache``, compressed bodies
+      of responses with an ETag are reused.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6,
+                 brotli_quality: int = 4, cache: Optional[CompressedCache] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache = cache
+        self.stats = compression_stats
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self.choose_encoding(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[dict] = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = message.get("headers", [])
+                passthrough = (
+                    message["status"] < 200 or message["status"] in (204, 206, 304)
+                    or not self._compressible(headers)
+                )
+                if passthrough:
+                    await send(message)
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                if not more_body:
+                    await self._send_single(scope, send, start_message, body, encoding)
+                    return
+                # Streamed response: headers go out before the length is known
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                headers = self._encoded_headers(start_message["headers"], encoding, None)
+                await send({**start_message, "headers": headers})
+                self.stats.responses += 1
+                self.stats.streamed += 1
+
+            started = time.perf_counter()
+            data = compressor.chunk(body) if body else b""
+            if not more_body:
+                data += compressor.finish()
+            self.stats.record(len(body), len(data), time.perf_counter() - started)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+    def choose_encoding(self, scope) -> Optional[str]:
+        """Accepted coding with the highest q-value (br wins ties), or None"""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                codings = parse_accept_encoding(value)
+                wildcard = codings.get("*", 0)
+                gzip_q = codings.get("gzip", wildcard)
+                br_q = codings.get("br", wildcard) if brotli is not None else 0
+                if br_q > 0 and br_q >= gzip_q:
+                    return "br"
+                if gzip_q > 0:
+                    return "gzip"
+                return None
+        return None
+
+    def _compressible(self, headers: List[Tuple[bytes, bytes]]) -> bool:
+        content_type = b""
+        for name, value in headers:
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value.lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES) or content_type.endswith(b"+json")
+
+    async def _send_single(self, scope, send, start_message: dict, body: bytes, encoding: str) -> None:
+        if len(body) < self.minimum_size:
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        etag = next((value for name, value in start_message["headers"] if name == b"etag"), None)
+        key = (
+            (scope["path"], scope.get("query_string", b""), etag, encoding)
+            if etag is not None and self.cache is not None else None
+        )
+
+        compressed = self.cache.get(key) if key is not None else None
+        if compressed is None:
+            started = time.perf_counter()
+            compressed = self.compress(body, encoding)
+            self.stats.record(len(body), len(compressed), time.perf_counter() - started)
+            if key is not None:
+                self.cache.put(key, compressed)
+        else:
+            self.stats.record(len(body), len(compressed), 0.0)
+        self.stats.responses += 1
+
+        headers = self._encoded_headers(start_message["headers"], encoding, len(compressed))
+        await send({**start_message, "headers": headers})
+        await send({"type": "http.response.body", "body": compressed})
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    @staticmethod
+    def _encoded_headers(headers, encoding: str, length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+        """Headers of the compressed representation"""
+        result = []
+        vary = None
+        for name, value in headers:
+            if name == b"content-length":
+                continue
+            if name == b"etag" and not value.startswith(b"W/"):
+                value = b"W/" + value
+            if name == b"vary":
+                vary = value
+                continue
+            result.append((name, value))
+        if vary is None:
+            vary = b"Accept-Encoding"
+        elif b"accept-encoding" not in vary.lower():
+            vary += b", Accept-Encoding"
+        result.append((b"vary", vary))
+        result.append((b"content-encoding", encoding.encode()))
+        if length is not None:
+            result.append((b"content-length", str(length).encode()))
+        return result
+
+class CompressionStats:
+    """Counters for health endpoints and benchmarks (CPU time spent compressing)"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.responses = 0
+        self.streamed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+
+    def record(self, size_in: int, size_out: int, seconds: float) -> None:
+        self.bytes_in += size_in
+        self.bytes_out += size_out
+        self.cpu_seconds += seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "brotli_available": brotli is not None,
+            "compressed_responses": self.responses,
+            "streamed_responses": self.streamed,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else None,
+            "cpu_ms": round(self.cpu_seconds * 1000, 2),
+            "cache": compressed_cache.stats() if compressed_cache is not None else None,
+        }
+
+# Global compression counters and compressed-body cache
+compression_stats = CompressionStats()
+compressed_cache = (
+    CompressedCache(settings.COMPRESSION_CACHE_ENTRIES, settings.COMPRESSION_CACHE_MAX_BYTES)
+    if settings.COMPRESSION_CACHE_ENTRIES > 0 else None
+)
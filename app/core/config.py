@@ -2,7 +2,7 @@
 Application configuration using Pydantic Settings
 """
 from pydantic_settings import BaseSettings
-from pydantic import Field, field_validator
+from pydantic import Field, field_validator, model_validator
 from typing import List, Optional, Union
 import os
 
@@ -22,6 +22,22 @@ class Settings(BaseSettings):
         env="DATABASE_URL"
     )
     
+    # SQLite connection configuration
+    SQLITE_JOURNAL_MODE: str = Field(default="WAL", env="SQLITE_JOURNAL_MODE")
+    SQLITE_BUSY_TIMEOUT_MS: int = Field(default=5000, env="SQLITE_BUSY_TIMEOUT_MS")
+    
+    # Sharded storage (0 keeps every user in DATABASE_URL)
+    SHARD_COUNT: int = Field(default=0, env="SHARD_COUNT")
+    SHARD_PATH_TEMPLATE: str = Field(default="./shards/users_{index}.db", env="SHARD_PATH_TEMPLATE")
+    
+    # Multi-tenant storage: one SQLite file per tenant (exclusive with sharding)
+    TENANCY_ENABLED: bool = Field(default=False, env="TENANCY_ENABLED")
+    TENANT_HEADER: str = Field(default="X-Tenant-ID", env="TENANT_HEADER")
+    TENANT_TOKEN_CLAIM: str = Field(default="tenant", env="TENANT_TOKEN_CLAIM")
+    TENANT_PATH_TEMPLATE: str = Field(default="./tenants/{tenant}.db", env="TENANT_PATH_TEMPLATE")
+    TENANT_MAX_ENGINES: int = Field(default=32, env="TENANT_MAX_ENGINES")
+    TENANT_IDLE_SECONDS: float = Field(default=300, env="TENANT_IDLE_SECONDS")
+    
     # Security configuration
     SECRET_KEY: str = Field(
         default="your-secret-key-change-in-production",
@@ -40,10 +56,138 @@ class Settings(BaseSettings):
     # Logging configuration
     LOG_LEVEL: str = Field(default="INFO", env="LOG_LEVEL")
     
+    # Write-behind for last_login: logins are buffered in memory and written
+    # in one batched UPDATE every LAST_LOGIN_FLUSH_SECONDS or LAST_LOGIN_MAX_PENDING users
+    LAST_LOGIN_WRITE_BEHIND: bool = Field(default=True, env="LAST_LOGIN_WRITE_BEHIND")
+    LAST_LOGIN_FLUSH_SECONDS: float = Field(default=5, env="LAST_LOGIN_FLUSH_SECONDS")
+    LAST_LOGIN_MAX_PENDING: int = Field(default=1000, env="LAST_LOGIN_MAX_PENDING")
+    
+    # Response compression (gzip, brotli when the package is installed)
+    COMPRESSION_ENABLED: bool = Field(default=True, env="COMPRESSION_ENABLED")
+    COMPRESSION_MINIMUM_SIZE: int = Field(default=1024, env="COMPRESSION_MINIMUM_SIZE")
+    COMPRESSION_GZIP_LEVEL: int = Field(default=6, ge=1, le=9, env="COMPRESSION_GZIP_LEVEL")
+    COMPRESSION_BROTLI_QUALITY: int = Field(default=4, ge=0, le=11, env="COMPRESSION_BROTLI_QUALITY")
+    # Compressed bodies of responses with an ETag (0 entries disables the cache)
+    COMPRESSION_CACHE_ENTRIES: int = Field(default=256, env="COMPRESSION_CACHE_ENTRIES")
+    COMPRESSION_CACHE_MAX_BYTES: int = Field(default=16 * 1024 * 1024, env="COMPRESSION_CACHE_MAX_BYTES")
+    
+    # Persistent job queue for long-running admin operations
+    JOBS_ENABLED: bool = Field(default=True, env="JOBS_ENABLED")
+    JOBS_WORKERS: int = Field(default=2, env="JOBS_WORKERS")
+    JOBS_POLL_SECONDS: float = Field(default=2, env="JOBS_POLL_SECONDS")
+    # Running jobs without a heartbeat for this long are requeued (crashed process)
+    JOBS_STALE_SECONDS: float = Field(default=60, env="JOBS_STALE_SECONDS")
+    JOBS_MAX_ATTEMPTS: int = Field(default=3, env="JOBS_MAX_ATTEMPTS")
+    JOBS_BATCH_SIZE: int = Field(default=500, env="JOBS_BATCH_SIZE")
+    JOBS_EXPORT_DIR: str = Field(default="./exports", env="JOBS_EXPORT_DIR")
+    
+    # Uploaded avatars: content-addressed files (sha256) plus square thumbnails
+    AVATAR_DIR: str = Field(default="./avatars", env="AVATAR_DIR")
+    AVATAR_MAX_BYTES: int = Field(default=5 * 1024 * 1024, env="AVATAR_MAX_BYTES")
+    # Base of avatar_url (point it at a CDN that fronts GET /api/v1/users/avatars)
+    AVATAR_URL_PREFIX: str = Field(default="/api/v1/users/avatars", env="AVATAR_URL_PREFIX")
+    # Read size when serving files
+    AVATAR_CHUNK_SIZE: int = Field(default=64 * 1024, env="AVATAR_CHUNK_SIZE")
+    # Comma-separated thumbnail edges in pixels (needs Pillow; empty disables them)
+    AVATAR_THUMBNAIL_SIZES: str = Field(default="64,256", env="AVATAR_THUMBNAIL_SIZES")
+    AVATAR_THUMBNAIL_WORKERS: int = Field(default=2, env="AVATAR_THUMBNAIL_WORKERS")
+    AVATAR_CACHE_SECONDS: int = Field(default=31536000, env="AVATAR_CACHE_SECONDS")
+    
+    # Graceful shutdown: readiness goes off on SIGTERM (python main.py) and the
+    # socket keeps answering 503 for SHUTDOWN_READINESS_DELAY_SECONDS; in-flight
+    # requests get SHUTDOWN_DRAIN_SECONDS, every later step SHUTDOWN_STEP_TIMEOUT_SECONDS
+    SHUTDOWN_READINESS_DELAY_SECONDS: float = Field(default=5, env="SHUTDOWN_READINESS_DELAY_SECONDS")
+    SHUTDOWN_DRAIN_SECONDS: float = Field(default=20, env="SHUTDOWN_DRAIN_SECONDS")
+    SHUTDOWN_STEP_TIMEOUT_SECONDS: float = Field(default=10, env="SHUTDOWN_STEP_TIMEOUT_SECONDS")
+    
+    # Background health prober: every HEALTH_PROBE_INTERVAL_SECONDS it records the
+    # SELECT 1 latency, pool usage and file/WAL size of each database plus the
+    # event-loop lag; /livez, /readyz and /health/detailed only read that snapshot
+    HEALTH_PROBE_ENABLED: bool = Field(default=True, env="HEALTH_PROBE_ENABLED")
+    HEALTH_PROBE_INTERVAL_SECONDS: float = Field(default=5, env="HEALTH_PROBE_INTERVAL_SECONDS")
+    HEALTH_PROBE_TIMEOUT_SECONDS: float = Field(default=2, env="HEALTH_PROBE_TIMEOUT_SECONDS")
+    HEALTH_LOOP_LAG_SAMPLE_SECONDS: float = Field(default=0.5, env="HEALTH_LOOP_LAG_SAMPLE_SECONDS")
+    
+    # Audit log of user mutations: buffered in memory and written in batches by
+    # a background writer to its own SQLite file ("sqlite") or JSONL segments ("jsonl")
+    AUDIT_ENABLED: bool = Field(default=True, env="AUDIT_ENABLED")
+    AUDIT_SINK: str = Field(default="sqlite", pattern="^(sqlite|jsonl)$", env="AUDIT_SINK")
+    AUDIT_SQLITE_PATH: str = Field(default="./audit.db", env="AUDIT_SQLITE_PATH")
+    AUDIT_JSONL_DIR: str = Field(default="./audit", env="AUDIT_JSONL_DIR")
+    AUDIT_SEGMENT_BYTES: int = Field(default=64 * 1024 * 1024, env="AUDIT_SEGMENT_BYTES")
+    AUDIT_FLUSH_SECONDS: float = Field(default=1, env="AUDIT_FLUSH_SECONDS")
+    AUDIT_BATCH_SIZE: int = Field(default=500, env="AUDIT_BATCH_SIZE")
+    # Backpressure: with this many events pending, mutations wait up to
+    # AUDIT_BLOCK_SECONDS for the writer before the event is dropped (and counted)
+    AUDIT_MAX_PENDING: int = Field(default=10000, env="AUDIT_MAX_PENDING")
+    AUDIT_BLOCK_SECONDS: float = Field(default=0.5, env="AUDIT_BLOCK_SECONDS")
+    
+    # Database maintenance scheduler configuration
+    MAINTENANCE_ENABLED: bool = Field(default=True, env="MAINTENANCE_ENABLED")
+    MAINTENANCE_TICK_SECONDS: float = Field(default=30, env="MAINTENANCE_TICK_SECONDS")
+    # Off-peak window in local hours (start == end means any time)
+    MAINTENANCE_WINDOW_START_HOUR: int = Field(default=0, env="MAINTENANCE_WINDOW_START_HOUR")
+    MAINTENANCE_WINDOW_END_HOUR: int = Field(default=0, env="MAINTENANCE_WINDOW_END_HOUR")
+    MAINTENANCE_BUSY_CONNECTIONS: int = Field(default=0, env="MAINTENANCE_BUSY_CONNECTIONS")
+    MAINTENANCE_TASK_BUDGET_SECONDS: float = Field(default=30, env="MAINTENANCE_TASK_BUDGET_SECONDS")
+    MAINTENANCE_OPTIMIZE_INTERVAL_MINUTES: float = Field(default=60, env="MAINTENANCE_OPTIMIZE_INTERVAL_MINUTES")
+    MAINTENANCE_ANALYZE_INTERVAL_MINUTES: float = Field(default=1440, env="MAINTENANCE_ANALYZE_INTERVAL_MINUTES")
+    MAINTENANCE_ANALYSIS_LIMIT: int = Field(default=1000, env="MAINTENANCE_ANALYSIS_LIMIT")
+    MAINTENANCE_CHECKPOINT_INTERVAL_MINUTES: float = Field(default=5, env="MAINTENANCE_CHECKPOINT_INTERVAL_MINUTES")
+    MAINTENANCE_VACUUM_INTERVAL_MINUTES: float = Field(default=60, env="MAINTENANCE_VACUUM_INTERVAL_MINUTES")
+    MAINTENANCE_VACUUM_PAGES: int = Field(default=1000, env="MAINTENANCE_VACUUM_PAGES")
+    MAINTENANCE_COMPACTION_INTERVAL_MINUTES: float = Field(default=1440, env="MAINTENANCE_COMPACTION_INTERVAL_MINUTES")
+    
+    # Backup configuration (SQLite online backup API)
+    BACKUP_DIR: str = Field(default="./backups", env="BACKUP_DIR")
+    BACKUP_RETENTION: int = Field(default=7, env="BACKUP_RETENTION")
+    BACKUP_INTERVAL_MINUTES: float = Field(default=0, env="BACKUP_INTERVAL_MINUTES")
+    BACKUP_PAGES_PER_STEP: int = Field(default=256, env="BACKUP_PAGES_PER_STEP")
+    BACKUP_STEP_SLEEP_MS: float = Field(default=10, env="BACKUP_STEP_SLEEP_MS")
+    BACKUP_MAX_SECONDS: float = Field(default=300, env="BACKUP_MAX_SECONDS")
+    
+    # Slow-query log configuration
+    SLOW_QUERY_LOG_ENABLED: bool = Field(default=True, env="SLOW_QUERY_LOG_ENABLED")
+    SLOW_QUERY_THRESHOLD_MS: float = Field(default=100.0, env="SLOW_QUERY_THRESHOLD_MS")
+    SLOW_QUERY_TOP_N: int = Field(default=50, env="SLOW_QUERY_TOP_N")
+    SLOW_QUERY_EXPLAIN: bool = Field(default=True, env="SLOW_QUERY_EXPLAIN")
+    
+    # Request profiling configuration
+    PROFILING_ENABLED: bool = Field(default=False, env="PROFILING_ENABLED")
+    PROFILING_SAMPLE_RATE: float = Field(default=0.0, env="PROFILING_SAMPLE_RATE")
+    PROFILING_HEADER: str = Field(default="X-Profile-Token", env="PROFILING_HEADER")
+    PROFILING_TOKEN: Optional[str] = Field(default=None, env="PROFILING_TOKEN")
+    PROFILING_DIR: str = Field(default="./profiles", env="PROFILING_DIR")
+    PROFILING_MAX_FILES: int = Field(default=50, env="PROFILING_MAX_FILES")
+    
+    # Request tracing: spans for router, service, repository, SQL and bcrypt,
+    # sampled at TRACING_SAMPLE_RATE (an incoming traceparent decides for its
+    # trace). Spans stay in a memory ring of TRACING_MEMORY_SPANS and, with
+    # "file" or "otlp", are also written in batches every TRACING_FLUSH_SECONDS
+    TRACING_ENABLED: bool = Field(default=False, env="TRACING_ENABLED")
+    TRACING_SAMPLE_RATE: float = Field(default=0.01, env="TRACING_SAMPLE_RATE")
+    TRACING_EXPORTER: str = Field(default="memory", pattern="^(memory|file|otlp)$", env="TRACING_EXPORTER")
+    TRACING_MEMORY_SPANS: int = Field(default=5000, env="TRACING_MEMORY_SPANS")
+    TRACING_FILE: str = Field(default="./traces.jsonl", env="TRACING_FILE")
+    TRACING_FILE_MAX_BYTES: int = Field(default=50 * 1024 * 1024, env="TRACING_FILE_MAX_BYTES")
+    # OTLP/HTTP collector (JSON encoding); headers as "key=value,key=value"
+    TRACING_OTLP_ENDPOINT: str = Field(default="http://localhost:4318/v1/traces", env="TRACING_OTLP_ENDPOINT")
+    TRACING_OTLP_HEADERS: str = Field(default="", env="TRACING_OTLP_HEADERS")
+    TRACING_FLUSH_SECONDS: float = Field(default=2, env="TRACING_FLUSH_SECONDS")
+    TRACING_MAX_PENDING: int = Field(default=10000, env="TRACING_MAX_PENDING")
+    
     # Pagination configuration
     DEFAULT_PAGE_SIZE: int = 20
     MAX_PAGE_SIZE: int = 100
     
+    # Batch lookup configuration
+    MAX_BATCH_IDS: int = Field(default=100, env="MAX_BATCH_IDS")
+    
+    # Change feed configuration
+    CHANGE_FEED_MAX_BATCH: int = Field(default=500, env="CHANGE_FEED_MAX_BATCH")
+    CHANGE_FEED_RETENTION_DAYS: int = Field(default=7, env="CHANGE_FEED_RETENTION_DAYS")
+    CHANGE_FEED_HEARTBEAT_SECONDS: float = Field(default=15.0, env="CHANGE_FEED_HEARTBEAT_SECONDS")
+    
     @field_validator("ALLOWED_HOSTS", mode="before")
     @classmethod
     def parse_allowed_hosts(cls, v):
@@ -66,6 +210,16 @@ class Settings(BaseSettings):
             return v.lower() in ("true", "1", "yes", "on")
         return bool(v)
     
+    @model_validator(mode="after")
+    def check_storage_mode(self):
+        """Sharding and per-tenant databases both decide where users live"""
+        if self.TENANCY_ENABLED and self.SHARD_COUNT > 0:
+            raise ValueError("TENANCY_ENABLED and SHARD_COUNT > 0 cannot be combined")
+        # Backups only copy the main database; with shards the users are elsewhere
+        if self.BACKUP_INTERVAL_MINUTES > 0 and self.SHARD_COUNT > 0:
+            raise ValueError("BACKUP_INTERVAL_MINUTES > 0 and SHARD_COUNT > 0 cannot be combined")
+        return self
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -1,15 +1,21 @@
 """
 Database configuration with SQLAlchemy async - SQLite
 """
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import MetaData, text
+from sqlalchemy import MetaData, text, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
 import logging
 import asyncio
 import os
-from typing import AsyncGenerator
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncGenerator, AsyncIterator, Optional
 
 from app.core.config import settings
+from app.core.query_log import slow_query_log
+from app.core.tracing import install_db_tracing
+from app.core.sharding import make_sharded_sessionmaker, shard_path, shard_urls
 
 logger = logging.getLogger(__name__)
 
@@ -20,29 +26,130 @@ if not os.path.exists(db_dir):
     os.makedirs(db_dir, exist_ok=True)
     logger.info(f"Directory created: {db_dir}")
 
-# Create async engine for SQLite
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=settings.DEBUG,
-    future=True,
-    # SQLite specific configurations
-    connect_args={"check_same_thread": False},
-    pool_pre_ping=True
-)
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    """Apply per-connection SQLite PRAGMAs"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        # Only takes effect on a new database file (before the first table)
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        if settings.SQLITE_JOURNAL_MODE:
+            cursor.execute(f"PRAGMA journal_mode = {settings.SQLITE_JOURNAL_MODE}")
+    finally:
+        cursor.close()
 
-# Create session factory
-AsyncSessionLocal = async_sessionmaker(
+def create_database_engine(database_url: str) -> AsyncEngine:
+    """Async engine with the SQLite PRAGMAs, the slow-query log and tracing hooks installed"""
+    database_engine = create_async_engine(
+        database_url,
+        echo=settings.DEBUG,
+        future=True,
+        # SQLite specific configurations
+        connect_args={"check_same_thread": False},
+        pool_pre_ping=True
+    )
+    
+    if database_engine.dialect.name == "sqlite":
+        event.listen(database_engine.sync_engine, "connect", configure_sqlite_connection)
+    
+    # Record statements slower than SLOW_QUERY_THRESHOLD_MS with their query plan
+    if settings.SLOW_QUERY_LOG_ENABLED:
+        slow_query_log.install(database_engine)
+    
+    # A client span per statement of traced requests
+    if settings.TRACING_ENABLED:
+        install_db_tracing(database_engine)
+    
+    return database_engine
+
+# Base for models (defined first: the sharded session factory imports the models)
+Base = declarative_base()
+
+# Create async engine for SQLite (holds the user directory when sharding)
+engine = create_database_engine(settings.DATABASE_URL)
+
+# Session factory for the main database
+DirectorySessionLocal = async_sessionmaker(
     engine,
     class_=AsyncSession,
     expire_on_commit=False
 )
 
-# Base for models
-Base = declarative_base()
+# Shard engines (empty unless SHARD_COUNT > 0)
+shard_engines = {
+    name: create_database_engine(url) for name, url in shard_urls().items()
+} if settings.SHARD_COUNT > 0 else {}
+
+# Create session factory
+if shard_engines:
+    for path in {os.path.dirname(shard_path(index)) for index in range(settings.SHARD_COUNT)}:
+        os.makedirs(path, exist_ok=True)
+    AsyncSessionLocal = make_sharded_sessionmaker(shard_engines, DirectorySessionLocal)
+else:
+    AsyncSessionLocal = DirectorySessionLocal
+
+# Every engine the application holds, for maintenance
+database_engines = {"main": engine, **shard_engines}
+
+def get_sqlite_path(database_url: Optional[str] = None) -> Optional[str]:
+    """Absolute path of the SQLite database file, or None if not file-based SQLite"""
+    url = make_url(database_url or settings.DATABASE_URL)
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        return None
+    return os.path.abspath(url.database)
+
+def user_tables() -> list:
+    """Tables that hold users (everything except the main-database-only tables)"""
+    main_only = main_tables()
+    return [table for table in Base.metadata.sorted_tables if table not in main_only]
+
+def main_tables() -> list:
+    """Tables that only live in the main database: shard directory and job queue"""
+    from app.models.user import User
+    from app.models.user_change import UserChange
+    from app.models.user_directory import UserDirectoryEntry
+    from app.models.job import Job
+    
+    return [UserDirectoryEntry.__table__, Job.__table__]
+
+def create_missing_indexes(sync_conn, tables: list) -> None:
+    """Create indexes added to the models after their tables already existed
+    
+    A unique index the existing rows violate (e.g. emails that only differ
+    in case) is skipped with an error: scripts/migrate_nocase.py reports
+    the duplicates to resolve.
+    """
+    for table in tables:
+        for index in table.indexes:
+            try:
+                index.create(sync_conn, checkfirst=True)
+            except IntegrityError as e:
+                logger.error(
+                    f"Could not create unique index {index.name}: {e.orig}. "
+                    "Run scripts/migrate_nocase.py to list the duplicates"
+                )
+
+@asynccontextmanager
+async def session_scope(tenant: Optional[str] = None) -> AsyncIterator[AsyncSession]:
+    """Session on the data database (the tenant's file with tenancy), held only for the block"""
+    async with AsyncExitStack() as stack:
+        session_factory = AsyncSessionLocal
+        if settings.TENANCY_ENABLED:
+            from app.core.tenancy import tenant_registry
+            # The lease keeps the tenant engine open while the session is in use
+            session_factory = await stack.enter_async_context(tenant_registry.lease(tenant))
+        async with session_factory() as session:
+            yield session
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Dependency to get database session"""
-    async with AsyncSessionLocal() as session:
+    tenant = None
+    if settings.TENANCY_ENABLED:
+        # Each tenant has its own file; the tenant comes from TenantMiddleware
+        from app.core.tenancy import current_tenant
+        tenant = current_tenant.get()
+    
+    async with session_scope(tenant) as session:
         try:
             yield session
         except Exception as e:
@@ -82,18 +189,38 @@ async def init_db():
         
         # Import all models BEFORE creating tables
         from app.models.user import User
+        from app.models.user_change import UserChange
+        from app.models.user_directory import UserDirectoryEntry
+        from app.models.job import Job
         logger.info("Models imported successfully")
         
         # Verify model is registered
         logger.info(f"Tables registered in metadata: {list(Base.metadata.tables.keys())}")
         
+        # With sharding, users live in the shard files and the main database
+        # only keeps the directory; the job queue is always in the main database
+        directory_tables = [UserDirectoryEntry.__table__]
+        job_tables = [Job.__table__]
+        user_engines = list(shard_engines.values()) or [engine]
+        
+        for user_engine in user_engines:
+            async with user_engine.begin() as conn:
+                # Create all tables
+                await conn.run_sync(Base.metadata.create_all, tables=user_tables())
+                # create_all skips existing tables, including their new indexes
+                await conn.run_sync(create_missing_indexes, user_tables())
         async with engine.begin() as conn:
-            # Create all tables
-            await conn.run_sync(Base.metadata.create_all)
-            logger.info("CREATE TABLE command executed")
+            await conn.run_sync(Base.metadata.create_all, tables=job_tables)
+            await conn.run_sync(create_missing_indexes, job_tables)
+            if shard_engines:
+                await conn.run_sync(Base.metadata.create_all, tables=directory_tables)
+                await conn.run_sync(create_missing_indexes, directory_tables)
+        if shard_engines:
+            logger.info(f"Sharded storage: {len(shard_engines)} shards plus the user directory")
+        logger.info("CREATE TABLE command executed")
             
         # Verify tables were created successfully
-        async with engine.begin() as conn:
+        async with user_engines[0].begin() as conn:
             result = await conn.execute(text("SELECT name FROM sqlite_master WHERE type='table'"))
             tables = result.fetchall()
             table_names = [table[0] for table in tables]
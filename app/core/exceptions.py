@@ -69,3 +69,14 @@ class ForbiddenException(CustomException):
             status_code=403,
             error_code="FORBIDDEN"
         )
+
+class PayloadTooLargeException(CustomException):
+    """Exception for request bodies over the allowed size"""
+    
+    def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
+        super().__init__(
+            message=message,
+            status_code=413,
+            error_code="PAYLOAD_TOO_LARGE",
+            details=details
+        )
@@ -0,0 +1,309 @@
+"""
+Persistent in-process job queue for long-running admin operations
+
+Jobs are rows of the ``jobs`` table in the main database. Async workers
+started in the lifespan claim pending jobs, run the registered handler and
+store progress and a checkpoint as they go. A job interrupted by a restart
+(or a crash: its heartbeat stops) goes back to the queue and the handler
+resumes from the last checkpoint.
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
+from typing import Any, AsyncContextManager, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.core.exceptions import CustomException, NotFoundException, ValidationException
+from app.models.job import Job, JOB_STATUSES
+from app.repositories.job_repository import JobRepository
+
+logger = logging.getLogger(__name__)
+
+class JobCancelled(Exception):
+    """Raised inside a handler when cancellation was requested"""
+
+class JobContext:
+    """What a handler sees: its parameters, checkpoint and data sessions"""
+
+    def __init__(
+        self,
+        queue: "JobQueue",
+        job: Job,
+        sessions: async_sessionmaker
+    ):
+        self.queue = queue
+        self.job_id = job.id
+        self.tenant = job.tenant
+        self.created_by = job.created_by
+        self.params: Dict[str, Any] = json.loads(job.params) if job.params else {}
+        self.checkpoint: Dict[str, Any] = json.loads(job.checkpoint) if job.checkpoint else {}
+        self.done = job.progress_done or 0
+        self.total = job.progress_total
+        self.sessions = sessions
+        self.batch_size = queue.batch_size
+
+    async def progress(
+        self,
+        done: int,
+        total: Optional[int] = None,
+        checkpoint: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Record progress and the point to resume from
+
+        The checkpoint must describe work that is already committed. Raises
+        JobCancelled if cancellation was requested in the meantime.
+        """
+        self.done = done
+        if total is not None:
+            self.total = total
+        if checkpoint is not None:
+            self.checkpoint = checkpoint
+        async with self.queue.sessions() as session:
+            cancel = await JobRepository(session).save_progress(self.job_id, done, total, checkpoint)
+        if cancel:
+            raise JobCancelled()
+
+JobHandler = Callable[[JobContext], Awaitable[Optional[Dict[str, Any]]]]
+
+@asynccontextmanager
+async def default_data_sessions(tenant: Optional[str]) -> AsyncIterator[async_sessionmaker]:
+    """Session factory for the data a job works on (the job's tenant, if any)"""
+    if settings.TENANCY_ENABLED:
+        from app.core.tenancy import tenant_registry
+        # Leased: the tenant engine is not evicted while the job runs
+        async with tenant_registry.lease(tenant) as sessions:
+            yield sessions
+        return
+    from app.core.database import AsyncSessionLocal
+    yield AsyncSessionLocal
+
+class JobQueue:
+    """
+    Registry of job handlers plus the workers that run them
+
+    ``sessions`` opens sessions on the database that holds the ``jobs``
+    table; ``data_sessions(tenant)`` is an async context manager with the
+    session factory handlers use for user data, held for the whole job.
+    """
+
+    def __init__(
+        self,
+        sessions: async_sessionmaker,
+        data_sessions: Callable[[Optional[str]], AsyncContextManager[async_sessionmaker]] = default_data_sessions,
+        workers: int = 2,
+        poll_seconds: float = 2.0,
+        stale_seconds: float = 60.0,
+        max_attempts: int = 3,
+        batch_size: int = 500
+    ):
+        self.sessions = sessions
+        self.data_sessions = data_sessions
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.stale_seconds = stale_seconds
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+        self.handlers: Dict[str, JobHandler] = {}
+        self.descriptions: Dict[str, str] = {}
+        self.validators: Dict[str, Callable[[Dict[str, Any]], None]] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[int, str] = {}
+        self._wakeup = asyncio.Event()
+        self.completed = 0
+        self.failed = 0
+
+    def register(
+        self,
+        job_type: str,
+        handler: JobHandler,
+        description: str = "",
+        validator: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> None:
+        """Register a handler; ``validator`` rejects bad params before queueing"""
+        self.handlers[job_type] = handler
+        self.descriptions[job_type] = description
+        if validator is not None:
+            self.validators[job_type] = validator
+
+    # --- API used by the router ---
+
+    async def submit(
+        self,
+        job_type: str,
+        params: Optional[Dict[str, Any]] = None,
+        tenant: Optional[str] = None,
+        created_by: Optional[int] = None
+    ) -> Job:
+        """Queue a job and wake an idle worker"""
+        if job_type not in self.handlers:
+            raise ValidationException(
+                "Tipo de trabajo no válido",
+                {"type": job_type, "available": sorted(self.handlers)}
+            )
+        params = params or {}
+        if job_type in self.validators:
+            self.validators[job_type](params)
+        async with self.sessions() as session:
+            job = await JobRepository(session).create(job_type, params, tenant, created_by)
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id: int, tenant: Optional[str] = None) -> Job:
+        """A job by id; with ``tenant``, only that tenant's jobs are visible"""
+        async with self.sessions() as session:
+            job = await JobRepository(session).get(job_id)
+        if job is None or (tenant is not None and job.tenant != tenant):
+            raise NotFoundException("Trabajo no encontrado")
+        return job
+
+    async def list(
+        self,
+        skip: int = 0,
+        limit: int = 20,
+        status: Optional[str] = None,
+        tenant: Optional[str] = None
+    ) -> tuple[List[Job], int]:
+        if status is not None and status not in JOB_STATUSES:
+            raise ValidationException("Estado de trabajo no válido", {"available": list(JOB_STATUSES)})
+        async with self.sessions() as session:
+            return await JobRepository(session).get_all(skip, limit, status, tenant)
+
+    async def cancel(self, job_id: int, tenant: Optional[str] = None) -> Job:
+        """Cancel a pending job now, or ask a running one to stop"""
+        await self.get(job_id, tenant)
+        async with self.sessions() as session:
+            return await JobRepository(session).request_cancel(job_id)
+
+    # --- Workers ---
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        """Recover interrupted jobs and start the workers"""
+        if self._tasks:
+            return
+        await self.requeue_stale()
+        self._tasks = [asyncio.create_task(self._worker(index)) for index in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+        logger.info(f"Job queue started with {self.workers} workers")
+
+    async def stop(self) -> None:
+        """Stop the workers; running jobs go back to the queue with their checkpoint"""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    async def requeue_stale(self) -> int:
+        """
+        Requeue running jobs whose process stopped sending heartbeats
+
+        A graceful shutdown requeues its jobs itself; after a crash they
+        are taken over once silent for ``stale_seconds``, which also keeps
+        several processes sharing the database from stealing each other's jobs.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_seconds)
+        async with self.sessions() as session:
+            return await JobRepository(session).requeue_stale(cutoff, self.max_attempts)
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            try:
+                async with self.sessions() as session:
+                    job = await JobRepository(session).claim_next()
+            except Exception as e:
+                logger.error(f"Job worker {index} could not claim a job: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            await self.run(job)
+
+    async def run(self, job: Job) -> None:
+        """Run one claimed job to a final state (or back to the queue on shutdown)"""
+        self._running[job.id] = job.type
+        status, result, error = "succeeded", None, None
+        try:
+            async with self.data_sessions(job.tenant) as data_sessions:
+                context = JobContext(self, job, data_sessions)
+                logger.info(f"Job {job.id} ({job.type}) started, attempt {job.attempts}")
+                result = await self.handlers[job.type](context)
+        except asyncio.CancelledError:
+            # Shutdown: resume from the checkpoint on the next start
+            async with self.sessions() as session:
+                await JobRepository(session).release(job.id)
+            logger.info(f"Job {job.id} interrupted by shutdown, requeued")
+            raise
+        except JobCancelled:
+            status = "cancelled"
+        except CustomException as e:
+            status, error = "failed", e.message
+        except Exception as e:
+            logger.exception(f"Job {job.id} ({job.type}) failed")
+            status, error = "failed", f"{type(e).__name__}: {e}"
+        finally:
+            self._running.pop(job.id, None)
+
+        if status == "failed":
+            self.failed += 1
+        else:
+            self.completed += 1
+        async with self.sessions() as session:
+            await JobRepository(session).finish(job.id, status, result, error)
+
+    async def _heartbeat(self) -> None:
+        """Keep running jobs alive and take over jobs of dead processes"""
+        while True:
+            await asyncio.sleep(max(self.stale_seconds / 3, 1))
+            try:
+                async with self.sessions() as session:
+                    await JobRepository(session).heartbeat(list(self._running))
+                if await self.requeue_stale():
+                    self._wakeup.set()
+            except Exception as e:
+                logger.error(f"Job heartbeat failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Summary for health endpoints"""
+        return {
+            "workers": self.workers if self.running else 0,
+            "running_jobs": dict(self._running),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+def build_job_queue() -> JobQueue:
+    """Job queue on the main database with the admin job handlers registered"""
+    from app.core.database import DirectorySessionLocal
+    from app.services import job_handlers
+
+    queue = JobQueue(
+        DirectorySessionLocal,
+        workers=settings.JOBS_WORKERS,
+        poll_seconds=settings.JOBS_POLL_SECONDS,
+        stale_seconds=settings.JOBS_STALE_SECONDS,
+        max_attempts=settings.JOBS_MAX_ATTEMPTS,
+        batch_size=settings.JOBS_BATCH_SIZE
+    )
+    job_handlers.register_all(queue)
+    return queue
+
+# Global job queue
+job_queue = build_job_queue()
@@ -0,0 +1,218 @@
+"""
+Application lifecycle: readiness, draining of in-flight requests and the shutdown sequence
+
+On shutdown the application first stops being ready (new requests get a
+503 with ``Connection: close``, so load balancers move on and keep-alive
+clients reconnect elsewhere), waits a bounded time for the requests already
+running, and then runs the shutdown steps one by one, each with its own
+timeout, timing and log line: flush background work, dispose every engine
+and truncate the SQLite write-ahead logs.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import uvicorn
+
+from app.core.change_feed import change_notifier
+
+logger = logging.getLogger(__name__)
+
+LIFECYCLE_STATES = ("starting", "ready", "draining", "stopped")
+
+class Lifecycle:
+    """Readiness state plus the count of HTTP requests in flight"""
+
+    def __init__(self):
+        self.state = "starting"
+        self.in_flight = 0
+        self.rejected = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.drain_started_at: Optional[str] = None
+        self.last_shutdown: List[Dict[str, Any]] = []
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    @property
+    def draining(self) -> bool:
+        return self.state in ("draining", "stopped")
+
+    def mark_ready(self) -> None:
+        self.state = "ready"
+
+    def begin_drain(self) -> bool:
+        """Stop accepting requests; False if draining had already started"""
+        if self.draining:
+            return False
+        self.state = "draining"
+        self.drain_started_at = datetime.utcnow().isoformat()
+        # Live change-feed streams check the state when woken and finish
+        change_notifier.notify()
+        logger.info(f"Readiness off, draining {self.in_flight} in-flight requests")
+        return True
+
+    def enter(self) -> None:
+        self.in_flight += 1
+        self._idle.clear()
+
+    def leave(self) -> None:
+        self.in_flight -= 1
+        if self.in_flight == 0:
+            self._idle.set()
+
+    async def wait_drained(self, timeout: float) -> bool:
+        """Wait for the in-flight requests to finish; False on timeout"""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "drain_started_at": self.drain_started_at,
+        }
+
+class DrainMiddleware:
+    """
+    Pure ASGI middleware that counts in-flight requests and, while the
+    application drains, answers new ones with 503 and ``Connection: close``
+
+    ``probe_paths`` (liveness and readiness) always reach the app and are
+    not counted: a failing liveness probe during the drain would get the
+    process killed before the requests it is waiting for finish, and the
+    readiness endpoint reports the drain itself.
+    """
+
+    def __init__(self, app, lifecycle: Lifecycle, retry_after: int = 5,
+                 probe_paths: Iterable[str] = ()):
+        self.app = app
+        self.lifecycle = lifecycle
+        self.retry_after = str(retry_after)
+        self.probe_paths = frozenset(probe_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if scope["path"] in self.probe_paths:
+            await self.app(scope, receive, send)
+            return
+        if self.lifecycle.draining:
+            self.lifecycle.rejected += 1
+            await self._reject(send)
+            return
+
+        self.lifecycle.enter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.lifecycle.leave()
+
+    async def _reject(self, send) -> None:
+        body = json.dumps({
+            "error": "SERVICE_UNAVAILABLE",
+            "message": "El servicio se está deteniendo"
+        }).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", self.retry_after.encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+ShutdownStep = Tuple[str, Callable[[], Awaitable[Any]], float]
+
+async def run_shutdown(steps: List[ShutdownStep]) -> List[Dict[str, Any]]:
+    """
+    Run the shutdown steps in order, each bounded by its timeout
+
+    A step that fails or times out is logged and the sequence goes on: a
+    stuck flush must not keep the engines (and the WAL) open.
+    """
+    report = []
+    for name, func, timeout in steps:
+        start = time.perf_counter()
+        entry: Dict[str, Any] = {"step": name, "status": "ok"}
+        try:
+            result = await asyncio.wait_for(func(), timeout)
+            if result is not None:
+                entry["result"] = result
+        except asyncio.TimeoutError:
+            entry["status"] = "timeout"
+        except Exception as e:
+            entry["status"] = "error"
+            entry["error"] = f"{type(e).__name__}: {e}"
+        entry["ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+        if entry["status"] == "ok":
+            logger.info(f"Shutdown step {name}: {entry['ms']} ms {entry.get('result', '')}".rstrip())
+        else:
+            logger.error(f"Shutdown step {name} {entry['status']} after {entry['ms']} ms {entry.get('error', '')}".rstrip())
+        report.append(entry)
+    return report
+
+def checkpoint_truncate(path: str) -> Dict[str, Any]:
+    """
+    ``PRAGMA wal_checkpoint(TRUNCATE)`` on a database file
+
+    Meant to run once its engines are disposed: with no other connection
+    left the whole log is copied back and the ``-wal`` file truncated to
+    zero bytes, so the next start has nothing to replay.
+    """
+    if not os.path.exists(path):
+        return {"path": path, "exists": False}
+    wal_path = path + "-wal"
+    wal_before = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+    conn = sqlite3.connect(path)
+    try:
+        busy, log_frames, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    finally:
+        conn.close()
+    return {
+        "path": path,
+        "busy": bool(busy),
+        # -1 when the database is not in WAL mode
+        "log_frames": log_frames,
+        "checkpointed": checkpointed,
+        "wal_bytes_before": wal_before,
+    }
+
+class DrainingServer(uvicorn.Server):
+    """
+    uvicorn server that turns readiness off as soon as it gets SIGTERM/SIGINT
+
+    The listening socket stays open for ``readiness_delay`` seconds, answering
+    503, so load balancers see the instance as not ready before connections
+    are refused. A second signal exits at once.
+    """
+
+    def __init__(self, config: uvicorn.Config, lifecycle: Lifecycle, readiness_delay: float = 5.0):
+        super().__init__(config)
+        self.lifecycle = lifecycle
+        self.readiness_delay = readiness_delay
+
+    def handle_exit(self, sig, frame) -> None:
+        if self.lifecycle.begin_drain() and self.readiness_delay > 0:
+            asyncio.get_event_loop().call_later(self.readiness_delay, super().handle_exit, sig, frame)
+            return
+        super().handle_exit(sig, frame)
+
+# Global lifecycle of the application
+lifecycle = Lifecycle()
@@ -0,0 +1,277 @@
+"""
+In-process SQLite maintenance scheduler (optimize, ANALYZE, WAL checkpoint,
+incremental vacuum and change-feed compaction)
+"""
+import asyncio
+import logging
+import time
+from functools import partial
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+from app.core.config import settings
+from app.core.database import database_engines
+
+logger = logging.getLogger(__name__)
+
+class MaintenanceTask:
+    """A periodic maintenance job and its run history"""
+
+    def __init__(self, name: str, func: Callable[[], Awaitable[Any]],
+                 interval_minutes: float, off_peak: bool = False):
+        self.name = name
+        self.func = func
+        self.interval_seconds = interval_minutes * 60
+        self.off_peak = off_peak
+        self.next_run = time.monotonic() + self.interval_seconds
+        self.last_run: Optional[str] = None
+        self.last_duration_ms: Optional[float] = None
+        self.last_result: Any = None
+        self.last_error: Optional[str] = None
+        self.runs = 0
+        self.skipped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval_seconds > 0
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "interval_minutes": self.interval_seconds / 60,
+            "off_peak": self.off_peak,
+            "last_run": self.last_run,
+            "last_duration_ms": self.last_duration_ms,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+            "runs": self.runs,
+            "skipped": self.skipped,
+        }
+
+class MaintenanceScheduler:
+    """
+    Runs registered maintenance tasks from a background loop
+
+    Every ``tick_seconds`` the loop picks the tasks that are due. A due task
+    is postponed to the next tick when more than ``busy_connections``
+    connections are checked out of the pool, and tasks marked ``off_peak``
+    also wait for the configured hour window. Each run is bounded by
+    ``budget_seconds``; the SQL itself is kept cheap (analysis_limit,
+    PASSIVE checkpoints, a page cap on incremental_vacuum) so the budget is
+    a safety net rather than the normal way a task ends.
+    """
+
+    def __init__(self, engines: Dict[str, AsyncEngine], tick_seconds: float = 30,
+                 window_start_hour: int = 0, window_end_hour: int = 0,
+                 busy_connections: int = 0, budget_seconds: float = 30):
+        self.engines = engines
+        self.tick_seconds = tick_seconds
+        self.window_start_hour = window_start_hour
+        self.window_end_hour = window_end_hour
+        self.busy_connections = busy_connections
+        self.budget_seconds = budget_seconds
+        self.tasks: Dict[str, MaintenanceTask] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        # Last tenant each per-tenant task finished, to resume after it
+        self._tenant_cursors: Dict[str, str] = {}
+
+    def register(self, name: str, func: Callable[[], Awaitable[Any]],
+                 interval_minutes: float, off_peak: bool = False) -> None:
+        """Add a task; an interval of 0 disables it"""
+        self.tasks[name] = MaintenanceTask(name, func, interval_minutes, off_peak)
+
+    def in_window(self, now: Optional[datetime] = None) -> bool:
+        """Whether the current local hour is inside the off-peak window"""
+        start, end = self.window_start_hour, self.window_end_hour
+        if start == end:
+            return True
+        hour = (now or datetime.now()).hour
+        if start < end:
+            return start <= hour < end
+        # Window wraps around midnight (e.g. 22 -> 6)
+        return hour >= start or hour < end
+
+    def is_busy(self) -> bool:
+        """Whether any pool has more connections checked out than allowed"""
+        for engine in self.engines.values():
+            checkedout = getattr(engine.pool, "checkedout", None)
+            if checkedout is not None and checkedout() > self.busy_connections:
+                return True
+        return False
+
+    def start(self) -> None:
+        """Start the background loop"""
+        if self._task is not None or not any(task.enabled for task in self.tasks.values()):
+            return
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"Maintenance scheduler started with tasks: {[name for name, task in self.tasks.items() if task.enabled]}")
+
+    async def stop(self) -> None:
+        """Cancel the background loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick_seconds)
+            now = time.monotonic()
+            for task in self.tasks.values():
+                if not task.enabled or now < task.next_run:
+                    continue
+                if self.is_busy() or (task.off_peak and not self.in_window()):
+                    task.skipped += 1
+                    continue
+                await self.run_task(task.name)
+
+    async def run_task(self, name: str) -> Dict[str, Any]:
+        """Run a task now (within the time budget) and record the outcome"""
+        task = self.tasks[name]
+        async with self._lock:
+            start = time.perf_counter()
+            try:
+                task.last_result = await asyncio.wait_for(task.func(), timeout=self.budget_seconds)
+                task.last_error = None
+            except asyncio.TimeoutError:
+                task.last_error = f"Exceeded time budget of {self.budget_seconds}s"
+                logger.warning(f"Maintenance task {name} exceeded its budget")
+            except Exception as e:
+                task.last_error = str(e)
+                logger.error(f"Maintenance task {name} failed: {e}")
+            task.last_duration_ms = round((time.perf_counter() - start) * 1000, 2)
+            task.last_run = datetime.utcnow().isoformat()
+            task.next_run = time.monotonic() + task.interval_seconds
+            task.runs += 1
+            logger.info(f"Maintenance task {name} finished in {task.last_duration_ms}ms: {task.last_result}")
+        return {"task": name, **task.status()}
+
+    def status(self) -> Dict[str, Any]:
+        """Summary for health and admin endpoints"""
+        return {
+            "running": self._task is not None,
+            "in_window": self.in_window(),
+            "busy": self.is_busy(),
+            "tasks": {name: task.status() for name, task in self.tasks.items()},
+        }
+
+    # Built-in SQLite tasks (one registration per engine)
+
+    async def optimize(self, engine: AsyncEngine) -> Dict[str, Any]:
+        """PRAGMA optimize: re-analyzes only the tables whose stats look stale"""
+        async with engine.connect() as conn:
+            await conn.exec_driver_sql(f"PRAGMA analysis_limit = {int(settings.MAINTENANCE_ANALYSIS_LIMIT)}")
+            await conn.exec_driver_sql("PRAGMA optimize")
+        return {"optimized": True}
+
+    async def analyze(self, engine: AsyncEngine) -> Dict[str, Any]:
+        """Full ANALYZE, sampling at most analysis_limit rows per index"""
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql(f"PRAGMA analysis_limit = {int(settings.MAINTENANCE_ANALYSIS_LIMIT)}")
+            await conn.exec_driver_sql("ANALYZE")
+        return {"analyzed": True}
+
+    async def wal_checkpoint(self, engine: AsyncEngine) -> Dict[str, Any]:
+        """PASSIVE checkpoint: copies what it can without waiting for readers"""
+        async with engine.connect() as conn:
+            row = (await conn.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)")).first()
+        if row is None:
+            return {"wal": False}
+        busy, log_frames, checkpointed = row
+        # log_frames is -1 when the database is not in WAL mode
+        return {"wal": log_frames != -1, "busy": bool(busy),
+                "log_frames": log_frames, "checkpointed": checkpointed}
+
+    async def incremental_vacuum(self, engine: AsyncEngine) -> Dict[str, Any]:
+        """Return up to MAINTENANCE_VACUUM_PAGES free pages to the filesystem"""
+        async with engine.connect() as conn:
+            auto_vacuum = (await conn.exec_driver_sql("PRAGMA auto_vacuum")).scalar()
+            free_before = (await conn.exec_driver_sql("PRAGMA freelist_count")).scalar()
+            if auto_vacuum != 2:
+                # 0 = NONE, 1 = FULL; switching an existing file needs a one-off VACUUM
+                return {"auto_vacuum": auto_vacuum, "freelist_pages": free_before, "vacuumed": False}
+            if free_before:
+                # sqlite3 steps a statement without result columns only once
+                # (one page); executescript runs it to completion
+                raw = await conn.get_raw_connection()
+                await raw.driver_connection.executescript(
+                    f"PRAGMA incremental_vacuum({int(settings.MAINTENANCE_VACUUM_PAGES)})"
+                )
+            free_after = (await conn.exec_driver_sql("PRAGMA freelist_count")).scalar()
+        return {"auto_vacuum": auto_vacuum, "freelist_pages": free_after,
+                "released_pages": free_before - free_after, "vacuumed": True}
+
+    async def compact_changes(self, sessions: Optional[async_sessionmaker] = None) -> Dict[str, Any]:
+        """Drop superseded change-feed entries past their retention"""
+        from app.services.change_service import ChangeService
+        from app.core.database import AsyncSessionLocal
+
+        async with (sessions or AsyncSessionLocal)() as session:
+            result = await ChangeService(session).compact(settings.CHANGE_FEED_RETENTION_DAYS)
+        return result.model_dump(mode="json")
+
+    async def for_each_tenant(self, name: str, func: Callable[[async_sessionmaker], Awaitable[Any]]) -> Dict[str, Any]:
+        """
+        Run a task on every provisioned tenant, one leased engine at a time
+
+        A run starts after the last tenant the previous run finished, so
+        when runs keep hitting the budget the tenants at the end of the list
+        still get their turn. A failing tenant does not stop the others.
+        """
+        from app.core.tenancy import tenant_registry
+
+        tenants = tenant_registry.list_tenants()
+        last = self._tenant_cursors.get(name)
+        pending = [tenant for tenant in tenants if last is not None and tenant > last] or tenants
+        done, errors = 0, {}
+        for tenant in pending:
+            try:
+                async with tenant_registry.lease(tenant) as sessions:
+                    await func(sessions)
+                done += 1
+            except Exception as e:
+                errors[tenant] = str(e)
+                logger.error(f"Maintenance task {name} failed for tenant {tenant}: {e}")
+            self._tenant_cursors[name] = tenant
+        return {"tenants": done, "errors": errors}
+
+def build_maintenance_scheduler(engines: Dict[str, AsyncEngine]) -> MaintenanceScheduler:
+    """Scheduler with the built-in tasks configured from settings"""
+    scheduler = MaintenanceScheduler(
+        engines,
+        tick_seconds=settings.MAINTENANCE_TICK_SECONDS,
+        window_start_hour=settings.MAINTENANCE_WINDOW_START_HOUR,
+        window_end_hour=settings.MAINTENANCE_WINDOW_END_HOUR,
+        busy_connections=settings.MAINTENANCE_BUSY_CONNECTIONS,
+        budget_seconds=settings.MAINTENANCE_TASK_BUDGET_SECONDS
+    )
+    for engine_name, engine in engines.items():
+        if engine.dialect.name != "sqlite":
+            continue
+        # Shard engines get their own tasks: "optimize:shard_0", ...
+        suffix = "" if engine_name == "main" else f":{engine_name}"
+        scheduler.register(f"optimize{suffix}", partial(scheduler.optimize, engine), settings.MAINTENANCE_OPTIMIZE_INTERVAL_MINUTES)
+        scheduler.register(f"wal_checkpoint{suffix}", partial(scheduler.wal_checkpoint, engine), settings.MAINTENANCE_CHECKPOINT_INTERVAL_MINUTES)
+        scheduler.register(f"analyze{suffix}", partial(scheduler.analyze, engine), settings.MAINTENANCE_ANALYZE_INTERVAL_MINUTES, off_peak=True)
+        scheduler.register(f"incremental_vacuum{suffix}", partial(scheduler.incremental_vacuum, engine), settings.MAINTENANCE_VACUUM_INTERVAL_MINUTES, off_peak=True)
+    if settings.TENANCY_ENABLED:
+        # User data and change feeds live in the tenant files: "optimize:tenants", ...
+        def on_tenants(name: str, method: Callable[..., Awaitable[Any]]) -> Callable[[], Awaitable[Any]]:
+            return partial(scheduler.for_each_tenant, name, lambda sessions: method(sessions.kw["bind"]))
+
+        scheduler.register("optimize:tenants", on_tenants("optimize:tenants", scheduler.optimize), settings.MAINTENANCE_OPTIMIZE_INTERVAL_MINUTES)
+        scheduler.register("wal_checkpoint:tenants", on_tenants("wal_checkpoint:tenants", scheduler.wal_checkpoint), settings.MAINTENANCE_CHECKPOINT_INTERVAL_MINUTES)
+        scheduler.register("analyze:tenants", on_tenants("analyze:tenants", scheduler.analyze), settings.MAINTENANCE_ANALYZE_INTERVAL_MINUTES, off_peak=True)
+        scheduler.register("incremental_vacuum:tenants", on_tenants("incremental_vacuum:tenants", scheduler.incremental_vacuum), settings.MAINTENANCE_VACUUM_INTERVAL_MINUTES, off_peak=True)
+        scheduler.register("compact_changes", partial(scheduler.for_each_tenant, "compact_changes", scheduler.compact_changes), settings.MAINTENANCE_COMPACTION_INTERVAL_MINUTES, off_peak=True)
+    else:
+        scheduler.register("compact_changes", scheduler.compact_changes, settings.MAINTENANCE_COMPACTION_INTERVAL_MINUTES, off_peak=True)
+    return scheduler
+
+# Global maintenance scheduler
+maintenance_scheduler = build_maintenance_scheduler(database_engines)
@@ -0,0 +1,87 @@
+"""
+Host and CORS checks as pure ASGI middleware with precompiled matchers
+"""
+import re
+from typing import Iterable
+
+from starlette.middleware.cors import CORSMiddleware as StarletteCORSMiddleware
+
+class HostMatcher:
+    """Precompiled matcher for host patterns (``example.com``, ``*.example.com`` or ``*``)"""
+
+    def __init__(self, patterns: Iterable[str]):
+        patterns = [pattern.strip().lower() for pattern in patterns if pattern.strip()]
+        self.allow_any = "*" in patterns
+        self.exact = frozenset(pattern for pattern in patterns if not pattern.startswith("*."))
+        # Every wildcard suffix in a single regex
+        suffixes = [re.escape(pattern[1:]) for pattern in patterns if pattern.startswith("*.")]
+        self._wildcard = re.compile(r".+(?:%s)" % "|".join(suffixes)) if suffixes else None
+
+    def matches(self, host: str) -> bool:
+        if self.allow_any:
+            return True
+        host = host.lower()
+        if host in self.exact:
+            return True
+        return self._wildcard is not None and self._wildcard.fullmatch(host) is not None
+
+class TrustedHostMiddleware:
+    """Pure ASGI middleware that rejects requests whose Host is not allowed.
+
+    Same contract as Starlette's ``TrustedHostMiddleware`` (400 "Invalid
+    host header", ``*.domain`` wildcards) with the patterns compiled once.
+    It is not installed at all for ``*``, where it would accept every host.
+    """
+
+    def __init__(self, app, allowed_hosts: Iterable[str]):
+        self.app = app
+        self.matcher = HostMatcher(allowed_hosts)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        host = ""
+        for name, value in scope["headers"]:
+            if name == b"host":
+                host = value.decode("latin-1").split(":")[0]
+                break
+
+        if self.matcher.matches(host):
+            await self.app(scope, receive, send)
+            return
+
+        if scope["type"] == "websocket":
+            await send({"type": "websocket.close", "code": 1008})
+            return
+        body = b"Invalid host header"
+        await send({
+            "type": "http.response.start",
+            "status": 400,
+            "headers": [(b"content-type", b"text/plain; charset=utf-8"),
+                        (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+class CORSMiddleware(StarletteCORSMiddleware):
+    """Starlette's CORS handling, bypassed for requests without an Origin header.
+
+    Same-origin and non-browser requests carry no Origin, so they reach the
+    app after a scan of the raw headers instead of a parsed ``Headers``
+    object. Allowed origins are kept in a frozenset.
+    """
+
+    def __init__(self, app, allow_origins: Iterable[str] = (), **options):
+        super().__init__(app, allow_origins=tuple(allow_origins), **options)
+        self.allow_origins = frozenset(self.allow_origins)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            for name, _ in scope["headers"]:
+                if name == b"origin":
+                    break
+            else:
+                await self.app(scope, receive, send)
+                return
+        await super().__call__(scope, receive, send)
@@ -0,0 +1,212 @@
+"""
+Background health probing for cheap liveness/readiness endpoints
+
+A background task refreshes a snapshot every ``interval`` seconds: per
+database the ``SELECT 1`` latency, pool utilization and the size of the
+file and its WAL, plus the event-loop lag measured by a second task.
+Probe endpoints only read that snapshot, so an orchestrator polling every
+few seconds per replica no longer opens sessions or stats files on the
+request path. With tenancy, the tenant engines that are open are probed
+too (through a lease) and reported apart: one tenant's file does not make
+the whole instance unready.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.core.lifecycle import Lifecycle
+
+if TYPE_CHECKING:
+    from app.core.tenancy import TenantRegistry
+
+logger = logging.getLogger(__name__)
+
+def pool_usage(engine: AsyncEngine) -> Dict[str, Any]:
+    """Connections checked out of the pool (pools that keep no count report only their type)"""
+    pool = engine.pool
+    usage: Dict[str, Any] = {"pool": type(pool).__name__}
+    for name in ("size", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if method is not None:
+            usage[name] = method()
+    if usage.get("size") and "checkedout" in usage:
+        usage["utilization"] = round(usage["checkedout"] / usage["size"], 3)
+    return usage
+
+def file_sizes(path: Optional[str]) -> Dict[str, Any]:
+    if path is None:
+        return {}
+    wal_path = path + "-wal"
+    return {
+        "file_exists": os.path.exists(path),
+        "file_size_bytes": os.path.getsize(path) if os.path.exists(path) else 0,
+        "wal_size_bytes": os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+    }
+
+class EventLoopLag:
+    """How late a periodic sleep wakes up: time the loop spent busy with other work"""
+
+    def __init__(self, sample_seconds: float = 0.5):
+        self.sample_seconds = sample_seconds
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self.samples = 0
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.sample_seconds)
+            lag_ms = max(loop.time() - start - self.sample_seconds, 0) * 1000
+            self.last_ms = lag_ms
+            self.max_ms = max(self.max_ms, lag_ms)
+            self.samples += 1
+
+    def take(self) -> Dict[str, Any]:
+        """Last lag and the worst one since the previous snapshot"""
+        result = {"last_ms": round(self.last_ms, 2), "max_ms": round(self.max_ms, 2), "samples": self.samples}
+        self.max_ms = self.last_ms
+        return result
+
+class HealthProber:
+    """Periodic snapshot of database and event-loop health"""
+
+    def __init__(
+        self,
+        engines: Dict[str, AsyncEngine],
+        lifecycle: Lifecycle,
+        interval: float = 5.0,
+        timeout: float = 2.0,
+        lag_sample_seconds: float = 0.5,
+        tenants: Optional["TenantRegistry"] = None
+    ):
+        self.engines = engines
+        self.lifecycle = lifecycle
+        self.tenants = tenants
+        self.interval = interval
+        self.timeout = timeout
+        self.loop_lag = EventLoopLag(lag_sample_seconds)
+        self.snapshot: Optional[Dict[str, Any]] = None
+        self._taken: Optional[float] = None
+        self._tasks: List[asyncio.Task] = []
+        self.probes = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def age_seconds(self) -> Optional[float]:
+        return round(time.monotonic() - self._taken, 3) if self._taken is not None else None
+
+    async def probe_database(self, engine: AsyncEngine) -> Dict[str, Any]:
+        from app.core.database import get_sqlite_path
+
+        result: Dict[str, Any] = {"status": "healthy"}
+        start = time.perf_counter()
+        try:
+            async with engine.connect() as conn:
+                await asyncio.wait_for(conn.execute(text("SELECT 1")), self.timeout)
+            result["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        except asyncio.TimeoutError:
+            result.update(status="unhealthy", message=f"SELECT 1 took more than {self.timeout}s")
+        except Exception as e:
+            result.update(status="unhealthy", message=f"SQLite connection failed: {e}")
+        result.update(pool_usage(engine))
+        result.update(await asyncio.to_thread(file_sizes, get_sqlite_path(str(engine.url))))
+        return result
+
+    async def probe_tenants(self) -> Dict[str, Dict[str, Any]]:
+        """Open tenant engines only: probing every provisioned tenant would open them all"""
+        results: Dict[str, Dict[str, Any]] = {}
+        for tenant in self.tenants.open_tenants():
+            # Skipped if closed meanwhile, rather than reopened by the lease
+            if tenant not in self.tenants.open_tenants():
+                continue
+            try:
+                async with self.tenants.lease(tenant) as sessions:
+                    results[tenant] = await self.probe_database(sessions.kw["bind"])
+            except Exception as e:
+                results[tenant] = {"status": "unhealthy", "message": str(e)}
+        return results
+
+    async def refresh(self) -> Dict[str, Any]:
+        """Probe every database now and replace the snapshot"""
+        databases = {name: await self.probe_database(engine) for name, engine in self.engines.items()}
+        healthy = all(database["status"] == "healthy" for database in databases.values())
+        self.snapshot = {
+            "status": "healthy" if healthy else "unhealthy",
+            "taken_at": datetime.utcnow().isoformat(),
+            "databases": databases,
+            "event_loop_lag": self.loop_lag.take(),
+        }
+        if self.tenants is not None:
+            self.snapshot["tenants"] = await self.probe_tenants()
+        self._taken = time.monotonic()
+        self.probes += 1
+        return self.snapshot
+
+    def readiness(self) -> Tuple[bool, List[str]]:
+        """Whether to receive traffic, and why not; only reads memory"""
+        reasons = []
+        if not self.lifecycle.ready:
+            reasons.append(f"lifecycle {self.lifecycle.state}")
+        if self.running:
+            if self.snapshot is None:
+                reasons.append("no probe yet")
+            elif self.age_seconds > self.interval * 3:
+                reasons.append(f"probe stale ({self.age_seconds}s)")
+            else:
+                reasons += [
+                    f"database {name} {database['status']}"
+                    for name, database in self.snapshot["databases"].items()
+                    if database["status"] != "healthy"
+                ]
+        return not reasons, reasons
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run()), asyncio.create_task(self.loop_lag.run())]
+            logger.info(f"Health prober started, every {self.interval}s")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Health probe failed: {e}")
+            await asyncio.sleep(self.interval)
+
+def build_health_prober() -> HealthProber:
+    from app.core.database import database_engines
+    from app.core.lifecycle import lifecycle
+    from app.core.tenancy import tenant_registry
+
+    return HealthProber(
+        database_engines,
+        lifecycle,
+        interval=settings.HEALTH_PROBE_INTERVAL_SECONDS,
+        timeout=settings.HEALTH_PROBE_TIMEOUT_SECONDS,
+        lag_sample_seconds=settings.HEALTH_LOOP_LAG_SAMPLE_SECONDS,
+        tenants=tenant_registry if settings.TENANCY_ENABLED else None
+    )
+
+# Global health prober
+health_prober = build_health_prober()
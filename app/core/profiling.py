@@ -0,0 +1,154 @@
+"""
+On-demand per-request profiling (cProfile) with a bounded on-disk ring
+"""
+import asyncio
+import cProfile
+import hmac
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_SLUG_RE = re.compile(r"[^A-Za-z0-9]+")
+_PROFILE_NAME_RE = re.compile(r"^[A-Za-z0-9_.-]+\.prof$")
+
+class ProfileStore:
+    """Directory of ``.prof`` files that keeps only the newest ``max_files``"""
+
+    def __init__(self, directory: str, max_files: int):
+        self.directory = directory
+        self.max_files = max_files
+
+    def save(self, profiler: cProfile.Profile, method: str, path: str,
+             status_code: int, duration_ms: float) -> str:
+        """Dump a profile and prune the oldest files beyond the limit"""
+        os.makedirs(self.directory, exist_ok=True)
+
+        slug = _SLUG_RE.sub("_", path).strip("_")[:60] or "root"
+        name = f"{int(time.time() * 1000)}-{os.urandom(2).hex()}_{method}_{slug}_{status_code}_{int(duration_ms)}ms.prof"
+        profiler.dump_stats(os.path.join(self.directory, name))
+
+        self._prune()
+        return name
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Stored profiles, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+
+        profiles = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or not _PROFILE_NAME_RE.match(entry.name):
+                continue
+            stat = entry.stat()
+            parts = entry.name[:-len(".prof")].split("_")
+            profiles.append({
+                "name": entry.name,
+                "method": parts[1] if len(parts) > 1 else None,
+                "status_code": int(parts[-2]) if len(parts) > 3 and parts[-2].isdigit() else None,
+                "duration_ms": int(parts[-1][:-2]) if parts[-1].endswith("ms") and parts[-1][:-2].isdigit() else None,
+                "size_bytes": stat.st_size,
+                "created_at": stat.st_mtime,
+            })
+
+        profiles.sort(key=lambda profile: profile["created_at"], reverse=True)
+        return profiles
+
+    def path_for(self, name: str) -> Optional[str]:
+        """Absolute path of a stored profile, or None for unknown/unsafe names"""
+        if not _PROFILE_NAME_RE.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def render(self, name: str, limit: int = 50, sort: str = "cumulative") -> Optional[str]:
+        """Human-readable pstats report for a stored profile"""
+        path = self.path_for(name)
+        if path is None:
+            return None
+        buffer = io.StringIO()
+        stats = pstats.Stats(path, stream=buffer)
+        stats.sort_stats(sort).print_stats(limit)
+        return buffer.getvalue()
+
+    def _prune(self) -> None:
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory)
+             if entry.is_file() and entry.name.endswith(".prof")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in entries[:max(0, len(entries) - self.max_files)]:
+            try:
+                os.remove(entry.path)
+            except OSError as e:
+                logger.warning(f"Could not remove old profile {entry.name}: {e}")
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware that profiles sampled or explicitly requested requests.
+
+    A request is profiled when it carries the admin profiling header with
+    the configured token, or when it falls inside ``sample_rate``. cProfile
+    hooks the whole thread, so only one request is profiled at a time and
+    the profile also contains whatever other coroutines ran meanwhile.
+    The middleware is only installed when profiling is enabled, so the
+    disabled path costs nothing.
+    """
+
+    def __init__(self, app, store: ProfileStore, sample_rate: float = 0.0,
+                 header: str = "X-Profile-Token", token: Optional[str] = None):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.header = header.lower().encode("latin-1")
+        self.token = token.encode("latin-1") if token else None
+        self._active = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._active or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        self._active = True
+        status_code = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.disable()
+            self._active = False
+            duration_ms = (time.perf_counter() - start) * 1000
+            try:
+                name = await asyncio.to_thread(
+                    self.store.save, profiler, scope["method"], scope["path"],
+                    status_code, duration_ms
+                )
+                logger.info(f"Request profile saved: {name}")
+            except Exception as e:
+                logger.error(f"Could not save request profile: {e}")
+
+    def _should_profile(self, scope) -> bool:
+        if self.token is not None:
+            for name, value in scope["headers"]:
+                if name == self.header:
+                    return hmac.compare_digest(value, self.token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+# Global profile store
+profile_store = ProfileStore(settings.PROFILING_DIR, settings.PROFILING_MAX_FILES)
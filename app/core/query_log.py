@@ -0,0 +1,152 @@
+"""
+Slow-query log with EXPLAIN QUERY PLAN capture (SQLAlchemy engine events)
+"""
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"IN \((?:\?\s*,\s*)+\?\)", re.IGNORECASE)
+_FULL_SCAN_RE = re.compile(r"\bSCAN (?:TABLE )?users\b")
+
+def normalize_sql(statement: str) -> str:
+    """Collapse whitespace and literals so equivalent statements share one entry"""
+    sql = _WHITESPACE_RE.sub(" ", statement).strip()
+    sql = _STRING_LITERAL_RE.sub("?", sql)
+    sql = _NUMBER_LITERAL_RE.sub("?", sql)
+    return _IN_LIST_RE.sub("IN (?...)", sql)
+
+def redact_parameters(parameters: Any, executemany: bool = False) -> Any:
+    """Keep only the shape of the bound parameters, never their values"""
+    if executemany:
+        return f"<executemany: {len(parameters)} rows>"
+    if isinstance(parameters, dict):
+        return {key: f"<{type(value).__name__}>" for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [f"<{type(value).__name__}>" for value in parameters]
+    return None
+
+class SlowQueryLog:
+    """Top-N statements by total time among those slower than a threshold"""
+
+    def __init__(self, threshold_ms: float, top_n: int = 50, explain: bool = True):
+        self.threshold_ms = threshold_ms
+        self.top_n = top_n
+        self.explain = explain
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def install(self, engine) -> None:
+        """Attach timing hooks to an Engine or AsyncEngine"""
+        sync_engine = getattr(engine, "sync_engine", engine)
+        event.listen(sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Stored on the per-statement context so failed statements leave nothing behind
+        if context is not None:
+            context._slow_query_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_slow_query_start", None)
+        if start is None:
+            return
+        duration_ms = (time.perf_counter() - start) * 1000
+        if duration_ms < self.threshold_ms:
+            return
+
+        try:
+            self._record(conn, statement, parameters, executemany, duration_ms)
+        except Exception as e:
+            # Diagnostics must never break the query that triggered them
+            logger.warning(f"Could not record slow query: {e}")
+
+    def _record(self, conn, statement, parameters, executemany, duration_ms) -> None:
+        sql = normalize_sql(statement)
+        now = datetime.utcnow().isoformat()
+
+        with self._lock:
+            entry = self._entries.get(sql)
+            needs_plan = entry is None or entry["plan"] is None
+
+        plan = self._explain(conn, statement, parameters) if needs_plan and not executemany else None
+
+        with self._lock:
+            entry = self._entries.get(sql)
+            if entry is None:
+                entry = self._entries[sql] = {
+                    "sql": sql,
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "last_ms": 0.0,
+                    "last_parameters": None,
+                    "plan": None,
+                    "full_scan": False,
+                    "temp_b_tree": False,
+                    "first_seen": now,
+                    "last_seen": now,
+                }
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["last_ms"] = duration_ms
+            entry["last_parameters"] = redact_parameters(parameters, executemany)
+            entry["last_seen"] = now
+            if plan is not None:
+                entry["plan"] = plan
+                entry["full_scan"] = any(_FULL_SCAN_RE.search(step) for step in plan)
+                entry["temp_b_tree"] = any("USE TEMP B-TREE" in step for step in plan)
+
+            if len(self._entries) > self.top_n:
+                slowest = sorted(self._entries.values(), key=lambda e: e["total_ms"], reverse=True)
+                self._entries = {e["sql"]: e for e in slowest[:self.top_n]}
+
+        if entry.get("full_scan") and entry["count"] == 1:
+            logger.warning(f"Slow query with full users scan ({duration_ms:.1f} ms): {sql}")
+
+    def _explain(self, conn, statement: str, parameters) -> Optional[List[str]]:
+        if not self.explain or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            return None
+        # A fresh DBAPI cursor: the triggering cursor may still hold unread rows,
+        # and raw execution does not re-enter these event hooks
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            return [row[-1] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def top(self, limit: Optional[int] = None, flagged_only: bool = False) -> List[Dict[str, Any]]:
+        """Entries ordered by total time, optionally only full-scan ones"""
+        with self._lock:
+            entries = [dict(entry) for entry in self._entries.values()]
+        if flagged_only:
+            entries = [entry for entry in entries if entry["full_scan"]]
+        entries.sort(key=lambda entry: entry["total_ms"], reverse=True)
+        for entry in entries:
+            entry["avg_ms"] = entry["total_ms"] / entry["count"]
+        return entries[:limit] if limit else entries
+
+    def reset(self) -> None:
+        """Forget every recorded statement"""
+        with self._lock:
+            self._entries.clear()
+
+# Global slow-query log
+slow_query_log = SlowQueryLog(
+    threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+    top_n=settings.SLOW_QUERY_TOP_N,
+    explain=settings.SLOW_QUERY_EXPLAIN
+)
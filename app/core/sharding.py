@@ -0,0 +1,110 @@
+"""
+Horizontal sharding of users across several SQLite files
+
+Users are routed by a jump consistent hash of their id, so every process
+agrees on the shard of a user without a lookup and growing from N to N+1
+shards only moves about 1/(N+1) of the users. Ids, emails and usernames are
+allocated in a small directory table in the main database (DATABASE_URL);
+the users and their change entries live in the shard files.
+"""
+import os
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+
+from app.core.config import settings
+
+def jump_hash(key: int, buckets: int) -> int:
+    """Jump consistent hash (Lamping & Veach): bucket in [0, buckets) for key"""
+    key &= 0xFFFFFFFFFFFFFFFF
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return b
+
+def shard_name(index: int) -> str:
+    return f"shard_{index}"
+
+def shard_for(user_id: int, shard_count: Optional[int] = None) -> str:
+    """Name of the shard that stores user_id"""
+    return shard_name(jump_hash(int(user_id), shard_count or settings.SHARD_COUNT))
+
+def shard_path(index: int, template: Optional[str] = None) -> str:
+    """Absolute path of a shard file"""
+    return os.path.abspath((template or settings.SHARD_PATH_TEMPLATE).format(index=index))
+
+def shard_urls(shard_count: Optional[int] = None, template: Optional[str] = None) -> Dict[str, str]:
+    """Async database URL of every shard, keyed by shard name"""
+    count = shard_count or settings.SHARD_COUNT
+    return {
+        shard_name(index): f"sqlite+aiosqlite:///{shard_path(index, template)}"
+        for index in range(count)
+    }
+
+def group_by_shard(user_ids: Iterable[int], shard_count: int) -> Dict[str, List[int]]:
+    """Split ids by the shard that stores them"""
+    groups: Dict[str, List[int]] = defaultdict(list)
+    for user_id in user_ids:
+        groups[shard_for(user_id, shard_count)].append(user_id)
+    return groups
+
+def make_sharded_sessionmaker(
+    shard_engines: Dict[str, AsyncEngine],
+    directory_sessions: Callable[[], AsyncSession]
+) -> async_sessionmaker:
+    """
+    Session factory whose sessions route each statement to its shard
+
+    - Flushes go to the shard of the instance (``User.id`` or
+      ``UserChange.user_id``), so ids must be allocated before the insert.
+    - Statements with a ``user_id`` parameter run on that user's shard;
+      anything else runs on every shard and the results are concatenated.
+    - ``bind_arguments={"shard_id": ...}`` pins a statement to one shard.
+
+    The directory session factory and the shard engines travel in
+    ``session.info`` so the repository can reach them without a second
+    dependency.
+    """
+    from app.models.user import User
+    from app.models.user_change import UserChange
+
+    shard_count = len(shard_engines)
+    names = list(shard_engines)
+
+    def shard_chooser(mapper, instance, clause=None) -> str:
+        if isinstance(instance, User):
+            return shard_for(instance.id, shard_count)
+        if isinstance(instance, UserChange):
+            return shard_for(instance.user_id, shard_count)
+        # Plain SQL without an instance (health checks, PRAGMAs)
+        return names[0]
+
+    def identity_chooser(mapper, primary_key, **kwargs) -> List[str]:
+        if mapper is not None and mapper.class_ is User:
+            return [shard_for(primary_key[0], shard_count)]
+        return names
+
+    def execute_chooser(orm_context) -> List[str]:
+        parameters: Any = orm_context.parameters
+        if isinstance(parameters, dict) and parameters.get("user_id") is not None:
+            return [shard_for(parameters["user_id"], shard_count)]
+        return names
+
+    return async_sessionmaker(
+        class_=AsyncSession,
+        sync_session_class=ShardedSession,
+        shards={name: engine.sync_engine for name, engine in shard_engines.items()},
+        shard_chooser=shard_chooser,
+        identity_chooser=identity_chooser,
+        execute_chooser=execute_chooser,
+        expire_on_commit=False,
+        info={
+            "directory_sessions": directory_sessions,
+            "shard_count": shard_count,
+            "shard_engines": shard_engines,
+        }
+    )
@@ -0,0 +1,96 @@
+"""
+Single-flight coalescing of concurrent identical async calls
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """Share one in-flight execution among concurrent callers with the same key.
+
+    Only calls that overlap in time are coalesced: once the leader finishes,
+    its result is handed to every waiting follower and the key is released,
+    so nothing is cached beyond the lifetime of the query itself. ``fn``
+    runs in the leader's task (it uses the leader's session); if the leader
+    is cancelled, a waiting follower takes over and runs its own ``fn``.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.retries = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run ``fn`` for ``key`` or await the execution already in flight"""
+        self.calls += 1
+
+        future = self._inflight.get(key)
+        while future is not None:
+            self.coalesced += 1
+            try:
+                # shield: a cancelled follower must not cancel the shared future
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Only the leader was cancelled (e.g. its client went away): the
+                # followers were not, so one of them runs ``fn`` as the new leader
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                self.retries += 1
+                future = self._inflight.get(key)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self.executions += 1
+
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            self.errors += 1
+            future.set_exception(e)
+            # Mark as retrieved so a flight without followers doesn't warn
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for health and monitoring endpoints"""
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "retries": self.retries,
+            "in_flight": len(self._inflight),
+        }
+
+    def reset(self) -> None:
+        """Reset the counters (in-flight calls are left untouched)"""
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.retries = 0
+
+# Global groups for the user read path
+user_lookups = SingleFlight("user_lookups")
+user_lists = SingleFlight("user_lists")
+
+def singleflight_stats() -> Dict[str, Dict[str, Any]]:
+    """Counters of every single-flight group"""
+    return {group.name: group.stats() for group in (user_lookups, user_lists)}
@@ -0,0 +1,307 @@
+"""
+Per-tenant SQLite databases with an LRU-bounded registry of open engines
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from jose import JWTError, jwt
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.core.database import Base, create_database_engine, create_missing_indexes, user_tables
+from app.core.exceptions import NotFoundException, ValidationException
+
+logger = logging.getLogger(__name__)
+
+# Tenant of the request being served (set by TenantMiddleware)
+current_tenant: ContextVar[Optional[str]] = ContextVar("current_tenant", default=None)
+
+# Tenant ids become file names: lowercase letters, digits, "-" and "_"
+TENANT_ID_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+
+def validate_tenant_id(tenant: Optional[str]) -> str:
+    """Return the tenant id or raise ValidationException"""
+    if not tenant:
+        raise ValidationException(f"Se requiere el tenant (cabecera {settings.TENANT_HEADER})")
+    if not TENANT_ID_PATTERN.match(tenant):
+        raise ValidationException("Identificador de tenant inválido")
+    return tenant
+
+class _TenantEngine:
+    """An open engine, its session factory, when it was last used and its leases"""
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        self.last_used = time.monotonic()
+        # Requests and jobs using the engine right now: never evicted meanwhile
+        self.in_use = 0
+
+class TenantRegistry:
+    """
+    Lazily opened engines for tenant databases, bounded in number and idle time
+
+    Engines are kept in least-recently-used order. Opening one more than
+    ``max_engines`` disposes the least recently used, and engines unused for
+    ``idle_seconds`` are disposed by the background sweep. Engines leased by
+    a running request or job (``lease``) are skipped by both, so the limit
+    can be exceeded while every open engine is in use. Only provisioned
+    tenants (whose file exists) can be opened, so a typo in a header never
+    creates an empty database.
+    """
+
+    def __init__(self, path_template: str, max_engines: int = 32, idle_seconds: float = 300):
+        self.path_template = path_template
+        self.max_engines = max_engines
+        self.idle_seconds = idle_seconds
+        self._engines: "OrderedDict[str, _TenantEngine]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.opened = 0
+        self.evicted = 0
+
+    def path_for(self, tenant: str) -> str:
+        """Absolute path of a tenant database"""
+        return os.path.abspath(self.path_template.format(tenant=validate_tenant_id(tenant)))
+
+    def exists(self, tenant: str) -> bool:
+        return os.path.isfile(self.path_for(tenant))
+
+    async def sessionmaker_for(self, tenant: Optional[str]) -> async_sessionmaker:
+        """
+        Session factory for a provisioned tenant, opening its engine if needed
+
+        The engine may be evicted as soon as the caller awaits: code that
+        keeps using it must hold a ``lease`` instead.
+        """
+        return (await self._entry(tenant)).sessions
+
+    @asynccontextmanager
+    async def lease(self, tenant: Optional[str]) -> AsyncIterator[async_sessionmaker]:
+        """Session factory whose engine stays open until the block exits"""
+        entry = await self._entry(tenant)
+        entry.in_use += 1
+        try:
+            yield entry.sessions
+        finally:
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+
+    async def _entry(self, tenant: Optional[str]) -> _TenantEngine:
+        tenant = validate_tenant_id(tenant)
+
+        entry = self._engines.get(tenant)
+        if entry is None:
+            async with self._lock:
+                entry = self._engines.get(tenant)
+                if entry is None:
+                    entry = await self._open(tenant)
+
+        entry.last_used = time.monotonic()
+        self._engines.move_to_end(tenant)
+        return entry
+
+    async def _open(self, tenant: str) -> _TenantEngine:
+        path = self.path_for(tenant)
+        if not os.path.isfile(path):
+            raise NotFoundException("Tenant no encontrado")
+
+        while len(self._engines) >= self.max_engines:
+            oldest = next((t for t, e in self._engines.items() if not e.in_use), None)
+            if oldest is None:
+                logger.warning(f"Every tenant engine is in use, opening {tenant} above the limit")
+                break
+            await self.evict(oldest)
+
+        entry = _TenantEngine(create_database_engine(f"sqlite+aiosqlite:///{path}"))
+        # Tenants provisioned before an index was added to the models
+        async with entry.engine.begin() as conn:
+            await conn.run_sync(create_missing_indexes, user_tables())
+        self._engines[tenant] = entry
+        self.opened += 1
+        logger.info(f"Tenant engine opened: {tenant} ({len(self._engines)}/{self.max_engines})")
+        return entry
+
+    async def evict(self, tenant: str) -> bool:
+        """
+        Dispose a tenant engine, even if it is leased
+
+        Only for shutdown and teardown: a session still using the engine
+        would open its next connection on a pool nobody disposes. The LRU
+        limit and the idle sweep skip leased engines instead.
+        """
+        entry = self._engines.pop(tenant, None)
+        if entry is None:
+            return False
+        await entry.engine.dispose()
+        self.evicted += 1
+        logger.info(f"Tenant engine closed: {tenant}")
+        return True
+
+    async def evict_idle(self) -> int:
+        """Dispose engines unused for more than idle_seconds"""
+        cutoff = time.monotonic() - self.idle_seconds
+        idle = [tenant for tenant, entry in self._engines.items() if entry.last_used < cutoff]
+        evicted = 0
+        for tenant in idle:
+            entry = self._engines.get(tenant)
+            # Re-checked here: a request may have leased it during an earlier dispose
+            if entry is not None and not entry.in_use and entry.last_used < cutoff:
+                await self.evict(tenant)
+                evicted += 1
+        return evicted
+
+    async def provision(self, tenant: str) -> str:
+        """Create a tenant database with every user table"""
+        path = self.path_for(tenant)
+        if os.path.exists(path):
+            raise ValidationException(f"El tenant {tenant} ya existe")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        engine = create_database_engine(f"sqlite+aiosqlite:///{path}")
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all, tables=user_tables())
+        finally:
+            await engine.dispose()
+        logger.info(f"Tenant provisioned: {tenant} ({path})")
+        return path
+
+    async def teardown(self, tenant: str) -> List[str]:
+        """Close a tenant engine and delete its database files"""
+        path = self.path_for(tenant)
+        if not os.path.exists(path):
+            raise NotFoundException("Tenant no encontrado")
+        await self.evict(tenant)
+
+        removed = []
+        for file_path in (path, path + "-wal", path + "-shm"):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+                removed.append(file_path)
+        logger.info(f"Tenant removed: {tenant}")
+        return removed
+
+    def open_tenants(self) -> List[str]:
+        """Tenants whose engine is currently open"""
+        return list(self._engines)
+
+    def list_tenants(self) -> List[str]:
+        """Provisioned tenants (database files matching the path template)"""
+        directory = os.path.dirname(os.path.abspath(self.path_template.format(tenant="x")))
+        prefix, _, suffix = os.path.basename(self.path_template).partition("{tenant}")
+        if not os.path.isdir(directory):
+            return []
+        tenants = []
+        for name in os.listdir(directory):
+            if name.startswith(prefix) and name.endswith(suffix):
+                tenant = name[len(prefix):len(name) - len(suffix)]
+                if TENANT_ID_PATTERN.match(tenant):
+                    tenants.append(tenant)
+        return sorted(tenants)
+
+    def start_sweeper(self, interval_seconds: float = 60) -> None:
+        """Close idle engines in the background"""
+        if self._task is None and self.idle_seconds > 0:
+            self._task = asyncio.create_task(self._sweep(interval_seconds))
+
+    async def stop(self) -> None:
+        """Stop the sweep and dispose every open engine"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for tenant in list(self._engines):
+            await self.evict(tenant)
+
+    async def _sweep(self, interval_seconds: float) -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.evict_idle()
+            except Exception as e:
+                logger.error(f"Tenant engine sweep failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Summary for health endpoints"""
+        return {
+            "open_engines": len(self._engines),
+            "leased_engines": sum(1 for entry in self._engines.values() if entry.in_use),
+            "max_engines": self.max_engines,
+            "opened": self.opened,
+            "evicted": self.evicted,
+        }
+
+class TenantMiddleware:
+    """Pure ASGI middleware that sets ``current_tenant`` for the request.
+
+    The tenant comes from the tenant header or, failing that, from the
+    tenant claim of a valid bearer token. Authentication later checks that
+    the token claim matches the resolved tenant, so a token issued for one
+    tenant cannot be replayed against another with a different header.
+    """
+
+    def __init__(self, app, header: str = "X-Tenant-ID", claim: str = "tenant"):
+        self.app = app
+        self.header = header.lower().encode("latin-1")
+        self.claim = claim
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tenant = self.resolve(scope)
+        if tenant is not None and not TENANT_ID_PATTERN.match(tenant):
+            await self._reject(send, "Identificador de tenant inválido")
+            return
+
+        token = current_tenant.set(tenant)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_tenant.reset(token)
+
+    def resolve(self, scope) -> Optional[str]:
+        bearer = None
+        for name, value in scope["headers"]:
+            if name == self.header:
+                return value.decode("latin-1").strip().lower()
+            if name == b"authorization" and value[:7].lower() == b"bearer ":
+                bearer = value[7:].decode("latin-1").strip()
+
+        if bearer:
+            try:
+                payload = jwt.decode(bearer, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+            except JWTError:
+                return None
+            return payload.get(self.claim)
+        return None
+
+    async def _reject(self, send, message: str) -> None:
+        body = json.dumps({"error": "VALIDATION_ERROR", "message": message, "details": {}}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 422,
+            "headers": [(b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+# Global tenant registry
+tenant_registry = TenantRegistry(
+    settings.TENANT_PATH_TEMPLATE,
+    max_engines=settings.TENANT_MAX_ENGINES,
+    idle_seconds=settings.TENANT_IDLE_SECONDS
+)
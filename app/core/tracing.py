@@ -0,0 +1,540 @@
+"""
+Lightweight request tracing: spans per layer, W3C ``traceparent`` and exporters
+
+A sampled request opens a server span in ``TracingMiddleware``; the router
+handler, the ``UserService``/``UserRepository`` methods, every SQL statement
+and every bcrypt hash or verify open child spans of whatever span is current
+(a context variable, so spans follow the request into gathered tasks and
+``to_thread`` calls). When the request is not sampled there is no current
+span and each instrumentation point costs one context-variable lookup.
+
+An incoming ``traceparent`` header continues the caller's trace and follows
+its sampled flag; otherwise requests are sampled at ``sample_rate``. Sampled
+responses carry a ``traceresponse`` header with the server span.
+
+Finished spans always land in a bounded in-memory ring (the admin traces
+endpoints read it) and, in batches written by a background task, in a JSONL
+file or an OTLP/HTTP (JSON encoding) collector. ``scripts/bench_tracing.py``
+measures the cost per span.
+"""
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.query_log import normalize_sql
+
+logger = logging.getLogger(__name__)
+
+_TRACEPARENT_RE = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# OTLP enum values
+_OTLP_KINDS = {"internal": 1, "server": 2, "client": 3}
+_OTLP_STATUS = {"ok": 1, "error": 2}
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """(trace_id, parent span_id, sampled) of a valid W3C ``traceparent``, else None"""
+    if not value:
+        return None
+    match = _TRACEPARENT_RE.match(value.strip().lower())
+    if match is None:
+        return None
+    version, trace_id, span_id, flags = match.groups()
+    if version == "ff" or trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id, bool(int(flags, 16) & 1)
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+class Span:
+    """One timed operation; a context manager that makes itself the current span"""
+
+    __slots__ = (
+        "tracer", "trace_id", "span_id", "parent_id", "name", "kind",
+        "start_ns", "end_ns", "attributes", "status", "error", "_token"
+    )
+
+    def __init__(self, tracer: "Tracer", trace_id: str, parent_id: Optional[str], name: str,
+                 kind: str = "internal", attributes: Optional[Dict[str, Any]] = None):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.end_ns: Optional[int] = None
+        self._token = None
+        self.start_ns = time.time_ns()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def child(self, name: str, kind: str = "internal", **attributes) -> "Span":
+        return Span(self.tracer, self.trace_id, self.span_id, name, kind, attributes)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return (self.end_ns - self.start_ns) / 1e6 if self.end_ns is not None else None
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.status = "error"
+            self.error = f"{type(error).__name__}: {error}"
+        self.tracer.finish(self)
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        _current_span.reset(self._token)
+        self.end(exc)
+        return False
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": datetime.fromtimestamp(self.start_ns / 1e9, timezone.utc).isoformat(),
+            "duration_ms": round(self.duration_ms, 3) if self.end_ns is not None else None,
+            "attributes": self.attributes,
+            "status": self.status,
+            "error": self.error,
+        }
+
+class _NoSpan:
+    """Stand-in for unsampled work: entering it does nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+_NO_SPAN = _NoSpan()
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+def start_span(name: str, kind: str = "internal", **attributes):
+    """Child of the current span, or a no-op when the request is not traced"""
+    parent = _current_span.get()
+    if parent is None:
+        return _NO_SPAN
+    return parent.child(name, kind, **attributes)
+
+def traced(name: str, **attributes) -> Callable:
+    """Decorator: run the function (sync or async) inside a span named ``name``"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                parent = _current_span.get()
+                if parent is None:
+                    return await func(*args, **kwargs)
+                with parent.child(name, **attributes):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            parent = _current_span.get()
+            if parent is None:
+                return func(*args, **kwargs)
+            with parent.child(name, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def trace_layer(layer: str) -> Callable:
+    """Class decorator: a ``<Class>.<method>`` span for every public coroutine method"""
+    def decorator(cls):
+        for name, value in list(vars(cls).items()):
+            if not name.startswith("_") and inspect.iscoroutinefunction(value):
+                setattr(cls, name, traced(f"{cls.__name__}.{name}", layer=layer)(value))
+        return cls
+    return decorator
+
+class TracedRoute(APIRoute):
+    """Route class that wraps the handler (dependencies, endpoint, serialization) in a span"""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        name = f"router.{self.endpoint.__name__}"
+
+        async def traced_handler(request):
+            parent = _current_span.get()
+            if parent is None:
+                return await handler(request)
+            with parent.child(name, layer="router"):
+                return await handler(request)
+        return traced_handler
+
+def install_db_tracing(engine) -> None:
+    """Client spans for the statements of an Engine or AsyncEngine"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    database = os.path.basename(sync_engine.url.database or "") or ":memory:"
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        parent = _current_span.get()
+        if parent is None or context is None:
+            return
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+        # Literals are collapsed: no user data in the exported statement
+        context._trace_span = parent.child(
+            f"db.{verb}", "client", layer="db", **{
+                "db.system": "sqlite", "db.name": database,
+                "db.statement": normalize_sql(statement), "db.executemany": executemany,
+            }
+        )
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        span = getattr(context, "_trace_span", None)
+        if span is not None:
+            if cursor.rowcount is not None and cursor.rowcount >= 0:
+                span.attributes["db.rows_affected"] = cursor.rowcount
+            span.end()
+
+    def handle_error(exception_context):
+        span = getattr(exception_context.execution_context, "_trace_span", None)
+        if span is not None:
+            span.end(exception_context.original_exception)
+
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(sync_engine, "handle_error", handle_error)
+
+class MemorySpanExporter:
+    """Bounded ring of the most recent finished spans"""
+
+    name = "memory"
+
+    def __init__(self, max_spans: int = 5000):
+        self._spans: Deque[Span] = deque(maxlen=max_spans)
+
+    def add(self, span: Span) -> None:
+        self._spans.append(span)
+
+    def export(self, spans: List[Span]) -> None:
+        self._spans.extend(spans)
+
+    def traces(self, limit: int = 50, min_duration_ms: float = 0) -> List[Dict[str, Any]]:
+        """Summary of the traces whose root span is still in the ring, newest first"""
+        spans = list(self._spans)
+        counts: Dict[str, int] = {}
+        for span in spans:
+            counts[span.trace_id] = counts.get(span.trace_id, 0) + 1
+        roots = [span for span in spans if span.kind == "server" and span.duration_ms >= min_duration_ms]
+        roots.sort(key=lambda span: span.start_ns, reverse=True)
+        return [
+            {**root.as_dict(), "spans": counts[root.trace_id]}
+            for root in roots[:limit]
+        ]
+
+    def trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        """Spans of one trace in start order"""
+        spans = sorted((span for span in self._spans if span.trace_id == trace_id), key=lambda span: span.start_ns)
+        return [span.as_dict() for span in spans]
+
+    def close(self) -> None:
+        pass
+
+class JsonlSpanExporter:
+    """One JSON object per span appended to a file, rotated once past ``max_bytes``"""
+
+    name = "file"
+
+    def __init__(self, path: str, max_bytes: int = 50 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def export(self, spans: List[Span]) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+            os.replace(self.path, self.path + ".1")
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(span.as_dict(), separators=(",", ":")) + "\n" for span in spans)
+
+    def close(self) -> None:
+        pass
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+class OtlpHttpExporter:
+    """POST batches to an OTLP/HTTP collector (``/v1/traces``, JSON encoding)"""
+
+    name = "otlp"
+
+    def __init__(self, endpoint: str, service_name: str, headers: Optional[Dict[str, str]] = None,
+                 timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+        self.timeout = timeout
+
+    def encode(self, spans: List[Span]) -> Dict[str, Any]:
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": _otlp_value(self.service_name)}]},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [self._encode_span(span) for span in spans],
+            }],
+        }]}
+
+    @staticmethod
+    def _encode_span(span: Span) -> Dict[str, Any]:
+        encoded = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": _OTLP_KINDS[span.kind],
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+            "status": {"code": _OTLP_STATUS[span.status]},
+        }
+        if span.parent_id:
+            encoded["parentSpanId"] = span.parent_id
+        if span.error:
+            encoded["status"]["message"] = span.error
+        return encoded
+
+    def export(self, spans: List[Span]) -> None:
+        body = json.dumps(self.encode(spans), separators=(",", ":")).encode()
+        request = urllib.request.Request(self.endpoint, data=body, headers=self.headers, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    def close(self) -> None:
+        pass
+
+class Tracer:
+    """Sampling decision, finished-span buffer and the background exporter"""
+
+    def __init__(
+        self,
+        exporter=None,
+        sample_rate: float = 0.0,
+        memory_spans: int = 5000,
+        max_pending: int = 10000,
+        batch_size: int = 512,
+        flush_interval: float = 2.0
+    ):
+        self.memory = MemorySpanExporter(memory_spans)
+        # None: spans only go to the memory ring
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: List[Span] = []
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.traces = 0
+        self.unsampled = 0
+        self.spans = 0
+        self.dropped = 0
+        self.exported = 0
+        self.export_errors = 0
+
+    def start_trace(self, name: str, traceparent: Optional[str] = None, kind: str = "server",
+                    **attributes) -> Optional[Span]:
+        """Root span of a request, or None when it is not sampled"""
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id = None, None
+            sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not sampled:
+            self.unsampled += 1
+            return None
+        self.traces += 1
+        return Span(self, trace_id or _new_id(128), parent_id, name, kind, attributes)
+
+    def finish(self, span: Span) -> None:
+        # Called from the event loop and from to_thread workers
+        with self._lock:
+            self.spans += 1
+            self.memory.add(span)
+            if self.exporter is None:
+                return
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending.append(span)
+
+    async def flush(self) -> int:
+        """Send every pending span to the exporter; returns how many were sent"""
+        sent = 0
+        while self.exporter is not None:
+            with self._lock:
+                batch = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+            if not batch:
+                break
+            try:
+                await asyncio.to_thread(self.exporter.export, batch)
+                self.exported += len(batch)
+                sent += len(batch)
+            except Exception as e:
+                # Traces are best effort: a failing collector loses the batch, not the request
+                self.export_errors += 1
+                self.dropped += len(batch)
+                logger.warning(f"Could not export {len(batch)} spans to {self.exporter.name}: {e}")
+        return sent
+
+    def start(self) -> None:
+        if self._task is None and self.exporter is not None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Tracing started, sample rate {self.sample_rate}, exporter {self.exporter.name}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self.exporter is not None:
+            self.exporter.close()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            # shield: stop() must not cut an export in half
+            await asyncio.shield(self.flush())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sample_rate": self.sample_rate,
+            "exporter": self.exporter.name if self.exporter is not None else "memory",
+            "traces": self.traces,
+            "unsampled": self.unsampled,
+            "spans": self.spans,
+            "pending": len(self._pending),
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "export_errors": self.export_errors,
+        }
+
+class TracingMiddleware:
+    """Pure ASGI middleware that opens the server span of sampled requests"""
+
+    def __init__(self, app, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        span = self.tracer.start_trace(
+            f"{scope['method']} {scope['path']}", traceparent,
+            **{"http.method": scope["method"], "http.target": scope["path"]}
+        )
+        if span is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                span.attributes["http.status_code"] = status_code
+                if status_code >= 500:
+                    span.status = "error"
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"traceresponse", span.traceparent.encode())
+                ]
+            await send(message)
+
+        with span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                # Route template once routing has run: low-cardinality span names
+                route = scope.get("route")
+                if route is not None:
+                    span.name = f"{scope['method']} {route.path}"
+                    span.attributes["http.route"] = route.path
+
+def parse_headers(value: str) -> Dict[str, str]:
+    """``key=value,key=value`` (as in OTEL_EXPORTER_OTLP_HEADERS)"""
+    headers = {}
+    for item in value.split(","):
+        key, _, header_value = item.partition("=")
+        if key.strip():
+            headers[key.strip()] = header_value.strip()
+    return headers
+
+def build_tracer() -> Tracer:
+    exporter = None
+    if settings.TRACING_EXPORTER == "file":
+        exporter = JsonlSpanExporter(settings.TRACING_FILE, settings.TRACING_FILE_MAX_BYTES)
+    elif settings.TRACING_EXPORTER == "otlp":
+        exporter = OtlpHttpExporter(
+            settings.TRACING_OTLP_ENDPOINT,
+            settings.PROJECT_NAME,
+            parse_headers(settings.TRACING_OTLP_HEADERS)
+        )
+    return Tracer(
+        exporter,
+        sample_rate=settings.TRACING_SAMPLE_RATE,
+        memory_spans=settings.TRACING_MEMORY_SPANS,
+        max_pending=settings.TRACING_MAX_PENDING,
+        flush_interval=settings.TRACING_FLUSH_SECONDS
+    )
+
+# Global tracer
+tracer = build_tracer()
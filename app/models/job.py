@@ -0,0 +1,44 @@
+"""
+Modelo de trabajos en segundo plano (cola persistente de operaciones de administración)
+"""
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Index
+from app.core.database import Base
+
+# Estados de un trabajo; succeeded, failed y cancelled son finales
+JOB_STATUSES = ("pending", "running", "succeeded", "failed", "cancelled")
+FINAL_JOB_STATUSES = ("succeeded", "failed", "cancelled")
+
+class Job(Base):
+    """Trabajo encolado, con su progreso y el punto desde el que se reanuda"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Los workers toman el trabajo pendiente más antiguo
+        Index("ix_jobs_status_id", "status", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    type = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default="pending")
+    # Tenant cuyos datos procesa (modo multi-tenant)
+    tenant = Column(String(63), nullable=True)
+    created_by = Column(Integer, nullable=True)
+
+    # Parámetros, checkpoint y resultado en JSON
+    params = Column(Text, nullable=True)
+    checkpoint = Column(Text, nullable=True)
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+
+    progress_done = Column(Integer, nullable=False, default=0)
+    progress_total = Column(Integer, nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    attempts = Column(Integer, nullable=False, default=0)
+
+    # Timestamps (UTC, asignados por la aplicación)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<Job(id={self.id}, type='{self.type}', status='{self.status}')>"
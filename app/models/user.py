@@ -1,16 +1,22 @@
 """
 Modelo de usuario para SQLAlchemy
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Listado filtrado por estado y ordenado por fecha: sin recorrer la
+        # tabla ni ordenar en un B-tree temporal (scripts/index_advisor.py)
+        Index("ix_users_is_active_created_at", "is_active", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    email = Column(String(255), unique=True, index=True, nullable=False)
-    username = Column(String(50), unique=True, index=True, nullable=False)
+    # Únicos sin distinguir mayúsculas: ver los índices NOCASE al final
+    email = Column(String(255), nullable=False)
+    username = Column(String(50), nullable=False)
     first_name = Column(String(50), nullable=False)
     last_name = Column(String(50), nullable=False)
     hashed_password = Column(String(255), nullable=False)
@@ -21,7 +27,7 @@ class User(Base):
     avatar_url = Column(String(500), nullable=True)
     
     # Timestamps
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     last_login = Column(DateTime(timezone=True), nullable=True)
     
@@ -32,3 +38,9 @@ class User(Base):
     def full_name(self) -> str:
         """Nombre completo del usuario"""
         return f"{self.first_name} {self.last_name}"
+
+# Unicidad y búsquedas por email y username sin distinguir mayúsculas (ASCII):
+# login, alta y comprobaciones de disponibilidad comparan con COLLATE NOCASE
+# y usan estos índices en lugar de recorrer la tabla
+Index("ix_users_email_nocase", User.email.collate("NOCASE"), unique=True)
+Index("ix_users_username_nocase", User.username.collate("NOCASE"), unique=True)
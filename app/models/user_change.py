@@ -0,0 +1,25 @@
+"""
+Modelo del registro de cambios de usuarios (change feed)
+"""
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class UserChange(Base):
+    __tablename__ = "user_changes"
+    __table_args__ = (
+        # Compactación: localizar la última entrada de cada usuario
+        Index("ix_user_changes_user_seq", "user_id", "seq"),
+        # AUTOINCREMENT garantiza que un seq nunca se reutiliza tras compactar
+        {"sqlite_autoincrement": True},
+    )
+    
+    seq = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    operation = Column(String(20), nullable=False)
+    # Estado público del usuario tras el cambio (JSON); NULL para borrados
+    payload = Column(Text, nullable=True)
+    changed_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    
+    def __repr__(self):
+        return f"<UserChange(seq={self.seq}, user_id={self.user_id}, operation='{self.operation}')>"
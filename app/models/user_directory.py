@@ -0,0 +1,25 @@
+"""
+Modelo del directorio de usuarios para el modo particionado (sharding)
+"""
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class UserDirectoryEntry(Base):
+    """Asigna IDs globales y garantiza la unicidad de email y username entre shards"""
+    __tablename__ = "user_directory"
+    # AUTOINCREMENT: un ID liberado al borrar un usuario nunca se reasigna
+    __table_args__ = {"sqlite_autoincrement": True}
+    
+    id = Column(Integer, primary_key=True)
+    # Únicos sin distinguir mayúsculas: ver los índices NOCASE al final
+    email = Column(String(255), nullable=False)
+    username = Column(String(50), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<UserDirectoryEntry(id={self.id}, username='{self.username}')>"
+
+# Mismo criterio que en la tabla users: email y username sin distinguir mayúsculas
+Index("ix_user_directory_email_nocase", UserDirectoryEntry.email.collate("NOCASE"), unique=True)
+Index("ix_user_directory_username_nocase", UserDirectoryEntry.username.collate("NOCASE"), unique=True)
@@ -0,0 +1,59 @@
+"""
+Repositorio para el registro de cambios de usuarios
+"""
+from typing import List
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, delete
+from sqlalchemy.orm import aliased
+import logging
+
+from app.models.user_change import UserChange
+
+logger = logging.getLogger(__name__)
+
+class ChangeRepository:
+    """Repositorio de lectura y compactación del change feed"""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def get_since(self, since: int, limit: int) -> List[UserChange]:
+        """Obtener los cambios con seq mayor que `since`, en orden"""
+        result = await self.db.execute(
+            select(UserChange)
+            .where(UserChange.seq > since)
+            .order_by(UserChange.seq)
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+    
+    async def get_latest_seq(self) -> int:
+        """Obtener el último número de secuencia confirmado"""
+        result = await self.db.execute(select(func.max(UserChange.seq)))
+        return result.scalar() or 0
+    
+    async def compact(self, cutoff: datetime) -> int:
+        """
+        Eliminar entradas anteriores a `cutoff` que ya tienen una entrada posterior
+        
+        Cada entrada guarda el estado completo del usuario, así que conservar la
+        última de cada usuario mantiene el registro como fuente completa: un
+        consumidor que empieza desde 0 sigue reconstruyendo todo el estado.
+        """
+        newer = aliased(UserChange)
+        superseded = (
+            select(newer.seq)
+            .where(newer.user_id == UserChange.user_id, newer.seq > UserChange.seq)
+            .exists()
+        )
+        
+        result = await self.db.execute(
+            delete(UserChange)
+            .where(UserChange.changed_at < cutoff, superseded)
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
+        
+        logger.info(f"Change feed compactado: {result.rowcount} entradas eliminadas")
+        return result.rowcount
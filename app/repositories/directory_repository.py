@@ -0,0 +1,56 @@
+"""
+Repositorio del directorio de usuarios (modo particionado)
+"""
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import select, delete
+import logging
+
+from app.models.user_directory import UserDirectoryEntry
+from app.core.exceptions import ConflictException
+
+logger = logging.getLogger(__name__)
+
+class DirectoryRepository:
+    """IDs globales y unicidad de email/username para todos los shards"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def reserve(self, email: str, username: str) -> int:
+        """Reservar email y username y asignar el ID global del nuevo usuario"""
+        entry = UserDirectoryEntry(email=email, username=username)
+        self.db.add(entry)
+        try:
+            await self.db.commit()
+        except IntegrityError as e:
+            await self.db.rollback()
+            logger.warning(f"Error de integridad en el directorio: {e}")
+
+            if "email" in str(e):
+                raise ConflictException("El email ya está registrado")
+            elif "username" in str(e):
+                raise ConflictException("El nombre de usuario ya está en uso")
+            else:
+                raise ConflictException("Error de datos duplicados")
+        return entry.id
+
+    async def release(self, user_id: int) -> None:
+        """Liberar la entrada de un usuario borrado o cuya creación falló"""
+        await self.db.execute(delete(UserDirectoryEntry).where(UserDirectoryEntry.id == user_id))
+        await self.db.commit()
+
+    async def id_for_email(self, email: str) -> Optional[int]:
+        """ID del usuario con ese email (sin distinguir mayúsculas)"""
+        result = await self.db.execute(
+            select(UserDirectoryEntry.id).where(UserDirectoryEntry.email.collate("NOCASE") == email)
+        )
+        return result.scalars().first()
+
+    async def id_for_username(self, username: str) -> Optional[int]:
+        """ID del usuario con ese username (sin distinguir mayúsculas)"""
+        result = await self.db.execute(
+            select(UserDirectoryEntry.id).where(UserDirectoryEntry.username.collate("NOCASE") == username)
+        )
+        return result.scalars().first()
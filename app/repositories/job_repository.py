@@ -0,0 +1,194 @@
+"""
+Repositorio para la cola persistente de trabajos
+"""
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+import json
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, update
+import logging
+
+from app.models.job import Job
+
+logger = logging.getLogger(__name__)
+
+def _dumps(value: Optional[Dict[str, Any]]) -> Optional[str]:
+    return json.dumps(value, separators=(",", ":"), default=str) if value is not None else None
+
+class JobRepository:
+    """Altas, reclamación por los workers, progreso y cierre de trabajos"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create(
+        self,
+        job_type: str,
+        params: Dict[str, Any],
+        tenant: Optional[str] = None,
+        created_by: Optional[int] = None
+    ) -> Job:
+        """Encolar un trabajo nuevo"""
+        job = Job(
+            type=job_type,
+            status="pending",
+            tenant=tenant,
+            created_by=created_by,
+            params=_dumps(params),
+            created_at=datetime.utcnow()
+        )
+        self.db.add(job)
+        await self.db.commit()
+        logger.info(f"Trabajo encolado: {job.id} ({job_type})")
+        return job
+
+    async def get(self, job_id: int) -> Optional[Job]:
+        """Obtener un trabajo por ID con su estado actual"""
+        result = await self.db.execute(
+            select(Job).where(Job.id == job_id).execution_options(populate_existing=True)
+        )
+        return result.scalar_one_or_none()
+
+    async def get_all(
+        self,
+        skip: int = 0,
+        limit: int = 20,
+        status: Optional[str] = None,
+        tenant: Optional[str] = None
+    ) -> tuple[List[Job], int]:
+        """Listar trabajos del más reciente al más antiguo"""
+        query = select(Job)
+        count_query = select(func.count(Job.id))
+        if status is not None:
+            query = query.where(Job.status == status)
+            count_query = count_query.where(Job.status == status)
+        if tenant is not None:
+            query = query.where(Job.tenant == tenant)
+            count_query = count_query.where(Job.tenant == tenant)
+
+        result = await self.db.execute(query.order_by(Job.id.desc()).offset(skip).limit(limit))
+        count_result = await self.db.execute(count_query)
+        return list(result.scalars().all()), count_result.scalar()
+
+    async def claim_next(self) -> Optional[Job]:
+        """
+        Tomar el trabajo pendiente más antiguo
+
+        El UPDATE condicionado al estado garantiza que solo un worker (de
+        este u otro proceso) se queda con cada trabajo.
+        """
+        while True:
+            result = await self.db.execute(
+                select(Job.id).where(Job.status == "pending").order_by(Job.id).limit(1)
+            )
+            job_id = result.scalar()
+            if job_id is None:
+                return None
+
+            now = datetime.utcnow()
+            claimed = await self.db.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == "pending")
+                .values(status="running", started_at=now, heartbeat_at=now, attempts=Job.attempts + 1)
+            )
+            await self.db.commit()
+            if claimed.rowcount:
+                return await self.get(job_id)
+
+    async def heartbeat(self, job_ids: List[int]) -> None:
+        """Marcar como vivos los trabajos que ejecuta este proceso"""
+        if not job_ids:
+            return
+        await self.db.execute(
+            update(Job)
+            .where(Job.id.in_(job_ids), Job.status == "running")
+            .values(heartbeat_at=datetime.utcnow())
+        )
+        await self.db.commit()
+
+    async def save_progress(
+        self,
+        job_id: int,
+        done: int,
+        total: Optional[int],
+        checkpoint: Optional[Dict[str, Any]]
+    ) -> bool:
+        """Guardar progreso y checkpoint; devuelve si se ha pedido cancelar"""
+        values: Dict[str, Any] = {"progress_done": done, "heartbeat_at": datetime.utcnow()}
+        if total is not None:
+            values["progress_total"] = total
+        if checkpoint is not None:
+            values["checkpoint"] = _dumps(checkpoint)
+        await self.db.execute(update(Job).where(Job.id == job_id).values(**values))
+        await self.db.commit()
+
+        result = await self.db.execute(select(Job.cancel_requested).where(Job.id == job_id))
+        return bool(result.scalar())
+
+    async def finish(
+        self,
+        job_id: int,
+        status: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None
+    ) -> None:
+        """Cerrar un trabajo con su estado final"""
+        await self.db.execute(
+            update(Job)
+            .where(Job.id == job_id)
+            .values(status=status, result=_dumps(result), error=error, finished_at=datetime.utcnow())
+        )
+        await self.db.commit()
+        logger.info(f"Trabajo {job_id} terminado: {status}")
+
+    async def release(self, job_id: int) -> None:
+        """Devolver a la cola un trabajo interrumpido (conserva el checkpoint)"""
+        await self.db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == "running")
+            .values(status="pending", heartbeat_at=None)
+        )
+        await self.db.commit()
+
+    async def request_cancel(self, job_id: int) -> Optional[Job]:
+        """
+        Cancelar un trabajo
+
+        Un trabajo pendiente se cancela en el acto; uno en ejecución se
+        detiene en su siguiente informe de progreso.
+        """
+        await self.db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == "pending")
+            .values(status="cancelled", cancel_requested=True, finished_at=datetime.utcnow())
+        )
+        await self.db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == "running")
+            .values(cancel_requested=True)
+        )
+        await self.db.commit()
+        return await self.get(job_id)
+
+    async def requeue_stale(self, cutoff: datetime, max_attempts: int) -> int:
+        """
+        Recuperar trabajos cuyo proceso dejó de dar señales antes de `cutoff`
+
+        Vuelven a la cola para reanudarse desde su checkpoint, salvo los que
+        ya agotaron sus intentos, que se marcan como fallidos.
+        """
+        stale = (Job.status == "running") & ((Job.heartbeat_at < cutoff) | Job.heartbeat_at.is_(None))
+        failed = await self.db.execute(
+            update(Job)
+            .where(stale, Job.attempts >= max_attempts)
+            .values(status="failed", error="Interrumpido demasiadas veces", finished_at=datetime.utcnow())
+        )
+        requeued = await self.db.execute(
+            update(Job).where(stale).values(status="pending", heartbeat_at=None)
+        )
+        await self.db.commit()
+        if requeued.rowcount or failed.rowcount:
+            logger.warning(
+                f"Trabajos interrumpidos: {requeued.rowcount} reencolados, {failed.rowcount} fallidos"
+            )
+        return requeued.rowcount
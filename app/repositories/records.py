@@ -0,0 +1,89 @@
+"""
+Registros ligeros de solo lectura para las consultas sin ORM
+"""
+from typing import FrozenSet, Tuple
+
+from app.models.user import User
+
+class UserRecord:
+    """Fila de usuario sin estado ORM (todas las columnas públicas)"""
+
+    __slots__ = (
+        "id", "email", "username", "first_name", "last_name",
+        "is_active", "is_superuser", "phone", "bio", "avatar_url",
+        "created_at", "updated_at", "last_login",
+    )
+
+    def __init__(self, id, email, username, first_name, last_name,
+                 is_active, is_superuser, phone, bio, avatar_url,
+                 created_at, updated_at, last_login):
+        self.id = id
+        self.email = email
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+        self.is_active = is_active
+        self.is_superuser = is_superuser
+        self.phone = phone
+        self.bio = bio
+        self.avatar_url = avatar_url
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.last_login = last_login
+
+    @classmethod
+    def partial(cls, names: Tuple[str, ...], values) -> "UserRecord":
+        """Registro con solo algunas columnas (el resto queda a None)"""
+        return cls(**{**dict.fromkeys(cls.__slots__), **dict(zip(names, values))})
+
+    @property
+    def full_name(self) -> str:
+        """Nombre completo del usuario"""
+        return f"{self.first_name} {self.last_name}"
+
+    def __repr__(self):
+        return f"<UserRecord(id={self.id}, username='{self.username}')>"
+
+class UserAuthRecord:
+    """Columnas necesarias para el login: credenciales y datos del token"""
+
+    __slots__ = ("id", "email", "username", "hashed_password", "is_active")
+
+    def __init__(self, id, email, username, hashed_password, is_active):
+        self.id = id
+        self.email = email
+        self.username = username
+        self.hashed_password = hashed_password
+        self.is_active = is_active
+
+class UserIdentityRecord:
+    """Columnas necesarias para validar el usuario de un token"""
+
+    __slots__ = ("id", "email", "username", "is_active", "is_superuser")
+
+    def __init__(self, id, email, username, is_active, is_superuser):
+        self.id = id
+        self.email = email
+        self.username = username
+        self.is_active = is_active
+        self.is_superuser = is_superuser
+
+def columns_for(record_class) -> Tuple:
+    """Columnas de la tabla users en el orden de los slots del registro"""
+    return tuple(getattr(User, name) for name in record_class.__slots__)
+
+USER_RECORD_COLUMNS = columns_for(UserRecord)
+USER_AUTH_COLUMNS = columns_for(UserAuthRecord)
+USER_IDENTITY_COLUMNS = columns_for(UserIdentityRecord)
+
+def record_projection(fields: FrozenSet[str]) -> Tuple[str, ...]:
+    """
+    Columnas de UserRecord necesarias para un conjunto de campos de la respuesta
+
+    id y created_at se leen siempre (identidad y orden de los listados);
+    full_name necesita first_name y last_name.
+    """
+    needed = set(fields) | {"id", "created_at"}
+    if "full_name" in needed:
+        needed |= {"first_name", "last_name"}
+    return tuple(name for name in UserRecord.__slots__ if name in needed)
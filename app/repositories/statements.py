@@ -0,0 +1,103 @@
+"""
+Registro de sentencias precompiladas para las consultas frecuentes de usuarios
+
+Cada sentencia se construye una sola vez con parámetros enlazados
+(bindparam). Al reutilizar el mismo objeto, SQLAlchemy memoriza su clave de
+caché y encuentra el SQL compilado sin reconstruir el árbol de la consulta.
+"""
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from sqlalchemy import select, func, or_, update, bindparam
+from sqlalchemy.sql import Select
+
+from app.models.user import User
+from app.repositories.records import (
+    USER_RECORD_COLUMNS, USER_AUTH_COLUMNS, USER_IDENTITY_COLUMNS
+)
+
+# email y username se comparan sin distinguir mayúsculas (ASCII), con la
+# misma intercalación que sus índices únicos NOCASE
+EMAIL_NOCASE = User.email.collate("NOCASE")
+USERNAME_NOCASE = User.username.collate("NOCASE")
+
+# Búsquedas puntuales (parámetros: user_id, email, username)
+SELECT_USER_BY_ID = select(User).where(User.id == bindparam("user_id"))
+
+USER_COLUMNS_BY_ID = select(*User.__table__.columns).where(User.id == bindparam("user_id"))
+USER_COLUMNS_BY_EMAIL = select(*User.__table__.columns).where(EMAIL_NOCASE == bindparam("email"))
+USER_COLUMNS_BY_USERNAME = select(*User.__table__.columns).where(USERNAME_NOCASE == bindparam("username"))
+
+RECORD_BY_ID = select(*USER_RECORD_COLUMNS).where(User.id == bindparam("user_id"))
+RECORDS_BY_IDS = select(*USER_RECORD_COLUMNS).where(
+    User.id.in_(bindparam("user_ids", expanding=True))
+)
+AUTH_BY_EMAIL = select(*USER_AUTH_COLUMNS).where(EMAIL_NOCASE == bindparam("email"))
+IDENTITY_BY_ID = select(*USER_IDENTITY_COLUMNS).where(User.id == bindparam("user_id"))
+
+EMAIL_TAKEN = select(User.id).where(EMAIL_NOCASE == bindparam("email"))
+USERNAME_TAKEN = select(User.id).where(USERNAME_NOCASE == bindparam("username"))
+
+# Escrituras frecuentes (parámetros: user_id, last_login)
+UPDATE_LAST_LOGIN = (
+    update(User)
+    .where(User.id == bindparam("user_id"))
+    .values(last_login=bindparam("last_login"))
+)
+
+@lru_cache(maxsize=256)
+def record_by_id_statement(columns: Tuple[str, ...]) -> Select:
+    """Búsqueda por ID de solo algunas columnas (parámetro: user_id)"""
+    return select(*(getattr(User, name) for name in columns)).where(User.id == bindparam("user_id"))
+
+@lru_cache(maxsize=512)
+def list_statements(
+    records: bool,
+    with_search: bool,
+    with_active: bool,
+    columns: Optional[Tuple[str, ...]] = None
+) -> Tuple[Select, Select]:
+    """
+    Consulta paginada y de conteo para una combinación de filtros
+
+    Parámetros enlazados: pattern (si with_search), is_active (si with_active),
+    skip y limit (solo la consulta paginada). Con columns (solo registros)
+    se leen únicamente esas columnas.
+    """
+    if columns is not None:
+        query = select(*(getattr(User, name) for name in columns))
+    else:
+        query = select(*USER_RECORD_COLUMNS) if records else select(User)
+    count_query = select(func.count(User.id))
+
+    if with_search:
+        pattern = bindparam("pattern")
+        search_filter = or_(
+            User.username.ilike(pattern),
+            User.email.ilike(pattern),
+            User.first_name.ilike(pattern),
+            User.last_name.ilike(pattern)
+        )
+        query = query.where(search_filter)
+        count_query = count_query.where(search_filter)
+
+    if with_active:
+        active_filter = User.is_active == bindparam("is_active")
+        query = query.where(active_filter)
+        count_query = count_query.where(active_filter)
+
+    query = (
+        query.order_by(User.created_at.desc(), User.id.desc())
+        .offset(bindparam("skip"))
+        .limit(bindparam("limit"))
+    )
+    return query, count_query
+
+def list_parameters(skip: int, limit: int, search, is_active) -> dict:
+    """Valores de los parámetros enlazados de list_statements"""
+    params = {"skip": skip, "limit": limit}
+    if search:
+        params["pattern"] = f"%{search}%"
+    if is_active is not None:
+        params["is_active"] = is_active
+    return params
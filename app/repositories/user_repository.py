@@ -1,24 +1,54 @@
 """
 Repositorio para operaciones de usuario en base de datos
 """
-from typing import Optional, List
+from typing import Optional, List, Any, Dict, Tuple
+from datetime import datetime
+import json
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.ext.horizontal_shard import ShardedSession
 import logging
 
 from app.models.user import User
-from app.schemas.user import UserCreate, UserUpdate
+from app.models.user_change import UserChange
+from app.repositories.records import UserRecord, UserAuthRecord, UserIdentityRecord
+from app.repositories import statements as stmt
+from app.repositories.directory_repository import DirectoryRepository
+from app.repositories.write_behind import last_login_buffer
+from app.schemas.user import UserCreate, UserUpdate, UserResponse
 from app.core.security import get_password_hash
 from app.core.exceptions import ConflictException, NotFoundException
+from app.core.singleflight import user_lookups
+from app.core.change_feed import change_notifier
+from app.core.audit import audit_log
+from app.core.config import settings
+from app.core.sharding import group_by_shard, shard_for
+from app.core.tracing import trace_layer
 
 logger = logging.getLogger(__name__)
 
+@trace_layer("repository")
 class UserRepository:
     """Repositorio para operaciones CRUD de usuarios"""
     
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, actor_id: Optional[int] = None, tenant: Optional[str] = None):
         self.db = db
+        # Autor de las mutaciones y tenant para el registro de auditoría
+        # (sin tenant explícito, el de la petición en curso)
+        self.actor_id = actor_id
+        if tenant is None and settings.TENANCY_ENABLED:
+            from app.core.tenancy import current_tenant
+            tenant = current_tenant.get()
+        self.tenant = tenant
+        # Modo particionado: la sesión enruta cada sentencia a su shard y
+        # el directorio asigna IDs y garantiza la unicidad
+        self.sharded = isinstance(db.sync_session, ShardedSession)
+        self.shard_count = db.info.get("shard_count")
+        # Las lecturas solo se agrupan entre sesiones de la misma base de datos
+        # (con shards, del mismo directorio)
+        self.flight_scope = id(db.info["directory_sessions"]) if self.sharded else id(db.bind)
     
     async def create(self, user_data: UserCreate) -> User:
         """Crear un nuevo usuario"""
@@ -34,10 +64,14 @@ class UserRepository:
                 bio=user_data.bio,
                 avatar_url=user_data.avatar_url
             )
+            if self.sharded:
+                # El ID global decide el shard, así que se asigna antes del insert
+                db_user.id = await self._directory(
+                    lambda directory: directory.reserve(user_data.email, user_data.username)
+                )
             
             self.db.add(db_user)
-            await self.db.commit()
-            await self.db.refresh(db_user)
+            await self._commit_with_change(db_user, "create")
             
             logger.info(f"Usuario creado: {db_user.username}")
             return db_user
@@ -45,6 +79,8 @@ class UserRepository:
         except IntegrityError as e:
             await self.db.rollback()
             logger.warning(f"Error de integridad al crear usuario: {e}")
+            if self.sharded:
+                await self._directory(lambda directory: directory.release(db_user.id))
             
             if "email" in str(e):
                 raise ConflictException("El email ya está registrado")
@@ -55,25 +91,65 @@ class UserRepository:
     
     async def get_by_id(self, user_id: int) -> Optional[User]:
         """Obtener usuario por ID"""
-        result = await self.db.execute(
-            select(User).where(User.id == user_id)
+        return await self._coalesced_lookup(
+            ("id", user_id), stmt.USER_COLUMNS_BY_ID, {"user_id": user_id}
         )
-        return result.scalar_one_or_none()
     
     async def get_by_email(self, email: str) -> Optional[User]:
         """Obtener usuario por email"""
-        result = await self.db.execute(
-            select(User).where(User.email == email)
+        if self.sharded:
+            user_id = await self._directory(lambda directory: directory.id_for_email(email))
+            return await self._get_for_update(user_id) if user_id is not None else None
+        return await self._coalesced_lookup(
+            ("email", email), stmt.USER_COLUMNS_BY_EMAIL, {"email": email}
         )
-        return result.scalar_one_or_none()
     
     async def get_by_username(self, username: str) -> Optional[User]:
         """Obtener usuario por username"""
-        result = await self.db.execute(
-            select(User).where(User.username == username)
+        if self.sharded:
+            user_id = await self._directory(lambda directory: directory.id_for_username(username))
+            return await self._get_for_update(user_id) if user_id is not None else None
+        return await self._coalesced_lookup(
+            ("username", username), stmt.USER_COLUMNS_BY_USERNAME, {"username": username}
         )
+    
+    async def _get_for_update(self, user_id: int) -> Optional[User]:
+        """Obtener usuario por ID sin agrupar, para las operaciones de escritura"""
+        result = await self.db.execute(stmt.SELECT_USER_BY_ID, {"user_id": user_id})
         return result.scalar_one_or_none()
     
+    async def _coalesced_lookup(self, key: tuple, statement, params: dict) -> Optional[User]:
+        """
+        Búsqueda de un usuario compartida entre peticiones concurrentes
+        
+        La consulta en vuelo devuelve solo los valores de las columnas; cada
+        sesión construye su propia instancia con merge(load=False), así que
+        ninguna instancia ORM se comparte entre sesiones. En modo particionado
+        la identidad de la instancia incluye su shard, así que se carga con la
+        sesión (get_by_email y get_by_username resuelven antes el ID).
+        """
+        if self.sharded:
+            return self._with_pending_logins(await self._get_for_update(params["user_id"]))
+        async def query() -> Optional[Dict[str, Any]]:
+            result = await self.db.execute(statement, params)
+            row = result.first()
+            return dict(row._mapping) if row is not None else None
+        
+        values = await user_lookups.do((self.flight_scope, *key), query)
+        if values is None:
+            return None
+        
+        # Respetar el identity map: si la sesión ya tiene al usuario, se devuelve ese
+        existing = self.db.sync_session.identity_map.get(
+            self.db.identity_key(User, values["id"])
+        )
+        if existing is not None:
+            return self._with_pending_logins(existing)
+        
+        db_user = User(**values)
+        make_transient_to_detached(db_user)
+        return self._with_pending_logins(await self.db.merge(db_user, load=False))
+    
     async def get_all(
         self, 
         skip: int = 0, 
@@ -82,41 +158,183 @@ class UserRepository:
         is_active: Optional[bool] = None
     ) -> tuple[List[User], int]:
         """Obtener lista de usuarios con paginación y filtros"""
+        if self.sharded:
+            return await self._gather_page(False, skip, limit, search, is_active)
         
-        # Construir query base
-        query = select(User)
-        count_query = select(func.count(User.id))
-        
-        # Aplicar filtros
-        if search:
-            search_filter = or_(
-                User.username.ilike(f"%{search}%"),
-                User.email.ilike(f"%{search}%"),
-                User.first_name.ilike(f"%{search}%"),
-                User.last_name.ilike(f"%{search}%")
-            )
-            query = query.where(search_filter)
-            count_query = count_query.where(search_filter)
-        
-        if is_active is not None:
-            query = query.where(User.is_active == is_active)
-            count_query = count_query.where(User.is_active == is_active)
-        
-        # Aplicar paginación
-        query = query.offset(skip).limit(limit).order_by(User.created_at.desc())
+        query, count_query = stmt.list_statements(False, bool(search), is_active is not None)
+        params = stmt.list_parameters(skip, limit, search, is_active)
         
         # Ejecutar queries
-        result = await self.db.execute(query)
-        count_result = await self.db.execute(count_query)
+        result = await self.db.execute(query, params)
+        count_result = await self.db.execute(count_query, params)
         
         users = result.scalars().all()
         total = count_result.scalar()
         
-        return users, total
+        return self._with_pending_logins(users), total
+    
+    # --- Lecturas sin ORM: filas como tuplas en registros con __slots__ ---
+    
+    async def get_record_by_id(
+        self,
+        user_id: int,
+        columns: Optional[Tuple[str, ...]] = None
+    ) -> Optional[UserRecord]:
+        """
+        Obtener usuario por ID como registro de solo lectura
+        
+        Con columns (ver record_projection) solo se leen esas columnas y el
+        resto de atributos del registro queda a None.
+        """
+        async def query() -> Optional[UserRecord]:
+            if columns is None:
+                result = await self.db.execute(stmt.RECORD_BY_ID, {"user_id": user_id})
+                row = result.first()
+                return UserRecord(*row) if row is not None else None
+            result = await self.db.execute(stmt.record_by_id_statement(columns), {"user_id": user_id})
+            row = result.first()
+            return UserRecord.partial(columns, row) if row is not None else None
+        
+        # Los registros no pertenecen a ninguna sesión: se comparten tal cual
+        record = await user_lookups.do((self.flight_scope, "record", user_id, columns), query)
+        return self._with_pending_logins(record)
+    
+    async def get_records_by_ids(self, user_ids: List[int]) -> List[UserRecord]:
+        """Obtener varios usuarios por ID como registros (sin orden garantizado)"""
+        if not user_ids:
+            return []
+        if self.sharded:
+            records = []
+            for shard_id, shard_ids in group_by_shard(user_ids, self.shard_count).items():
+                result = await self.db.execute(
+                    stmt.RECORDS_BY_IDS, {"user_ids": shard_ids},
+                    bind_arguments={"shard_id": shard_id}
+                )
+                records.extend(UserRecord(*row) for row in result)
+            return self._with_pending_logins(records)
+        result = await self.db.execute(stmt.RECORDS_BY_IDS, {"user_ids": user_ids})
+        return self._with_pending_logins([UserRecord(*row) for row in result])
+    
+    async def get_records(
+        self,
+        skip: int = 0,
+        limit: int = 20,
+        search: Optional[str] = None,
+        is_active: Optional[bool] = None,
+        columns: Optional[Tuple[str, ...]] = None
+    ) -> tuple[List[UserRecord], int]:
+        """
+        Obtener lista paginada de usuarios como registros de solo lectura
+        
+        Con columns (ver record_projection) solo se leen esas columnas.
+        """
+        if self.sharded:
+            return await self._gather_page(True, skip, limit, search, is_active, columns)
+        
+        query, count_query = stmt.list_statements(True, bool(search), is_active is not None, columns)
+        params = stmt.list_parameters(skip, limit, search, is_active)
+        
+        result = await self.db.execute(query, params)
+        records = self._to_records(result, columns)
+        count_result = await self.db.execute(count_query, params)
+        
+        return self._with_pending_logins(records), count_result.scalar()
+    
+    async def _gather_page(
+        self,
+        records: bool,
+        skip: int,
+        limit: int,
+        search: Optional[str],
+        is_active: Optional[bool],
+        columns: Optional[Tuple[str, ...]] = None
+    ) -> tuple[list, int]:
+        """
+        Listado paginado en modo particionado (scatter-gather)
+        
+        Cada shard devuelve sus primeras skip + limit filas ordenadas por la
+        misma clave que la mezcla (created_at descendente, ID como desempate);
+        se mezclan y se corta la página. El total es la suma de los conteos
+        de cada shard.
+        """
+        query, count_query = stmt.list_statements(records, bool(search), is_active is not None, columns)
+        params = stmt.list_parameters(0, skip + limit, search, is_active)
+        
+        # Sin user_id en los parámetros la sesión ejecuta en todos los shards
+        result = await self.db.execute(query, params)
+        rows = self._to_records(result, columns) if records else list(result.scalars().all())
+        rows.sort(key=lambda user: (user.created_at, user.id), reverse=True)
+        
+        count_result = await self.db.execute(count_query, params)
+        total = sum(count_result.scalars().all())
+        
+        return self._with_pending_logins(rows[skip:skip + limit]), total
+    
+    @staticmethod
+    def _to_records(result, columns: Optional[Tuple[str, ...]]) -> List[UserRecord]:
+        """Filas de un listado como registros (parciales si hay proyección)"""
+        if columns is None:
+            return [UserRecord(*row) for row in result]
+        return [UserRecord.partial(columns, row) for row in result]
+    
+    async def get_auth_by_email(self, email: str) -> Optional[UserAuthRecord]:
+        """Obtener solo las columnas necesarias para el login"""
+        async def query() -> Optional[UserAuthRecord]:
+            bind_arguments = None
+            if self.sharded:
+                user_id = await self._directory(lambda directory: directory.id_for_email(email))
+                if user_id is None:
+                    return None
+                bind_arguments = {"shard_id": shard_for(user_id, self.shard_count)}
+            result = await self.db.execute(
+                stmt.AUTH_BY_EMAIL, {"email": email}, bind_arguments=bind_arguments
+            )
+            row = result.first()
+            return UserAuthRecord(*row) if row is not None else None
+        
+        return await user_lookups.do((self.flight_scope, "auth", email), query)
+    
+    async def get_identity_by_id(self, user_id: int) -> Optional[UserIdentityRecord]:
+        """Obtener solo las columnas necesarias para validar un token"""
+        async def query() -> Optional[UserIdentityRecord]:
+            result = await self.db.execute(stmt.IDENTITY_BY_ID, {"user_id": user_id})
+            row = result.first()
+            return UserIdentityRecord(*row) if row is not None else None
+        
+        return await user_lookups.do((self.flight_scope, "identity", user_id), query)
+    
+    async def is_email_taken(self, email: str) -> bool:
+        """Comprobar si el email ya está registrado (solo lee el ID)"""
+        if self.sharded:
+            return await self._directory(lambda directory: directory.id_for_email(email)) is not None
+        result = await self.db.execute(stmt.EMAIL_TAKEN, {"email": email})
+        return result.first() is not None
+    
+    async def is_username_taken(self, username: str) -> bool:
+        """Comprobar si el username ya está en uso (solo lee el ID)"""
+        if self.sharded:
+            return await self._directory(lambda directory: directory.id_for_username(username)) is not None
+        result = await self.db.execute(stmt.USERNAME_TAKEN, {"username": username})
+        return result.first() is not None
+    
+    async def touch_last_login(self, user_id: int, last_login: datetime) -> None:
+        """
+        Actualizar la fecha de último login sin cargar el usuario
+        
+        Con la escritura diferida activa solo se anota en memoria; el buffer
+        la escribe en lote y las lecturas de este repositorio ya la incluyen.
+        """
+        if last_login_buffer.running:
+            last_login_buffer.record(self._buffer_target(user_id), user_id, last_login)
+            return
+        await self.db.execute(
+            stmt.UPDATE_LAST_LOGIN, {"user_id": user_id, "last_login": last_login}
+        )
+        await self.db.commit()
     
     async def update(self, user_id: int, user_data: UserUpdate) -> User:
         """Actualizar usuario"""
-        db_user = await self.get_by_id(user_id)
+        db_user = await self._get_for_update(user_id)
         if not db_user:
             raise NotFoundException("Usuario no encontrado")
         
@@ -126,8 +344,7 @@ class UserRepository:
             setattr(db_user, field, value)
         
         try:
-            await self.db.commit()
-            await self.db.refresh(db_user)
+            await self._commit_with_change(db_user, "update", update_data)
             logger.info(f"Usuario actualizado: {db_user.username}")
             return db_user
         except IntegrityError as e:
@@ -137,37 +354,119 @@ class UserRepository:
     
     async def delete(self, user_id: int) -> bool:
         """Eliminar usuario (soft delete)"""
-        db_user = await self.get_by_id(user_id)
+        db_user = await self._get_for_update(user_id)
         if not db_user:
             raise NotFoundException("Usuario no encontrado")
         
         db_user.is_active = False
-        await self.db.commit()
+        await self._commit_with_change(db_user, "deactivate", ["is_active"])
         
         logger.info(f"Usuario desactivado: {db_user.username}")
         return True
     
+    async def activate(self, user_id: int) -> User:
+        """Reactivar usuario"""
+        db_user = await self._get_for_update(user_id)
+        if not db_user:
+            raise NotFoundException("Usuario no encontrado")
+        
+        db_user.is_active = True
+        await self._commit_with_change(db_user, "activate", ["is_active"])
+        
+        logger.info(f"Usuario activado: {db_user.username}")
+        return db_user
+    
     async def hard_delete(self, user_id: int) -> bool:
         """Eliminar usuario permanentemente"""
-        db_user = await self.get_by_id(user_id)
+        db_user = await self._get_for_update(user_id)
         if not db_user:
             raise NotFoundException("Usuario no encontrado")
         
         await self.db.delete(db_user)
+        # Tombstone en la misma transacción que el borrado
+        self.db.add(UserChange(user_id=user_id, operation="delete", payload=None))
         await self.db.commit()
+        change_notifier.notify()
+        await self._audit("delete", user_id)
+        if self.sharded:
+            # Libera el email y el username para nuevos registros
+            await self._directory(lambda directory: directory.release(user_id))
         
         logger.info(f"Usuario eliminado permanentemente: {db_user.username}")
         return True
     
     async def change_password(self, user_id: int, new_password: str) -> User:
         """Cambiar contraseña de usuario"""
-        db_user = await self.get_by_id(user_id)
+        db_user = await self._get_for_update(user_id)
         if not db_user:
             raise NotFoundException("Usuario no encontrado")
         
         db_user.hashed_password = get_password_hash(new_password)
-        await self.db.commit()
-        await self.db.refresh(db_user)
+        await self._commit_with_change(db_user, "password_change", ["password"])
         
         logger.info(f"Contraseña cambiada para usuario: {db_user.username}")
         return db_user
+    
+    async def _commit_with_change(self, db_user: User, operation: str, fields=None) -> None:
+        """
+        Confirmar la mutación junto con su entrada en el registro de cambios
+        
+        El flush asigna el ID y los valores generados por la base de datos, el
+        refresh carga el estado final y ambos se confirman en una sola transacción.
+        Después se anota en el registro de auditoría (solo los nombres de fields).
+        """
+        await self.db.flush()
+        await self.db.refresh(db_user)
+        
+        snapshot = UserResponse.from_orm(db_user).model_dump(mode="json")
+        self.db.add(UserChange(
+            user_id=db_user.id,
+            operation=operation,
+            payload=json.dumps(snapshot, separators=(",", ":"))
+        ))
+        await self.db.commit()
+        change_notifier.notify()
+        await self._audit(operation, db_user.id, fields)
+    
+    async def _audit(self, action: str, user_id: int, fields=None) -> None:
+        """Encolar el evento de auditoría (el escritor lo guarda en segundo plano)"""
+        await audit_log.record(action, user_id, self.actor_id, fields, self.tenant)
+    
+    def _buffer_target(self, user_id: int):
+        """
+        Dónde escribirá el buffer de last_login la fila del usuario
+
+        En modo multi-tenant, el tenant y no su engine: el registro puede
+        cerrarlo y abrir otro antes del vaciado.
+        """
+        if settings.TENANCY_ENABLED:
+            return self.tenant
+        if self.sharded:
+            return self.db.info["shard_engines"][shard_for(user_id, self.shard_count)]
+        return self.db.bind
+    
+    def _with_pending_logins(self, users):
+        """
+        Sustituir last_login por el valor pendiente de escribir, si es más reciente
+        
+        Acepta un usuario, un registro o una lista de ellos. En instancias ORM
+        el valor se fija como ya confirmado para no marcarlas como modificadas.
+        """
+        if not last_login_buffer.running:
+            return users
+        for user in users if isinstance(users, list) else [users]:
+            if user is None:
+                continue
+            pending = last_login_buffer.pending_for(self._buffer_target(user.id), user.id)
+            if pending is None or (user.last_login is not None and user.last_login >= pending):
+                continue
+            if isinstance(user, User):
+                set_committed_value(user, "last_login", pending)
+            else:
+                user.last_login = pending
+        return users
+    
+    async def _directory(self, operation):
+        """Ejecutar una operación del directorio en su propia sesión"""
+        async with self.db.info["directory_sessions"]() as session:
+            return await operation(DirectoryRepository(session))
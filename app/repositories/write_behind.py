@@ -0,0 +1,198 @@
+"""
+Escritura diferida (write-behind) de last_login
+
+Cada login correcto solo anota la fecha en memoria; un proceso en segundo
+plano la escribe en lotes con un único UPDATE ejecutado con executemany.
+El lote se vacía al llegar a un número máximo de usuarios pendientes, cada
+cierto tiempo y al apagar la aplicación. Si la base de datos falla, las filas
+se conservan y el siguiente intento espera cada vez más (hasta max_backoff).
+
+Las fechas se agrupan por engine o, en modo multi-tenant, por tenant: el
+engine de un tenant puede cerrarse por inactividad y reabrirse (otro objeto)
+antes del vaciado, que lo resuelve con tenant_registry.lease().
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Union
+
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.core.config import settings
+from app.core.exceptions import NotFoundException
+from app.repositories import statements as stmt
+
+logger = logging.getLogger(__name__)
+
+# Destino de un lote: un engine o el identificador de un tenant
+Target = Union[AsyncEngine, str]
+
+class LastLoginBuffer:
+    """Fechas de último login pendientes de escribir, agrupadas por engine o tenant"""
+
+    def __init__(self, max_pending: int = 1000, flush_interval: float = 5.0, max_backoff: float = 60.0):
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        # Espera antes del siguiente intento tras un vaciado fallido (0: sin fallos)
+        self.backoff = 0.0
+        self._pending: Dict[Target, Dict[int, datetime]] = {}
+        # Lote que se está escribiendo: sigue visible para las lecturas
+        self._flushing: Dict[Target, Dict[int, datetime]] = {}
+        self._count = 0
+        self._oldest: Optional[float] = None
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.errors = 0
+        self.last_flush_at: Optional[str] = None
+        self.last_flush_ms: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        """Solo se difieren escrituras mientras hay un proceso que las vacía"""
+        return self._task is not None
+
+    def record(self, target: Target, user_id: int, last_login: datetime) -> None:
+        """Anotar un login; si el lote está lleno se adelanta el vaciado"""
+        self._add(target, user_id, last_login)
+        if self._count >= self.max_pending:
+            self._wakeup.set()
+
+    def _add(self, target: Target, user_id: int, last_login: datetime) -> None:
+        pending = self._pending.setdefault(target, {})
+        previous = pending.get(user_id)
+        if previous is None:
+            self._count += 1
+        if previous is None or last_login > previous:
+            pending[user_id] = last_login
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+
+    def pending_for(self, target: Target, user_id: int) -> Optional[datetime]:
+        """Fecha pendiente de escribir para un usuario, si la hay"""
+        if not self._count and not self._flushing:
+            return None
+        pending = self._pending.get(target, {}).get(user_id)
+        if pending is None:
+            pending = self._flushing.get(target, {}).get(user_id)
+        return pending
+
+    async def flush(self) -> int:
+        """Escribir todo lo pendiente; devuelve el número de filas enviadas"""
+        async with self._flush_lock:
+            if not self._count:
+                return 0
+            self._flushing, self._pending = self._pending, {}
+            self._count = 0
+            self._oldest = None
+
+            start = time.perf_counter()
+            try:
+                rows = await self._write(self._flushing)
+            finally:
+                self._flushing = {}
+
+            self.flushes += 1
+            self.flushed_rows += rows
+            self.last_flush_ms = round((time.perf_counter() - start) * 1000, 2)
+            self.last_flush_at = datetime.utcnow().isoformat()
+            return rows
+
+    async def _write(self, batches: Dict[Target, Dict[int, datetime]]) -> int:
+        """Un UPDATE con executemany por engine o tenant"""
+        rows = 0
+        for target, pending in batches.items():
+            params = [
+                {"user_id": user_id, "last_login": last_login}
+                for user_id, last_login in pending.items()
+            ]
+            try:
+                async with self._begin(target) as conn:
+                    await conn.execute(stmt.UPDATE_LAST_LOGIN, params)
+                rows += len(params)
+            except NotFoundException:
+                # Tenant dado de baja: no queda dónde escribir
+                logger.warning(f"Dropped {len(params)} last_login updates of removed tenant {target}")
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Could not flush {len(params)} last_login updates: {e}")
+                # Se conservan para el siguiente vaciado (sin pisar logins más
+                # recientes) sin despertar al escritor: el reintento espera
+                for user_id, last_login in pending.items():
+                    self._add(target, user_id, last_login)
+        return rows
+
+    @staticmethod
+    @asynccontextmanager
+    async def _begin(target: Target) -> AsyncIterator[AsyncConnection]:
+        if isinstance(target, str):
+            from app.core.tenancy import tenant_registry
+            # Cedido durante la escritura: no se cierra a mitad del UPDATE
+            async with tenant_registry.lease(target) as sessions:
+                async with sessions.kw["bind"].begin() as conn:
+                    yield conn
+            return
+        async with target.begin() as conn:
+            yield conn
+
+    def start(self) -> None:
+        """Vaciar el lote en segundo plano"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"last_login write-behind every {self.flush_interval}s or {self.max_pending} users")
+
+    async def stop(self) -> None:
+        """Detener el proceso en segundo plano y escribir lo pendiente"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            errors = self.errors
+            try:
+                await self.flush()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"last_login flush failed: {e}")
+            if self.errors == errors:
+                self.backoff = 0.0
+                continue
+            # Base de datos bloqueada o caída: esperar más en cada fallo seguido
+            self.backoff = min(self.backoff * 2 or self.flush_interval, self.max_backoff)
+            await asyncio.sleep(self.backoff)
+
+    def stats(self) -> Dict[str, Any]:
+        """Resumen para el health check, incluido el retraso de escritura"""
+        return {
+            "running": self.running,
+            "pending": self._count,
+            "flush_lag_seconds": round(time.monotonic() - self._oldest, 3) if self._oldest else 0.0,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "errors": self.errors,
+            "retry_backoff_seconds": self.backoff,
+            "last_flush_at": self.last_flush_at,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+# Buffer global de last_login
+last_login_buffer = LastLoginBuffer(
+    max_pending=settings.LAST_LOGIN_MAX_PENDING,
+    flush_interval=settings.LAST_LOGIN_FLUSH_SECONDS
+)
@@ -0,0 +1,237 @@
+"""
+Router para operaciones de administración y diagnóstico
+"""
+import asyncio
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Path, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from app.core.profiling import profile_store
+from app.core.query_log import slow_query_log
+from app.core.backup import backup_manager, BackupError
+from app.core.maintenance import maintenance_scheduler
+from app.core.audit import AUDIT_ACTIONS, audit_log, audit_timestamp
+from app.core.config import settings
+from app.core.exceptions import NotFoundException, ValidationException
+from app.core.tracing import TracedRoute, tracer
+from app.schemas.auth import TokenData
+from app.routers.dependencies import get_current_superuser
+
+router = APIRouter(route_class=TracedRoute)
+
+@router.get("/profiles")
+async def list_profiles(
+    current_user: TokenData = Depends(get_current_superuser)
+):
+    """
+    Listar los perfiles de peticiones capturados
+    
+    Devuelve los ficheros .prof del anillo en disco, del más reciente al
+    más antiguo. Requiere superusuario
+    """
+    profiles = profile_store.list()
+    return {"profiles": profiles, "total": len(profiles)}
+
+@router.get("/profiles/{name}")
+async def get_profile(
+    name: str = Path(..., description="Nombre del fichero de perfil"),
+    format: str = Query("prof", pattern="^(prof|text)$", description="prof (binario) o text"),
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime|ncalls)$", description="Orden del informe"),
+    limit: int = Query(50, ge=1, le=500, description="Funciones en el informe"),
+    current_user: TokenData = Depends(get_current_superuser)
+):
+    """
+    Descargar un perfil o ver su informe pstats
+    
+    - **format**: `prof` para abrirlo con snakeviz/pstats, `text` para el informe
+    
+    Requiere superusuario
+    """
+    path = profile_store.path_for(name)
+    if path is None:
+        raise NotFoundException("Perfil no encontrado")
+    
+    if format == "text":
+        return PlainTextResponse(profile_store.render(name, limit=limit, sort=sort))
+    
+    return FileResponse(path, media_type="application/octet-stream", filename=name)
+
+@router.get("/slow-queries")
+async def list_slow_queries(
+    limit: int = Query(20, ge=1, le=500, description="Número de consultas"),
+    flagged_only: bool = Query(False, description="Solo consultas con SCAN users"),
+    current_user: TokenData = Depends(get_current_superuser)
+):
+    """
+    Consultas lentas ordenadas por tiempo total
+    
+    Cada entrada incluye el SQL normalizado, los parámetros redactados,
+    tiempos y el plan de EXPLAIN QUERY PLAN. Las consultas cuyo plan
+    recorre la tabla completa se marcan con **full_scan**. Requiere superusuario
+    """
+    return {
+        "enabled": settings.SLOW_QUERY_LOG_ENABLED,
+        "threshold_ms": slow_query_log.threshold_ms,
+        "queries": slow_query_log.top(limit=limit, flagged_only=flagged_only)
+    }
+
+@router.delete("/slow-queries")
+async def reset_slow_queries(
+    current_user: TokenData = Depends(get_current_superuser)
+):
+    """
+    Vaciar el registro de consultas lentas
+    
+    Requiere superusuario
+    """
+    slow_query_log.reset()
+    return {"message": "Registro de consultas lentas vaciado"}
+
+@router.get("/traces")
+async def list_traces(
+    limit: int = Query(50, ge=1, le=500, description="Número de trazas"),
+    min_duration_ms: float = Query(0, ge=0, description="Solo peticiones más lentas que esto"),
+    current_user: TokenData = Depends(get_current_superuser)
+):
+    """
+    Trazas recientes de peticiones muestreadas
+    
+    Una entrada por petición (span raíz) con su duración y número de spans,
+    de la más reciente a la más antigua, mientras sigan en el anillo en
+    memoria. Requiere superusuario
+    """
+    return {
+        "enabled": settings.TRACING_ENABLED,
+        "sample_rate": tracer.sample_rate,
+        "traces": tracer.memory.traces(limit=limit, min_duration_ms=min_duration_ms)
+    }
+
+@router.get("/traces/{trace_id}")
+async def get_trace(
+    trace_id: str = Path(..., pattern="^[0-9a-f]{32}$", description="trace-id W3C"),
+    current_user: TokenData = Depends(get_current_superuser)
+):
+    """
+    Spans de una traza en orden de inicio
+    
+    Router, servicio, repositorio, sentencias SQL y bcrypt, enlazados por
+    parent_id. Requiere superusuario
+    """
+    spans = tracer.memory.trace(trace_id)
+    if not spans:
+        raise NotFoundException("Traza no encontrada")
+    return {"trace_id": trace_id, "spans": spans}
+
+@router.get("/backups")
+async def list_backups(
+    current_user: TokenData = Depends(get_current_superuser)
+):
+    """
+    Listar las copias de seguridad registradas
+    
+    Requiere superusuario
+    """
+    backups = backup_manager.list_backups()
+    return {"backups": backups, "total": len(backups), **backup_manager.status()}
+
+@router.post("/backups", status_code=201)
+async def create_backup(
+    current_user: TokenData = Depends(get_current_superuser)
+):
+    """
+    Crear una copia de seguridad en caliente
+    
+    Usa la API de backup online de SQLite por pasos, sin detener las
+    escrituras, y verifica la copia con integrity_check y SHA-256.
+    Requiere superusuario
+    """
+    try:
+        return await backup_manager.create_backup(label="manual")
+    except BackupError as e:
+        raise ValidationException(str(e))
+
+@router.post("/backups/{name}/verify")
+async def verify_backup(
+    name: str = Path(..., description="Nombre de la copia"),
+    current_user: TokenData = Depends(get_current_superuser)
+):
+    """
+    Verificar una copia contra su checksum y con integrity_check
+    
+    Requiere superusuario
+    """
+    try:
+        path = backup_manager.resolve(name)
+    except BackupError:
+        raise NotFoundException("Copia de seguridad no encontrada")
+    return await asyncio.to_thread(backup_manager.verify, path)
+
+@router.get("/maintenance")
+async def maintenance_status(
+    current_user: TokenData = Depends(get_current_superuser)
+):
+    """
+    Estado de las tareas de mantenimiento de la base de datos
+    
+    Requiere superusuario
+    """
+    return maintenance_scheduler.status()
+
+@router.post("/maintenance/{task}")
+async def run_maintenance_task(
+    task: str = Path(..., description="optimize, analyze, wal_checkpoint, incremental_vacuum o compact_changes"),
+    current_user: TokenData = Depends(get_current_superuser)
+):
+    """
+    Ejecutar ahora una tarea de mantenimiento
+    
+    Ignora la ventana de baja carga pero respeta el presupuesto de tiempo.
+    Requiere superusuario
+    """
+    if task not in maintenance_scheduler.tasks:
+        raise NotFoundException("Tarea de mantenimiento no encontrada")
+    return await maintenance_scheduler.run_task(task)
+
+def _audit_bound(moment: Optional[datetime]) -> Optional[str]:
+    """Límite del rango como timestamp UTC del registro de auditoría"""
+    if moment is None:
+        return None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return audit_timestamp(moment)
+
+@router.get("/audit")
+async def list_audit_events(
+    start: Optional[datetime] = Query(None, description="Desde (incluido, ISO 8601; sin zona, UTC)"),
+    end: Optional[datetime] = Query(None, description="Hasta (excluido)"),
+    user_id: Optional[int] = Query(None, description="Usuario modificado"),
+    actor_id: Optional[int] = Query(None, description="Usuario que hizo el cambio"),
+    action: Optional[str] = Query(None, description="create, update, deactivate, activate, password_change o delete"),
+    limit: int = Query(100, ge=1, le=1000, description="Número de eventos"),
+    current_user: TokenData = Depends(get_current_superuser)
+):
+    """
+    Registro de auditoría: quién cambió qué usuario y cuándo
+    
+    Eventos del rango [start, end), del más reciente al más antiguo. Solo
+    se guardan los nombres de los campos modificados, nunca sus valores.
+    En modo multi-tenant solo se ven los eventos del tenant. Requiere superusuario
+    """
+    if action is not None and action not in AUDIT_ACTIONS:
+        raise ValidationException("Acción no válida", {"available": list(AUDIT_ACTIONS)})
+    start_at, end_at = _audit_bound(start), _audit_bound(end)
+    if start_at is not None and end_at is not None and start_at >= end_at:
+        raise ValidationException("El inicio del rango debe ser anterior al final")
+    
+    tenant = None
+    if settings.TENANCY_ENABLED:
+        from app.core.tenancy import current_tenant
+        tenant = current_tenant.get()
+    
+    events = await audit_log.query(
+        start=start_at, end=end_at, user_id=user_id, actor_id=actor_id,
+        action=action, tenant=tenant, limit=limit
+    )
+    return {"events": events, "total": len(events), "enabled": settings.AUDIT_ENABLED}
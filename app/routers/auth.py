@@ -8,8 +8,9 @@ from app.core.database import get_db
 from app.services.auth_service import AuthService
 from app.schemas.auth import LoginRequest, TokenResponse, RefreshTokenRequest
 from app.core.exceptions import UnauthorizedException
+from app.core.tracing import TracedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 
 @router.post("/login", response_model=TokenResponse)
 async def login(
@@ -6,6 +6,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
+from app.core.jobs import JobQueue, job_queue
 from app.services.auth_service import AuthService
 from app.schemas.auth import TokenData
 
@@ -34,3 +35,18 @@ async def get_current_active_user(
 ) -> TokenData:
     """Dependency para obtener usuario activo actual"""
     return current_user
+
+async def get_current_superuser(
+    current_user: TokenData = Depends(get_current_user)
+) -> TokenData:
+    """Dependency para operaciones de administración (solo superusuarios)"""
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Se requieren permisos de administrador"
+        )
+    return current_user
+
+def get_job_queue() -> JobQueue:
+    """Dependency para la cola de trabajos (sustituible en los tests)"""
+    return job_queue
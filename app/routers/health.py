@@ -1,14 +1,22 @@
 """
 Router para health checks
 """
-from fastapi import APIRouter, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 import logging
-import os
 
-from app.core.database import get_db
 from app.core.config import settings
+from app.core.singleflight import singleflight_stats
+from app.core.maintenance import maintenance_scheduler
+from app.core.jobs import job_queue
+from app.core.compression import compression_stats
+from app.core.avatars import avatar_store
+from app.core.audit import audit_log
+from app.core.lifecycle import lifecycle
+from app.core.probes import health_prober
+from app.core.tenancy import tenant_registry
+from app.core.tracing import tracer
+from app.repositories.write_behind import last_login_buffer
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -28,42 +36,95 @@ async def health_check():
         "database": "SQLite"
     }
 
+@router.get("/livez")
+async def liveness():
+    """
+    Liveness: el proceso responde
+    
+    No toca la base de datos; si esto falla el orquestador reinicia el proceso
+    """
+    return {"status": "alive"}
+
+@router.get("/readyz")
+async def readiness():
+    """
+    Readiness: la instancia puede recibir tráfico
+    
+    Responde desde memoria: estado del ciclo de vida y última sonda en
+    segundo plano (503 con los motivos si no está lista)
+    """
+    ready, reasons = health_prober.readiness()
+    body = {
+        "status": "ready" if ready else "not_ready",
+        "reasons": reasons,
+        "probe_age_seconds": health_prober.age_seconds
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
 @router.get("/health/detailed")
-async def detailed_health_check(db: AsyncSession = Depends(get_db)):
+async def detailed_health_check():
     """
     Health check detallado
     
-    Incluye verificación de base de datos SQLite
+    Sirve la última instantánea de la sonda en segundo plano (latencia de
+    SQLite, uso del pool, tamaño del archivo y del WAL, retraso del event
+    loop) junto con su antigüedad; solo sondea en la petición si todavía no
+    hay instantánea o la sonda no está en marcha y la instantánea caducó
     """
+    snapshot = health_prober.snapshot
+    if snapshot is None or (not health_prober.running and health_prober.age_seconds > health_prober.interval):
+        snapshot = await health_prober.refresh()
+    
     health_status = {
-        "status": "healthy",
+        "status": snapshot["status"],
         "service": settings.PROJECT_NAME,
         "version": settings.VERSION,
         "environment": settings.ENVIRONMENT,
         "database": "SQLite",
-        "checks": {}
+        "checks": {
+            "database": snapshot["databases"].get("main"),
+            "databases": snapshot["databases"],
+            "event_loop_lag": snapshot["event_loop_lag"]
+        },
+        "probe": {
+            "taken_at": snapshot["taken_at"],
+            "age_seconds": health_prober.age_seconds,
+            "interval_seconds": health_prober.interval,
+            "running": health_prober.running
+        }
     }
     
-    # Verificar base de datos SQLite
-    try:
-        await db.execute(text("SELECT 1"))
-        
-        # Verificar si el archivo de base de datos existe
-        db_file_exists = os.path.exists("./users.db")
-        db_file_size = os.path.getsize("./users.db") if db_file_exists else 0
-        
-        health_status["checks"]["database"] = {
-            "status": "healthy",
-            "message": "SQLite connection successful",
-            "file_exists": db_file_exists,
-            "file_size_bytes": db_file_size
-        }
-    except Exception as e:
-        logger.error(f"SQLite health check failed: {e}")
-        health_status["status"] = "unhealthy"
-        health_status["checks"]["database"] = {
-            "status": "unhealthy",
-            "message": f"SQLite connection failed: {str(e)}"
-        }
+    # Contadores de lecturas agrupadas (single-flight)
+    health_status["read_coalescing"] = singleflight_stats()
+    
+    # Última ejecución y duración de cada tarea de mantenimiento
+    health_status["maintenance"] = maintenance_scheduler.status()
+    
+    # Logins pendientes de escribir y retraso de la escritura diferida
+    health_status["last_login_write_behind"] = last_login_buffer.stats()
+    
+    # Bytes y CPU de la compresión de respuestas
+    health_status["compression"] = compression_stats.as_dict()
+    
+    # Workers y trabajos en ejecución de la cola de trabajos
+    health_status["jobs"] = job_queue.stats()
+    
+    # Subidas de avatares (deduplicadas, rechazadas) y miniaturas
+    health_status["avatars"] = avatar_store.stats()
+    
+    # Estado del ciclo de vida y peticiones en curso
+    health_status["lifecycle"] = lifecycle.stats()
+    
+    # Eventos de auditoría pendientes, escritos y descartados
+    health_status["audit"] = audit_log.stats()
+    
+    # Trazas muestreadas, spans exportados y descartados
+    if settings.TRACING_ENABLED:
+        health_status["tracing"] = tracer.stats()
+    
+    # Engines de tenants abiertos y su última sonda (modo multi-tenant)
+    if settings.TENANCY_ENABLED:
+        health_status["tenants"] = tenant_registry.stats()
+        health_status["checks"]["tenants"] = snapshot.get("tenants", {})
     
     return health_status
@@ -0,0 +1,122 @@
+"""
+Router para la cola de trabajos de administración
+"""
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Path, Query
+from fastapi.responses import FileResponse
+
+from app.core.config import settings
+from app.core.jobs import JobQueue
+from app.core.exceptions import NotFoundException
+from app.core.tracing import TracedRoute
+from app.schemas.job import JobCreate, JobResponse, JobList
+from app.schemas.auth import TokenData
+from app.routers.dependencies import get_current_superuser, get_job_queue
+from app.services.job_handlers import export_path
+
+router = APIRouter(route_class=TracedRoute)
+
+def _tenant() -> Optional[str]:
+    """En modo multi-tenant cada tenant solo ve sus trabajos"""
+    if settings.TENANCY_ENABLED:
+        from app.core.tenancy import current_tenant
+        return current_tenant.get()
+    return None
+
+@router.post("/", response_model=JobResponse, status_code=202)
+async def create_job(
+    job_data: JobCreate,
+    current_user: TokenData = Depends(get_current_superuser),
+    queue: JobQueue = Depends(get_job_queue)
+):
+    """
+    Encolar un trabajo
+
+    - **type**: Tipo de trabajo (ver GET /jobs/types)
+    - **params**: Parámetros del trabajo
+
+    Responde en el acto; el progreso se consulta en GET /jobs/{id}.
+    Requiere superusuario
+    """
+    job = await queue.submit(job_data.type, job_data.params, tenant=_tenant(), created_by=current_user.user_id)
+    return JobResponse.from_job(job)
+
+@router.get("/", response_model=JobList)
+async def list_jobs(
+    page: int = Query(1, ge=1, description="Número de página"),
+    size: int = Query(20, ge=1, le=100, description="Tamaño de página"),
+    status: Optional[str] = Query(None, description="pending, running, succeeded, failed o cancelled"),
+    current_user: TokenData = Depends(get_current_superuser),
+    queue: JobQueue = Depends(get_job_queue)
+):
+    """
+    Listar trabajos, del más reciente al más antiguo
+
+    Requiere superusuario
+    """
+    jobs, total = await queue.list((page - 1) * size, size, status, tenant=_tenant())
+    return JobList(
+        jobs=[JobResponse.from_job(job) for job in jobs],
+        total=total,
+        page=page,
+        size=size,
+        pages=(total + size - 1) // size
+    )
+
+@router.get("/types")
+async def list_job_types(
+    current_user: TokenData = Depends(get_current_superuser),
+    queue: JobQueue = Depends(get_job_queue)
+):
+    """
+    Tipos de trabajo disponibles
+
+    Requiere superusuario
+    """
+    return {"types": queue.descriptions}
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: int = Path(..., description="ID del trabajo"),
+    current_user: TokenData = Depends(get_current_superuser),
+    queue: JobQueue = Depends(get_job_queue)
+):
+    """
+    Estado, progreso y resultado de un trabajo
+
+    Requiere superusuario
+    """
+    return JobResponse.from_job(await queue.get(job_id, tenant=_tenant()))
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(
+    job_id: int = Path(..., description="ID del trabajo"),
+    current_user: TokenData = Depends(get_current_superuser),
+    queue: JobQueue = Depends(get_job_queue)
+):
+    """
+    Cancelar un trabajo
+
+    Un trabajo pendiente se cancela en el acto; uno en ejecución se detiene
+    al terminar el lote en curso. Requiere superusuario
+    """
+    return JobResponse.from_job(await queue.cancel(job_id, tenant=_tenant()))
+
+@router.get("/{job_id}/download")
+async def download_job_result(
+    job_id: int = Path(..., description="ID del trabajo"),
+    current_user: TokenData = Depends(get_current_superuser),
+    queue: JobQueue = Depends(get_job_queue)
+):
+    """
+    Descargar el fichero de una exportación terminada
+
+    Requiere superusuario
+    """
+    job = await queue.get(job_id, tenant=_tenant())
+    path = export_path(job.id)
+    if job.type != "export_users" or job.status != "succeeded" or not os.path.isfile(path):
+        raise NotFoundException("El trabajo no tiene un fichero disponible")
+    return FileResponse(path, media_type="application/x-ndjson", filename=os.path.basename(path))
@@ -1,19 +1,56 @@
 """
 Router para gestión de usuarios
 """
-from fastapi import APIRouter, Depends, Query, Path
+import hashlib
+
+from fastapi import APIRouter, Depends, Query, Path, Header, Request
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Optional
+from typing import Optional, List
 
-from app.core.database import get_db
+from app.core.database import get_db, session_scope
 from app.services.user_service import UserService
+from app.services.change_service import ChangeService
 from app.schemas.user import (
-    UserCreate, UserUpdate, UserResponse, UserList, PasswordChange
+    UserCreate, UserUpdate, UserResponse, UserList, PasswordChange,
+    UserBatchRequest, UserBatchResponse
 )
+from app.schemas.change import UserChangeList, ChangeCompactionResult
 from app.schemas.auth import TokenData
-from app.routers.dependencies import get_current_active_user
+from app.routers.dependencies import get_current_active_user, get_current_superuser
+from app.core.avatars import FileRangeResponse, avatar_store
+from app.core.config import settings
+from app.core.exceptions import NotFoundException, ValidationException
+from app.core.tracing import TracedRoute
+
+router = APIRouter(route_class=TracedRoute)
+
+FIELDS_DESCRIPTION = "Campos a devolver separados por comas (p. ej. id,username,full_name)"
+
+def _fieldset_response(result, fields: Optional[str]):
+    """
+    Las respuestas con ?fields= usan un modelo recortado que no encaja en
+    response_model: se serializan directamente
+    """
+    if fields is None:
+        return result
+    return Response(result.model_dump_json(), media_type="application/json")
 
-router = APIRouter()
+def _etag_response(result, request: Request) -> Response:
+    """
+    JSON con un ETag fuerte (hash del cuerpo)
+    
+    Con If-None-Match se responde 304 sin cuerpo; la compresión reutiliza
+    el cuerpo ya comprimido de una página que no ha cambiado
+    """
+    body = result.model_dump_json().encode()
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    # Comparación débil: la versión comprimida se envía como W/"..."
+    requested = {tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")}
+    if etag in requested:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
 
 @router.post("/", response_model=UserResponse, status_code=201)
 async def create_user(
@@ -38,10 +75,12 @@ async def create_user(
 
 @router.get("/", response_model=UserList)
 async def get_users(
+    request: Request,
     page: int = Query(1, ge=1, description="Número de página"),
     size: int = Query(20, ge=1, le=100, description="Tamaño de página"),
     search: Optional[str] = Query(None, description="Buscar por nombre, email o username"),
     is_active: Optional[bool] = Query(None, description="Filtrar por estado activo"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
     current_user: TokenData = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -52,16 +91,20 @@ async def get_users(
     - **size**: Tamaño de página (por defecto 20, máximo 100)
     - **search**: Buscar en nombre, email o username
     - **is_active**: Filtrar por usuarios activos/inactivos
+    - **fields**: Devolver (y leer de la base de datos) solo estos campos
     
-    Requiere autenticación
+    La respuesta lleva un ETag: con If-None-Match, una página sin cambios
+    devuelve 304. Requiere autenticación
     """
     user_service = UserService(db)
-    return await user_service.get_users(
+    result = await user_service.get_users(
         page=page,
         size=size,
         search=search,
-        is_active=is_active
+        is_active=is_active,
+        fields=fields
     )
+    return _etag_response(result, request)
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_profile(
@@ -76,9 +119,114 @@ async def get_current_user_profile(
     user_service = UserService(db)
     return await user_service.get_user_by_id(current_user.user_id)
 
+@router.post("/batch-get", response_model=UserBatchResponse)
+async def batch_get_users(
+    batch_data: UserBatchRequest,
+    current_user: TokenData = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Obtener varios usuarios por ID en una sola petición
+    
+    - **ids**: Lista de IDs (máximo configurable con MAX_BATCH_IDS)
+    
+    Los usuarios se devuelven en el orden solicitado; los IDs inexistentes
+    se informan en **missing**. Requiere autenticación
+    """
+    user_service = UserService(db)
+    return await user_service.get_users_by_ids(batch_data.ids)
+
+@router.get("/batch-get", response_model=UserBatchResponse)
+async def batch_get_users_query(
+    ids: List[str] = Query(..., description="IDs separados por comas o repetidos (?ids=1,2&ids=3)"),
+    current_user: TokenData = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Variante GET de la consulta por lotes
+    
+    - **ids**: IDs separados por comas o parámetro repetido
+    
+    Requiere autenticación
+    """
+    try:
+        user_ids = [int(value) for raw in ids for value in raw.split(",") if value.strip()]
+    except ValueError:
+        raise ValidationException("Los IDs deben ser números enteros")
+    
+    user_service = UserService(db)
+    return await user_service.get_users_by_ids(user_ids)
+
+@router.get("/changes", response_model=UserChangeList)
+async def get_user_changes(
+    since: int = Query(0, ge=0, description="Último número de secuencia procesado"),
+    limit: Optional[int] = Query(None, ge=1, description="Tamaño máximo del lote"),
+    current_user: TokenData = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Obtener los cambios de usuarios posteriores a un número de secuencia
+    
+    - **since**: Último seq procesado (0 para empezar desde el principio)
+    - **limit**: Tamaño del lote (máximo CHANGE_FEED_MAX_BATCH)
+    
+    Para seguir sincronizando, repetir la petición con **next_since**
+    mientras **has_more** sea verdadero. Requiere autenticación
+    """
+    change_service = ChangeService(db)
+    return await change_service.get_changes(since=since, limit=limit)
+
+@router.get("/changes/stream")
+async def stream_user_changes(
+    since: int = Query(0, ge=0, description="Último número de secuencia procesado"),
+    last_event_id: Optional[int] = Header(None, description="Reanudación automática de EventSource"),
+    current_user: TokenData = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Seguir los cambios de usuarios en vivo (Server-Sent Events)
+    
+    - **since**: Último seq procesado; la cabecera Last-Event-ID tiene prioridad
+    
+    Cada evento lleva el seq como id, la operación como tipo de evento y
+    el cambio en JSON como datos. Requiere autenticación
+    """
+    change_service = ChangeService(db)
+    change_service.ensure_available()
+    start = last_event_id if last_event_id is not None else since
+    
+    tenant = None
+    if settings.TENANCY_ENABLED:
+        from app.core.tenancy import current_tenant
+        tenant = current_tenant.get()
+    # La sesión de la petición vive hasta el final del stream: se cierra ya
+    # (devuelve su conexión) y cada consulta abre una sesión corta
+    await db.close()
+    return StreamingResponse(
+        change_service.stream(lambda: session_scope(tenant), since=start),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/changes/compact", response_model=ChangeCompactionResult)
+async def compact_user_changes(
+    retention_days: Optional[int] = Query(None, ge=0, description="Días de retención"),
+    current_user: TokenData = Depends(get_current_superuser),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Compactar el change feed
+    
+    Elimina las entradas anteriores al periodo de retención que ya tienen
+    una entrada posterior para el mismo usuario. Requiere superusuario
+    """
+    change_service = ChangeService(db)
+    return await change_service.compact(retention_days)
+
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: int = Path(..., description="ID del usuario"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
     current_user: TokenData = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -86,11 +234,13 @@ async def get_user(
     Obtener usuario por ID
     
     - **user_id**: ID del usuario a obtener
+    - **fields**: Devolver (y leer de la base de datos) solo estos campos
     
     Requiere autenticación
     """
     user_service = UserService(db)
-    return await user_service.get_user_by_id(user_id)
+    result = await user_service.get_user_by_id(user_id, fields=fields)
+    return _fieldset_response(result, fields)
 
 @router.put("/me", response_model=UserResponse)
 async def update_current_user(
@@ -109,9 +259,54 @@ async def update_current_user(
     
     Requiere autenticación
     """
-    user_service = UserService(db)
+    user_service = UserService(db, actor_id=current_user.user_id)
     return await user_service.update_user(current_user.user_id, user_data)
 
+@router.put("/me/avatar", response_model=UserResponse)
+async def upload_avatar(
+    request: Request,
+    current_user: TokenData = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Subir el avatar del usuario actual
+    
+    El cuerpo es la imagen tal cual (PNG, JPEG, GIF o WebP), no un formulario.
+    Se escribe en disco a medida que llega, sin cargarlo entero en memoria,
+    y se rechaza con 413 al superar AVATAR_MAX_BYTES. avatar_url pasa a
+    apuntar al fichero guardado.
+    
+    Requiere autenticación
+    """
+    content_length = request.headers.get("content-length")
+    declared_size = int(content_length) if content_length and content_length.isdigit() else None
+    user_service = UserService(db, actor_id=current_user.user_id)
+    return await user_service.set_avatar(current_user.user_id, request.stream(), declared_size)
+
+@router.api_route("/avatars/{name}", methods=["GET", "HEAD"])
+async def get_avatar(
+    request: Request,
+    name: str = Path(..., description="Nombre del fichero (<sha256>.<ext>)"),
+    size: Optional[int] = Query(None, description="Lado de la miniatura en píxeles"),
+):
+    """
+    Descargar un avatar o una de sus miniaturas
+    
+    Los ficheros nunca cambian (su nombre es el hash del contenido): se
+    sirven con ETag, Cache-Control de larga duración y soporte de Range.
+    Sin esa miniatura se devuelve la imagen original.
+    
+    Público (sin autenticación)
+    """
+    resolved = avatar_store.resolve(name, size)
+    if resolved is None:
+        raise NotFoundException("Avatar no encontrado")
+    path, etag, media_type = resolved
+    return FileRangeResponse(
+        path, request.headers, etag, media_type,
+        f"public, max-age={settings.AVATAR_CACHE_SECONDS}, immutable"
+    )
+
 @router.put("/{user_id}", response_model=UserResponse)
 async def update_user(
     user_data: UserUpdate,
@@ -131,7 +326,7 @@ async def update_user(
     
     Requiere autenticación
     """
-    user_service = UserService(db)
+    user_service = UserService(db, actor_id=current_user.user_id)
     return await user_service.update_user(user_id, user_data)
 
 @router.post("/me/change-password")
@@ -149,7 +344,7 @@ async def change_password(
     
     Requiere autenticación
     """
-    user_service = UserService(db)
+    user_service = UserService(db, actor_id=current_user.user_id)
     await user_service.change_password(current_user.user_id, password_data)
     return {"message": "Contraseña cambiada exitosamente"}
 
@@ -166,7 +361,7 @@ async def delete_user(
     
     Requiere autenticación
     """
-    user_service = UserService(db)
+    user_service = UserService(db, actor_id=current_user.user_id)
     await user_service.delete_user(user_id)
     return {"message": "Usuario desactivado exitosamente"}
 
@@ -183,5 +378,5 @@ async def activate_user(
     
     Requiere autenticación
     """
-    user_service = UserService(db)
+    user_service = UserService(db, actor_id=current_user.user_id)
     return await user_service.activate_user(user_id)
@@ -24,3 +24,4 @@ class TokenData(BaseModel):
     user_id: int
     email: str
     username: str
+    is_superuser: bool = False
@@ -0,0 +1,26 @@
+"""
+Schemas for the user change feed
+"""
+from pydantic import BaseModel
+from typing import Optional, Any, Dict
+from datetime import datetime
+
+class UserChangeResponse(BaseModel):
+    """Schema for a single change-feed entry"""
+    seq: int
+    user_id: int
+    operation: str
+    changed_at: datetime
+    data: Optional[Dict[str, Any]] = None
+
+class UserChangeList(BaseModel):
+    """Schema for a batch of changes after a sequence number"""
+    changes: list[UserChangeResponse]
+    next_since: int
+    has_more: bool
+    latest_seq: int
+
+class ChangeCompactionResult(BaseModel):
+    """Schema for change-feed compaction result"""
+    deleted: int
+    cutoff: datetime
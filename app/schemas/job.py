@@ -0,0 +1,69 @@
+"""
+Schemas for the background job queue
+"""
+from pydantic import BaseModel, Field
+from typing import Optional, Any, Dict
+from datetime import datetime
+import json
+
+class JobCreate(BaseModel):
+    """Schema for queueing a job"""
+    type: str = Field(..., description="Job type (see GET /api/v1/jobs/types)")
+    params: Dict[str, Any] = Field(default_factory=dict, description="Job parameters")
+
+class JobProgress(BaseModel):
+    """Schema for job progress"""
+    done: int
+    total: Optional[int] = None
+    percent: Optional[float] = None
+
+class JobResponse(BaseModel):
+    """Schema for job status"""
+    id: int
+    type: str
+    status: str
+    tenant: Optional[str] = None
+    params: Dict[str, Any]
+    progress: JobProgress
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    cancel_requested: bool
+    attempts: int
+    created_by: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @classmethod
+    def from_job(cls, job) -> "JobResponse":
+        """Build the response from a Job row (JSON columns decoded)"""
+        total = job.progress_total
+        done = job.progress_done or 0
+        return cls(
+            id=job.id,
+            type=job.type,
+            status=job.status,
+            tenant=job.tenant,
+            params=json.loads(job.params) if job.params else {},
+            progress=JobProgress(
+                done=done,
+                total=total,
+                percent=round(done * 100 / total, 1) if total else None
+            ),
+            result=json.loads(job.result) if job.result else None,
+            error=job.error,
+            cancel_requested=job.cancel_requested,
+            attempts=job.attempts,
+            created_by=job.created_by,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at
+        )
+
+class JobList(BaseModel):
+    """Schema for paginated job list"""
+    jobs: list[JobResponse]
+    total: int
+    page: int
+    size: int
+    pages: int
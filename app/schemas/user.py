@@ -1,69 +1,40 @@
 """
 Pydantic schemas for user validation
 """
-from pydantic import BaseModel, EmailStr, Field, validator
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, ValidationInfo, create_model, field_validator
+from typing import FrozenSet, Optional, Tuple, Type
+from functools import lru_cache
 from datetime import datetime
-import re
+
+from app.schemas.validators import Password, Phone, Username, check_passwords_match
 
 class UserBase(BaseModel):
     """Base schema for user"""
     email: EmailStr = Field(..., description="User email")
-    username: str = Field(..., min_length=3, max_length=50, description="Username")
+    username: Username = Field(..., min_length=3, max_length=50, description="Username")
     first_name: str = Field(..., min_length=1, max_length=50, description="First name")
     last_name: str = Field(..., min_length=1, max_length=50, description="Last name")
-    phone: Optional[str] = Field(None, max_length=20, description="Phone number")
+    phone: Phone = Field(None, max_length=20, description="Phone number")
     bio: Optional[str] = Field(None, max_length=500, description="Biography")
     avatar_url: Optional[str] = Field(None, max_length=500, description="Avatar URL")
-    
-    @validator('username')
-    def validate_username(cls, v):
-        if not re.match(r'^[a-zA-Z0-9_]+$', v):
-            raise ValueError('Username can only contain letters, numbers and underscores')
-        return v
-    
-    @validator('phone')
-    def validate_phone(cls, v):
-        if v and not re.match(r'^\+?[\d\s\-()]+$', v):
-            raise ValueError('Invalid phone format')
-        return v
 
 class UserCreate(UserBase):
     """Schema for creating user"""
-    password: str = Field(..., min_length=8, description="Password")
+    password: Password = Field(..., min_length=8, description="Password")
     confirm_password: str = Field(..., description="Password confirmation")
     
-    @validator('password')
-    def validate_password(cls, v):
-        if len(v) < 8:
-            raise ValueError('Password must be at least 8 characters long')
-        if not re.search(r'[A-Z]', v):
-            raise ValueError('Password must contain at least one uppercase letter')
-        if not re.search(r'[a-z]', v):
-            raise ValueError('Password must contain at least one lowercase letter')
-        if not re.search(r'\d', v):
-            raise ValueError('Password must contain at least one number')
-        return v
-    
-    @validator('confirm_password')
-    def passwords_match(cls, v, values):
-        if 'password' in values and v != values['password']:
-            raise ValueError('Passwords do not match')
-        return v
+    @field_validator('confirm_password')
+    @classmethod
+    def passwords_match(cls, v: str, info: ValidationInfo) -> str:
+        return check_passwords_match(v, info.data.get('password'))
 
 class UserUpdate(BaseModel):
     """Schema for updating user"""
     first_name: Optional[str] = Field(None, min_length=1, max_length=50)
     last_name: Optional[str] = Field(None, min_length=1, max_length=50)
-    phone: Optional[str] = Field(None, max_length=20)
+    phone: Phone = Field(None, max_length=20)
     bio: Optional[str] = Field(None, max_length=500)
     avatar_url: Optional[str] = Field(None, max_length=500)
-    
-    @validator('phone')
-    def validate_phone(cls, v):
-        if v and not re.match(r'^\+?[\d\s\-()]+$', v):
-            raise ValueError('Invalid phone format')
-        return v
 
 class UserResponse(UserBase):
     """Schema for user response"""
@@ -75,8 +46,7 @@ class UserResponse(UserBase):
     last_login: Optional[datetime]
     full_name: str
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class UserList(BaseModel):
     """Schema for paginated user list"""
@@ -86,26 +56,51 @@ class UserList(BaseModel):
     size: int
     pages: int
 
+class UserBatchRequest(BaseModel):
+    """Schema for batch lookup by IDs"""
+    ids: list[int] = Field(..., min_length=1, description="User IDs to resolve")
+
+class UserBatchResponse(BaseModel):
+    """Schema for batch lookup response (users in request order)"""
+    users: list[UserResponse]
+    missing: list[int]
+
+# Fields a client can select with ?fields= (sparse fieldsets)
+USER_FIELDS = tuple(UserResponse.model_fields)
+
+@lru_cache(maxsize=128)
+def sparse_user_models(fields: FrozenSet[str]) -> Tuple[Type[BaseModel], Type[BaseModel]]:
+    """
+    Trimmed UserResponse and UserList models for a set of USER_FIELDS
+
+    Built once per field set; the fields keep the declaration order and
+    metadata of UserResponse.
+    """
+    selected = [name for name in USER_FIELDS if name in fields]
+    suffix = "_".join(selected)
+    item = create_model(
+        f"UserResponse_{suffix}",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (UserResponse.model_fields[name].annotation, UserResponse.model_fields[name])
+           for name in selected}
+    )
+    page = create_model(
+        f"UserList_{suffix}",
+        users=(list[item], ...),
+        total=(int, ...),
+        page=(int, ...),
+        size=(int, ...),
+        pages=(int, ...)
+    )
+    return item, page
+
 class PasswordChange(BaseModel):
     """Schema for password change"""
     current_password: str = Field(..., description="Current password")
-    new_password: str = Field(..., min_length=8, description="New password")
+    new_password: Password = Field(..., min_length=8, description="New password")
     confirm_password: str = Field(..., description="New password confirmation")
     
-    @validator('new_password')
-    def validate_password(cls, v):
-        if len(v) < 8:
-            raise ValueError('Password must be at least 8 characters long')
-        if not re.search(r'[A-Z]', v):
-            raise ValueError('Password must contain at least one uppercase letter')
-        if not re.search(r'[a-z]', v):
-            raise ValueError('Password must contain at least one lowercase letter')
-        if not re.search(r'\d', v):
-            raise ValueError('Password must contain at least one number')
-        return v
-    
-    @validator('confirm_password')
-    def passwords_match(cls, v, values):
-        if 'new_password' in values and v != values['new_password']:
-            raise ValueError('Passwords do not match')
-        return v
+    @field_validator('confirm_password')
+    @classmethod
+    def passwords_match(cls, v: str, info: ValidationInfo) -> str:
+        return check_passwords_match(v, info.data.get('new_password'))
@@ -0,0 +1,84 @@
+"""
+Shared, precompiled validation rules for the user schemas
+
+The rules are plain functions wrapped in ``Annotated`` types, so every
+schema that accepts a username, phone or password applies the same policy
+with the same error messages.
+"""
+import re
+from functools import lru_cache
+from typing import Annotated, Any, Dict, Iterable, List, Optional, Tuple, Type, TypeVar
+
+from pydantic import AfterValidator, BaseModel, TypeAdapter, ValidationError
+
+USERNAME_PATTERN = re.compile(r'^[a-zA-Z0-9_]+$')
+PHONE_PATTERN = re.compile(r'^\+?[\d\s\-()]+$')
+
+PASSWORD_MIN_LENGTH = 8
+# Every character class in one match (the common case, a valid password)
+PASSWORD_POLICY = re.compile(r'(?=[^A-Z]*[A-Z])(?=[^a-z]*[a-z])(?=\D*\d)')
+# Checked one by one, in this order, only to report the first missing class
+PASSWORD_RULES = (
+    (re.compile(r'[A-Z]'), 'Password must contain at least one uppercase letter'),
+    (re.compile(r'[a-z]'), 'Password must contain at least one lowercase letter'),
+    (re.compile(r'\d'), 'Password must contain at least one number'),
+)
+
+def check_username(value: str) -> str:
+    if not USERNAME_PATTERN.match(value):
+        raise ValueError('Username can only contain letters, numbers and underscores')
+    return value
+
+def check_phone(value: Optional[str]) -> Optional[str]:
+    if value and not PHONE_PATTERN.match(value):
+        raise ValueError('Invalid phone format')
+    return value
+
+def check_password(value: str) -> str:
+    if len(value) < PASSWORD_MIN_LENGTH:
+        raise ValueError(f'Password must be at least {PASSWORD_MIN_LENGTH} characters long')
+    if PASSWORD_POLICY.match(value) is None:
+        for pattern, message in PASSWORD_RULES:
+            if pattern.search(value) is None:
+                raise ValueError(message)
+    return value
+
+def check_passwords_match(confirmation: str, password: Optional[str]) -> str:
+    """``password`` is None when it already failed validation (nothing to compare)"""
+    if password is not None and confirmation != password:
+        raise ValueError('Passwords do not match')
+    return confirmation
+
+Username = Annotated[str, AfterValidator(check_username)]
+Phone = Annotated[Optional[str], AfterValidator(check_phone)]
+Password = Annotated[str, AfterValidator(check_password)]
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+@lru_cache(maxsize=None)
+def list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    """TypeAdapter for ``list[model]``, built once per model"""
+    return TypeAdapter(List[model])
+
+def validate_many(
+    model: Type[ModelT],
+    payloads: Iterable[Any]
+) -> Tuple[List[ModelT], Dict[int, List[Dict[str, Any]]]]:
+    """
+    Validate a list of payloads in one call
+
+    Returns the valid models and the errors of the rest, keyed by their
+    position in ``payloads``. A fully valid list costs a single
+    ``validate_python`` call.
+    """
+    payloads = list(payloads)
+    try:
+        return list_adapter(model).validate_python(payloads), {}
+    except ValidationError as exc:
+        errors: Dict[int, List[Dict[str, Any]]] = {}
+        for error in exc.errors(include_url=False):
+            index = error["loc"][0]
+            errors.setdefault(index, []).append({**error, "loc": error["loc"][1:]})
+
+    valid = [model.model_validate(payload) for index, payload in enumerate(payloads) if index not in errors]
+    return valid, errors
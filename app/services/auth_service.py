@@ -11,9 +11,12 @@ from app.schemas.auth import LoginRequest, TokenResponse, TokenData
 from app.core.security import verify_password, create_access_token, create_refresh_token, verify_token
 from app.core.exceptions import UnauthorizedException, ValidationException
 from app.core.config import settings
+from app.core.tenancy import current_tenant
+from app.core.tracing import trace_layer
 
 logger = logging.getLogger(__name__)
 
+@trace_layer("service")
 class AuthService:
     """Servicio de autenticación"""
     
@@ -23,8 +26,8 @@ class AuthService:
     async def authenticate_user(self, login_data: LoginRequest) -> TokenResponse:
         """Autenticar usuario y generar tokens"""
         
-        # Buscar usuario por email
-        db_user = await self.repository.get_by_email(login_data.email)
+        # Buscar usuario por email (solo las columnas de autenticación)
+        db_user = await self.repository.get_auth_by_email(login_data.email)
         
         if not db_user:
             raise UnauthorizedException("Credenciales inválidas")
@@ -38,8 +41,7 @@ class AuthService:
             raise UnauthorizedException("Cuenta desactivada")
         
         # Actualizar último login
-        db_user.last_login = datetime.utcnow()
-        await self.repository.db.commit()
+        await self.repository.touch_last_login(db_user.id, datetime.utcnow())
         
         # Crear tokens
         token_data = {
@@ -47,6 +49,7 @@ class AuthService:
             "email": db_user.email,
             "username": db_user.username
         }
+        self._add_tenant_claim(token_data)
         
         access_token = create_access_token(token_data)
         refresh_token = create_refresh_token(token_data)
@@ -67,10 +70,11 @@ class AuthService:
             payload = verify_token(refresh_token, "refresh")
         except Exception:
             raise UnauthorizedException("Refresh token inválido")
+        self._check_tenant_claim(payload)
         
         # Obtener usuario
         user_id = payload.get("user_id")
-        db_user = await self.repository.get_by_id(user_id)
+        db_user = await self.repository.get_identity_by_id(user_id)
         
         if not db_user or not db_user.is_active:
             raise UnauthorizedException("Usuario no válido")
@@ -81,6 +85,7 @@ class AuthService:
             "email": db_user.email,
             "username": db_user.username
         }
+        self._add_tenant_claim(token_data)
         
         access_token = create_access_token(token_data)
         new_refresh_token = create_refresh_token(token_data)
@@ -100,10 +105,11 @@ class AuthService:
             payload = verify_token(token, "access")
         except Exception:
             raise UnauthorizedException("Token inválido")
+        self._check_tenant_claim(payload)
         
         # Verificar que el usuario existe y está activo
         user_id = payload.get("user_id")
-        db_user = await self.repository.get_by_id(user_id)
+        db_user = await self.repository.get_identity_by_id(user_id)
         
         if not db_user or not db_user.is_active:
             raise UnauthorizedException("Usuario no válido")
@@ -111,5 +117,18 @@ class AuthService:
         return TokenData(
             user_id=db_user.id,
             email=db_user.email,
-            username=db_user.username
+            username=db_user.username,
+            is_superuser=bool(db_user.is_superuser)
         )
+    
+    @staticmethod
+    def _add_tenant_claim(token_data: dict) -> None:
+        """Incluir el tenant en los tokens (modo multi-tenant)"""
+        if settings.TENANCY_ENABLED:
+            token_data[settings.TENANT_TOKEN_CLAIM] = current_tenant.get()
+    
+    @staticmethod
+    def _check_tenant_claim(payload: dict) -> None:
+        """Un token solo es válido en el tenant para el que se emitió"""
+        if settings.TENANCY_ENABLED and payload.get(settings.TENANT_TOKEN_CLAIM) != current_tenant.get():
+            raise UnauthorizedException("Token inválido para este tenant")
@@ -0,0 +1,119 @@
+"""
+Servicio del change feed de usuarios (sincronización incremental)
+"""
+from typing import AsyncContextManager, AsyncIterator, Callable, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from datetime import datetime, timedelta
+import json
+import logging
+
+from app.repositories.change_repository import ChangeRepository
+from app.schemas.change import UserChangeResponse, UserChangeList, ChangeCompactionResult
+from app.core.change_feed import change_notifier
+from app.core.lifecycle import lifecycle
+from app.core.exceptions import ValidationException
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class ChangeService:
+    """Servicio para consultar, seguir en vivo y compactar el change feed"""
+    
+    def __init__(self, db: AsyncSession):
+        self.repository = ChangeRepository(db)
+        self.sharded = isinstance(db.sync_session, ShardedSession)
+    
+    def ensure_available(self) -> None:
+        """
+        El feed necesita un seq único y ordenado: con shards cada fichero
+        numera sus cambios por separado, así que no hay un orden global
+        """
+        if self.sharded:
+            raise ValidationException(
+                "El change feed no está disponible con almacenamiento particionado"
+            )
+    
+    async def get_changes(self, since: int = 0, limit: Optional[int] = None) -> UserChangeList:
+        """Obtener el siguiente lote de cambios posteriores a `since`"""
+        self.ensure_available()
+        if since < 0:
+            raise ValidationException("El parámetro since debe ser mayor o igual a 0")
+        
+        if limit is None or limit > settings.CHANGE_FEED_MAX_BATCH:
+            limit = settings.CHANGE_FEED_MAX_BATCH
+        elif limit < 1:
+            raise ValidationException("El tamaño del lote debe ser mayor a 0")
+        
+        # Pedir uno más para saber si quedan cambios sin devolver
+        entries = await self.repository.get_since(since, limit + 1)
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+        
+        changes = [self._to_response(entry) for entry in entries]
+        next_since = changes[-1].seq if changes else since
+        latest_seq = await self.repository.get_latest_seq() if has_more else next_since
+        
+        return UserChangeList(
+            changes=changes,
+            next_since=next_since,
+            has_more=has_more,
+            latest_seq=max(latest_seq, next_since)
+        )
+    
+    async def stream(
+        self,
+        sessions: Callable[[], AsyncContextManager[AsyncSession]],
+        since: int = 0
+    ) -> AsyncIterator[str]:
+        """
+        Generar eventos Server-Sent Events a partir de `since`
+        
+        Cada consulta abre su propia sesión corta con `sessions`: la conexión
+        (y la instantánea de lectura) no se retiene mientras se espera entre
+        consultas. La generación del notificador se toma antes de consultar,
+        así un cambio confirmado entre la consulta y la espera no se pierde.
+        Termina al empezar el apagado (el cliente se reconecta a otra
+        instancia con Last-Event-ID).
+        """
+        last_seq = since
+        while not lifecycle.draining:
+            generation = change_notifier.generation
+            async with sessions() as db:
+                entries = await ChangeRepository(db).get_since(last_seq, settings.CHANGE_FEED_MAX_BATCH)
+                changes = [self._to_response(entry) for entry in entries]
+            
+            for change in changes:
+                last_seq = change.seq
+                yield (
+                    f"id: {change.seq}\n"
+                    f"event: {change.operation}\n"
+                    f"data: {change.model_dump_json()}\n\n"
+                )
+            
+            if len(entries) < settings.CHANGE_FEED_MAX_BATCH:
+                notified = await change_notifier.wait(settings.CHANGE_FEED_HEARTBEAT_SECONDS, generation)
+                if not notified:
+                    # Comentario SSE para mantener viva la conexión
+                    yield ": keep-alive\n\n"
+    
+    async def compact(self, retention_days: Optional[int] = None) -> ChangeCompactionResult:
+        """Compactar las entradas más antiguas que el periodo de retención"""
+        if retention_days is None:
+            retention_days = settings.CHANGE_FEED_RETENTION_DAYS
+        
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        deleted = await self.repository.compact(cutoff)
+        
+        return ChangeCompactionResult(deleted=deleted, cutoff=cutoff)
+    
+    @staticmethod
+    def _to_response(entry) -> UserChangeResponse:
+        """Convertir una entrada del registro en su respuesta"""
+        return UserChangeResponse(
+            seq=entry.seq,
+            user_id=entry.user_id,
+            operation=entry.operation,
+            changed_at=entry.changed_at,
+            data=json.loads(entry.payload) if entry.payload else None
+        )
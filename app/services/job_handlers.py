@@ -0,0 +1,227 @@
+"""
+Trabajos de administración para la cola persistente
+
+Cada trabajo recorre los usuarios por ID ascendente en lotes y guarda como
+checkpoint el último ID procesado, así que al reanudarse tras un reinicio
+continúa donde se quedó. Con shards la consulta se ejecuta en todos ellos:
+se ordena la unión y se corta el lote, lo que mantiene el orden global.
+"""
+import asyncio
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
+
+from sqlalchemy import select, func, or_, text
+
+from app.core.change_feed import change_notifier
+from app.core.config import settings
+from app.core.exceptions import NotFoundException, ValidationException
+from app.models.user import User
+from app.models.user_change import UserChange
+from app.repositories.records import UserRecord, USER_RECORD_COLUMNS
+from app.repositories.user_repository import UserRepository
+from app.schemas.user import UserResponse
+from app.services.change_service import ChangeService
+
+if TYPE_CHECKING:
+    from app.core.jobs import JobContext, JobQueue
+
+def _first(rows: list, limit: int, key=lambda row: row.id) -> list:
+    """Primeras `limit` filas por ID de la unión de todos los shards"""
+    return sorted(rows, key=key)[:limit]
+
+async def _count(ctx: "JobContext", query) -> int:
+    """Conteo total (suma de los conteos de cada shard)"""
+    async with ctx.sessions() as session:
+        result = await session.execute(query)
+        return sum(result.scalars().all())
+
+def _write_at(path: str, offset: int, data: bytes) -> int:
+    """Escribir desde `offset`, descartando lo escrito tras el último checkpoint"""
+    mode = "r+b" if os.path.exists(path) else "wb"
+    with open(path, mode) as f:
+        f.truncate(offset)
+        f.seek(offset)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    return offset + len(data)
+
+def export_path(job_id: int) -> str:
+    """Fichero de exportación de un trabajo"""
+    return os.path.join(os.path.abspath(settings.JOBS_EXPORT_DIR), f"users_job_{job_id}.jsonl")
+
+# --- export_users ---
+
+def validate_export(params: Dict[str, Any]) -> None:
+    if params.get("is_active") not in (None, True, False):
+        raise ValidationException("is_active debe ser true, false o null")
+
+async def export_users(ctx: "JobContext") -> Dict[str, Any]:
+    """Exportar usuarios a JSON Lines (un UserResponse por línea)"""
+    is_active: Optional[bool] = ctx.params.get("is_active")
+    path = export_path(ctx.job_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    last_id = ctx.checkpoint.get("last_id", 0)
+    written = ctx.checkpoint.get("bytes", 0)
+    exported = ctx.checkpoint.get("exported", 0)
+
+    filters = [User.is_active == is_active] if is_active is not None else []
+    total = await _count(ctx, select(func.count(User.id)).where(*filters))
+    await ctx.progress(exported, total)
+
+    while True:
+        async with ctx.sessions() as session:
+            result = await session.execute(
+                select(*USER_RECORD_COLUMNS)
+                .where(User.id > last_id, *filters)
+                .order_by(User.id)
+                .limit(ctx.batch_size)
+            )
+            records = _first([UserRecord(*row) for row in result], ctx.batch_size)
+        if not records:
+            break
+
+        data = "".join(UserResponse.from_orm(record).model_dump_json() + "\n" for record in records)
+        written = await asyncio.to_thread(_write_at, path, written, data.encode())
+        last_id = records[-1].id
+        exported += len(records)
+        await ctx.progress(exported, total, {"last_id": last_id, "bytes": written, "exported": exported})
+
+    if not os.path.exists(path):
+        await asyncio.to_thread(_write_at, path, 0, b"")
+    return {"file": os.path.basename(path), "exported": exported, "bytes": written}
+
+# --- deactivate_users ---
+
+def validate_deactivation(params: Dict[str, Any]) -> None:
+    ids = params.get("ids")
+    before = params.get("last_login_before")
+    if not ids and not before:
+        raise ValidationException("Se requiere ids o last_login_before")
+    if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, int) for i in ids)):
+        raise ValidationException("ids debe ser una lista de números enteros")
+    if before is not None:
+        try:
+            datetime.fromisoformat(before)
+        except (TypeError, ValueError):
+            raise ValidationException("last_login_before debe ser una fecha ISO 8601")
+
+def _deactivation_filters(params: Dict[str, Any]) -> list:
+    """Usuarios activos, no superusuarios, por ID o sin login desde la fecha dada"""
+    criteria = []
+    if params.get("ids"):
+        criteria.append(User.id.in_(params["ids"]))
+    if params.get("last_login_before"):
+        before = datetime.fromisoformat(params["last_login_before"])
+        # Quien nunca ha iniciado sesión cuenta desde su alta
+        criteria.append(func.coalesce(User.last_login, User.created_at) < before)
+    return [User.is_active == True, User.is_superuser == False, or_(*criteria)]
+
+async def deactivate_users(ctx: "JobContext") -> Dict[str, Any]:
+    """Desactivar usuarios en lotes (cada uno con su entrada en el change feed)"""
+    filters = _deactivation_filters(ctx.params)
+    last_id = ctx.checkpoint.get("last_id", 0)
+    deactivated = ctx.checkpoint.get("deactivated", 0)
+
+    remaining = await _count(ctx, select(func.count(User.id)).where(User.id > last_id, *filters))
+    total = deactivated + remaining
+    await ctx.progress(deactivated, total)
+
+    while True:
+        async with ctx.sessions() as session:
+            result = await session.execute(
+                select(User.id).where(User.id > last_id, *filters).order_by(User.id).limit(ctx.batch_size)
+            )
+            user_ids = _first(list(result.scalars().all()), ctx.batch_size, key=lambda user_id: user_id)
+            if not user_ids:
+                break
+
+            repository = UserRepository(session, actor_id=ctx.created_by, tenant=ctx.tenant)
+            for user_id in user_ids:
+                try:
+                    await repository.delete(user_id)
+                    deactivated += 1
+                except NotFoundException:
+                    # Borrado mientras tanto
+                    pass
+
+        last_id = user_ids[-1]
+        await ctx.progress(deactivated, total, {"last_id": last_id, "deactivated": deactivated})
+
+    return {"deactivated": deactivated}
+
+# --- backfill_change_feed ---
+
+async def backfill_change_feed(ctx: "JobContext") -> Dict[str, Any]:
+    """Añadir al change feed los usuarios que aún no tienen ninguna entrada"""
+    without_changes = ~select(UserChange.seq).where(UserChange.user_id == User.id).exists()
+    last_id = ctx.checkpoint.get("last_id", 0)
+    added = ctx.checkpoint.get("added", 0)
+
+    async with ctx.sessions() as session:
+        ChangeService(session).ensure_available()
+    total = added + await _count(ctx, select(func.count(User.id)).where(User.id > last_id, without_changes))
+    await ctx.progress(added, total)
+
+    while True:
+        async with ctx.sessions() as session:
+            result = await session.execute(
+                select(User).where(User.id > last_id, without_changes).order_by(User.id).limit(ctx.batch_size)
+            )
+            users: List[User] = list(result.scalars().all())
+            if not users:
+                break
+            for user in users:
+                snapshot = UserResponse.from_orm(user).model_dump(mode="json")
+                session.add(UserChange(
+                    user_id=user.id,
+                    operation="create",
+                    payload=json.dumps(snapshot, separators=(",", ":"))
+                ))
+            await session.commit()
+        change_notifier.notify()
+
+        last_id = users[-1].id
+        added += len(users)
+        await ctx.progress(added, total, {"last_id": last_id, "added": added})
+
+    return {"added": added}
+
+# --- reindex ---
+
+async def reindex(ctx: "JobContext") -> Dict[str, Any]:
+    """
+    Reconstruir los índices y actualizar las estadísticas del planificador
+
+    Con shards, una sentencia sin pista de shard solo llega a uno de ellos:
+    cada paso se ejecuta explícitamente en el directorio y en cada shard.
+    """
+    steps = ["REINDEX", "ANALYZE"]
+    async with ctx.sessions() as session:
+        shard_engines = session.info.get("shard_engines")
+        directory_sessions = session.info.get("directory_sessions")
+    databases = ["directory", *shard_engines] if shard_engines else ["main"]
+    work = [(database, statement) for database in databases for statement in steps]
+
+    for step in range(ctx.checkpoint.get("step", 0), len(work)):
+        database, statement = work[step]
+        sessions = directory_sessions if database == "directory" else ctx.sessions
+        bind_arguments = {"shard_id": database} if database in (shard_engines or {}) else None
+        async with sessions() as session:
+            await session.execute(text(statement), bind_arguments=bind_arguments)
+            await session.commit()
+        await ctx.progress(step + 1, len(work), {"step": step + 1})
+    return {"steps": steps, "databases": databases}
+
+def register_all(queue: "JobQueue") -> None:
+    """Registrar los trabajos disponibles en POST /api/v1/jobs"""
+    queue.register("export_users", export_users,
+                   "Exportar usuarios a JSON Lines (params: is_active)", validate_export)
+    queue.register("deactivate_users", deactivate_users,
+                   "Desactivar usuarios (params: ids, last_login_before)", validate_deactivation)
+    queue.register("backfill_change_feed", backfill_change_feed,
+                   "Añadir al change feed los usuarios sin entradas")
+    queue.register("reindex", reindex, "REINDEX y ANALYZE de la base de datos")
@@ -1,35 +1,61 @@
 """
 Servicio de lógica de negocio para usuarios
 """
-from typing import Optional, List
+from typing import AsyncIterator, FrozenSet, Optional, List
 from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 from datetime import datetime
 
 from app.repositories.user_repository import UserRepository
-from app.schemas.user import UserCreate, UserUpdate, UserResponse, UserList, PasswordChange
+from app.repositories.records import record_projection
+from app.schemas.user import (
+    UserCreate, UserUpdate, UserResponse, UserList, PasswordChange, UserBatchResponse,
+    USER_FIELDS, sparse_user_models
+)
+from app.core.avatars import avatar_store, avatar_url
 from app.core.security import verify_password
 from app.core.exceptions import ValidationException, UnauthorizedException
 from app.core.config import settings
+from app.core.singleflight import user_lookups, user_lists
+from app.core.tracing import trace_layer
 
 logger = logging.getLogger(__name__)
 
+def parse_fields(fields: Optional[str]) -> Optional[FrozenSet[str]]:
+    """
+    Conjunto de campos pedidos con ?fields= (None: respuesta completa)
+    
+    Solo se admiten campos de USER_FIELDS; los desconocidos se rechazan.
+    """
+    if fields is None:
+        return None
+    requested = frozenset(name.strip() for name in fields.split(",") if name.strip())
+    if not requested:
+        raise ValidationException("Debe indicar al menos un campo")
+    unknown = requested.difference(USER_FIELDS)
+    if unknown:
+        raise ValidationException(
+            "Campos no permitidos: " + ", ".join(sorted(unknown)),
+            details={"unknown": sorted(unknown), "allowed": list(USER_FIELDS)}
+        )
+    return requested
+
+@trace_layer("service")
 class UserService:
     """Servicio para lógica de negocio de usuarios"""
     
-    def __init__(self, db: AsyncSession):
-        self.repository = UserRepository(db)
+    def __init__(self, db: AsyncSession, actor_id: Optional[int] = None):
+        # actor_id: usuario autenticado que hace los cambios (registro de auditoría)
+        self.repository = UserRepository(db, actor_id=actor_id)
     
     async def create_user(self, user_data: UserCreate) -> UserResponse:
         """Crear un nuevo usuario con validaciones de negocio"""
         
         # Validaciones adicionales de negocio
-        existing_user = await self.repository.get_by_email(user_data.email)
-        if existing_user:
+        if await self.repository.is_email_taken(user_data.email):
             raise ValidationException("El email ya está registrado")
         
-        existing_username = await self.repository.get_by_username(user_data.username)
-        if existing_username:
+        if await self.repository.is_username_taken(user_data.username):
             raise ValidationException("El nombre de usuario ya está en uso")
         
         # Crear usuario
@@ -38,22 +64,61 @@ class UserService:
         logger.info(f"Nuevo usuario registrado: {db_user.email}")
         return UserResponse.from_orm(db_user)
     
-    async def get_user_by_id(self, user_id: int) -> UserResponse:
-        """Obtener usuario por ID"""
-        db_user = await self.repository.get_by_id(user_id)
-        if not db_user:
+    async def get_user_by_id(self, user_id: int, fields: Optional[str] = None) -> UserResponse:
+        """
+        Obtener usuario por ID (las peticiones concurrentes comparten la respuesta)
+        
+        Con fields solo se leen y devuelven esos campos, en un modelo recortado.
+        """
+        selected = parse_fields(fields)
+        
+        async def load() -> Optional[UserResponse]:
+            if selected is None:
+                record = await self.repository.get_record_by_id(user_id)
+                return UserResponse.from_orm(record) if record else None
+            model, _ = sparse_user_models(selected)
+            record = await self.repository.get_record_by_id(user_id, record_projection(selected))
+            return model.model_validate(record) if record else None
+        
+        response = await user_lookups.do(
+            (self.repository.flight_scope, "response", user_id, selected), load
+        )
+        if response is None:
             raise ValidationException("Usuario no encontrado")
         
-        return UserResponse.from_orm(db_user)
+        return response
+    
+    async def get_users_by_ids(self, user_ids: List[int]) -> UserBatchResponse:
+        """Obtener varios usuarios por ID conservando el orden de la petición"""
+        # Eliminar duplicados conservando la primera aparición
+        unique_ids = list(dict.fromkeys(user_ids))
+        
+        if not unique_ids:
+            raise ValidationException("Debe indicar al menos un ID")
+        
+        if len(unique_ids) > settings.MAX_BATCH_IDS:
+            raise ValidationException(
+                f"Se pueden solicitar como máximo {settings.MAX_BATCH_IDS} IDs por petición",
+                details={"max_ids": settings.MAX_BATCH_IDS, "requested": len(unique_ids)}
+            )
+        
+        found = {record.id: record for record in await self.repository.get_records_by_ids(unique_ids)}
+        
+        return UserBatchResponse(
+            users=[UserResponse.from_orm(found[user_id]) for user_id in unique_ids if user_id in found],
+            missing=[user_id for user_id in unique_ids if user_id not in found]
+        )
     
     async def get_users(
         self,
         page: int = 1,
         size: int = None,
         search: Optional[str] = None,
-        is_active: Optional[bool] = None
+        is_active: Optional[bool] = None,
+        fields: Optional[str] = None
     ) -> UserList:
-        """Obtener lista paginada de usuarios"""
+        """Obtener lista paginada de usuarios (con fields, solo esos campos)"""
+        selected = parse_fields(fields)
         
         # Validar parámetros de paginación
         if page < 1:
@@ -68,23 +133,34 @@ class UserService:
         
         skip = (page - 1) * size
         
-        users, total = await self.repository.get_all(
-            skip=skip,
-            limit=size,
-            search=search,
-            is_active=is_active
-        )
-        
-        # Calcular número total de páginas
-        pages = (total + size - 1) // size
-        
-        return UserList(
-            users=[UserResponse.from_orm(user) for user in users],
-            total=total,
-            page=page,
-            size=size,
-            pages=pages
-        )
+        async def load() -> UserList:
+            if selected is None:
+                item_model, list_model, columns = UserResponse, UserList, None
+            else:
+                item_model, list_model = sparse_user_models(selected)
+                columns = record_projection(selected)
+            users, total = await self.repository.get_records(
+                skip=skip,
+                limit=size,
+                search=search,
+                is_active=is_active,
+                columns=columns
+            )
+            
+            # Calcular número total de páginas
+            pages = (total + size - 1) // size
+            
+            return list_model(
+                users=[item_model.model_validate(user) for user in users],
+                total=total,
+                page=page,
+                size=size,
+                pages=pages
+            )
+        
+        # Listados idénticos concurrentes comparten una sola consulta
+        key = (self.repository.flight_scope, page, size, search, is_active, selected)
+        return await user_lists.do(key, load)
     
     async def update_user(self, user_id: int, user_data: UserUpdate) -> UserResponse:
         """Actualizar usuario"""
@@ -93,6 +169,19 @@ class UserService:
         logger.info(f"Usuario actualizado: {db_user.email}")
         return UserResponse.from_orm(db_user)
     
+    async def set_avatar(
+        self,
+        user_id: int,
+        chunks: AsyncIterator[bytes],
+        declared_size: Optional[int] = None
+    ) -> UserResponse:
+        """Guardar el avatar subido (en streaming) y apuntar avatar_url a él"""
+        name = await avatar_store.save(chunks, declared_size)
+        db_user = await self.repository.update(user_id, UserUpdate(avatar_url=avatar_url(name)))
+        
+        logger.info(f"Avatar actualizado para usuario: ID {user_id}")
+        return UserResponse.from_orm(db_user)
+    
     async def delete_user(self, user_id: int) -> bool:
         """Desactivar usuario"""
         result = await self.repository.delete(user_id)
@@ -124,13 +213,7 @@ class UserService:
         if not db_user:
             raise ValidationException("Usuario no encontrado")
         
-        update_data = UserUpdate()
-        db_user = await self.repository.update(user_id, update_data)
-        
-        # Activar manualmente
-        db_user.is_active = True
-        await self.repository.db.commit()
-        await self.repository.db.refresh(db_user)
+        db_user = await self.repository.activate(user_id)
         
         logger.info(f"Usuario activado: {db_user.email}")
         return UserResponse.from_orm(db_user)
@@ -2,18 +2,30 @@
 Main entry point for the FastAPI application
 """
 from fastapi import FastAPI, Request
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
 import uvicorn
+import asyncio
 import logging
 import os
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
-from app.core.database import init_db, check_db_connection
+from app.core.database import init_db, check_db_connection, database_engines, get_sqlite_path
 from app.core.exceptions import CustomException
-from app.routers import users, auth, health
+from app.routers import users, auth, health, admin, jobs
+from app.core.profiling import ProfilingMiddleware, profile_store
+from app.core.compression import CompressionMiddleware, compressed_cache
+from app.core.middleware import CORSMiddleware, HostMatcher, TrustedHostMiddleware
+from app.core.backup import backup_manager
+from app.core.maintenance import maintenance_scheduler
+from app.core.jobs import job_queue
+from app.core.avatars import avatar_store
+from app.core.audit import audit_log
+from app.core.lifecycle import DrainMiddleware, DrainingServer, checkpoint_truncate, lifecycle, run_shutdown
+from app.core.probes import health_prober
+from app.core.tracing import TracingMiddleware, tracer
+from app.core.tenancy import TenantMiddleware, tenant_registry
+from app.repositories.write_behind import last_login_buffer
 from app.core.logging_config import setup_logging
 
 # Configure logging
@@ -42,7 +54,6 @@ async def lifespan(app: FastAPI):
             else:
                 if attempt < max_retries - 1:
                     logger.warning("Retrying connection in 2 seconds...")
-                    import asyncio
                     await asyncio.sleep(2)
                 else:
                     logger.error("Could not establish connection after all attempts")
@@ -73,9 +84,95 @@ async def lifespan(app: FastAPI):
         logger.error(f"Traceback: {traceback.format_exc()}")
         logger.warning("Continuing with partial initialization...")
     
+    # Scheduled snapshots (disabled when BACKUP_INTERVAL_MINUTES is 0)
+    backup_manager.start_scheduler(settings.BACKUP_INTERVAL_MINUTES)
+    
+    # Background optimize/ANALYZE/checkpoint/vacuum
+    if settings.MAINTENANCE_ENABLED:
+        maintenance_scheduler.start()
+    
+    # Batched last_login writes (logins only touch memory)
+    if settings.LAST_LOGIN_WRITE_BEHIND:
+        last_login_buffer.start()
+    
+    # Batched audit writes (mutations only append to a bounded buffer)
+    if settings.AUDIT_ENABLED:
+        audit_log.start()
+    
+    # Batched span export to a file or an OTLP collector
+    if settings.TRACING_ENABLED:
+        tracer.start()
+    
+    # Workers for queued admin jobs (resume interrupted jobs from their checkpoint)
+    if settings.JOBS_ENABLED:
+        try:
+            await job_queue.start()
+        except Exception as e:
+            logger.error(f"Could not start the job queue: {e}")
+    
+    # Close tenant engines that have been idle for TENANT_IDLE_SECONDS
+    if settings.TENANCY_ENABLED:
+        tenant_registry.start_sweeper()
+    
+    # Probe endpoints answer from a snapshot refreshed in the background
+    if settings.HEALTH_PROBE_ENABLED:
+        health_prober.start()
+    
+    lifecycle.mark_ready()
     yield
     
     logger.info("Shutting down application...")
+    # Already off when DrainingServer got the signal
+    lifecycle.begin_drain()
+    
+    # SQLite files to checkpoint once nothing holds them open
+    sqlite_paths = [get_sqlite_path(str(e.url)) for e in database_engines.values()]
+    # The audit sink keeps its own WAL file (closed by flush_audit)
+    if settings.AUDIT_ENABLED and settings.AUDIT_SINK == "sqlite":
+        sqlite_paths.append(os.path.abspath(settings.AUDIT_SQLITE_PATH))
+    
+    async def drain_requests():
+        if not await lifecycle.wait_drained(settings.SHUTDOWN_DRAIN_SECONDS):
+            return {"abandoned": lifecycle.in_flight}
+        return None
+    
+    async def stop_schedulers():
+        await backup_manager.stop_scheduler()
+        await maintenance_scheduler.stop()
+    
+    async def close_avatars():
+        avatar_store.close()
+    
+    async def dispose_engines():
+        # Listed now: flushing last_login may have reopened tenant engines
+        sqlite_paths.extend(tenant_registry.path_for(t) for t in tenant_registry.open_tenants())
+        await tenant_registry.stop()
+        for database_engine in database_engines.values():
+            await database_engine.dispose()
+    
+    async def checkpoint_wal():
+        results = [await asyncio.to_thread(checkpoint_truncate, path) for path in sqlite_paths if path]
+        return {os.path.basename(r["path"]): r.get("wal_bytes_before", 0) for r in results}
+    
+    step_timeout = settings.SHUTDOWN_STEP_TIMEOUT_SECONDS
+    lifecycle.last_shutdown = await run_shutdown([
+        ("drain_requests", drain_requests, settings.SHUTDOWN_DRAIN_SECONDS + 1),
+        # Running jobs go back to the queue with their checkpoint
+        ("stop_jobs", job_queue.stop, step_timeout),
+        # Flush pending last_login values while every engine is still open
+        ("flush_last_login", last_login_buffer.stop, step_timeout),
+        # Write pending audit events (after the jobs, which also produce them)
+        ("flush_audit", audit_log.stop, step_timeout),
+        ("flush_traces", tracer.stop, step_timeout),
+        ("stop_schedulers", stop_schedulers, step_timeout),
+        ("close_avatars", close_avatars, step_timeout),
+        # Nothing may open a connection once the engines are disposed
+        ("stop_health_prober", health_prober.stop, step_timeout),
+        ("dispose_engines", dispose_engines, step_timeout),
+        ("wal_checkpoint", checkpoint_wal, step_timeout),
+    ])
+    lifecycle.state = "stopped"
+    logger.info("Shutdown complete")
 
 # Create FastAPI instance
 app = FastAPI(
@@ -87,7 +184,7 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# CORS middleware
+# CORS middleware (requests without an Origin header skip it)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.ALLOWED_HOSTS,
@@ -96,10 +193,52 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Trusted host middleware
+# Trusted host middleware (not installed for "*", where it accepts every host)
+if not HostMatcher(settings.ALLOWED_HOSTS).allow_any:
+    app.add_middleware(
+        TrustedHostMiddleware,
+        allowed_hosts=settings.ALLOWED_HOSTS
+    )
+
+# Response compression (gzip/brotli by Accept-Encoding)
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+        cache=compressed_cache
+    )
+
+# Request profiling (only installed when enabled, so it costs nothing otherwise)
+if settings.PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profile_store,
+        sample_rate=settings.PROFILING_SAMPLE_RATE,
+        header=settings.PROFILING_HEADER,
+        token=settings.PROFILING_TOKEN
+    )
+
+# Tenant resolution (header or token claim) for per-tenant databases
+if settings.TENANCY_ENABLED:
+    app.add_middleware(
+        TenantMiddleware,
+        header=settings.TENANT_HEADER,
+        claim=settings.TENANT_TOKEN_CLAIM
+    )
+
+# Server span of sampled requests (outside every layer but draining)
+if settings.TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware, tracer=tracer)
+
+# In-flight request count for draining; 503 once shutdown has started
+# (added last: outermost, so rejected requests skip every other layer).
+# Probes pass: liveness stays 200 and readiness reports the drain
 app.add_middleware(
-    TrustedHostMiddleware,
-    allowed_hosts=settings.ALLOWED_HOSTS
+    DrainMiddleware,
+    lifecycle=lifecycle,
+    probe_paths=("/api/v1/livez", "/api/v1/readyz")
 )
 
 # Global exception handler
@@ -129,6 +268,8 @@ async def general_exception_handler(request: Request, exc: Exception):
 app.include_router(health.router, prefix="/api/v1", tags=["Health"])
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
 app.include_router(users.router, prefix="/api/v1/users", tags=["Users"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["Admin"])
+app.include_router(jobs.router, prefix="/api/v1/jobs", tags=["Jobs"])
 
 @app.get("/")
 async def root():
@@ -157,10 +298,21 @@ async def debug_info():
     }
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=settings.ENVIRONMENT == "development",
-        log_level="info"
-    )
+    if settings.ENVIRONMENT == "development":
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=8000,
+            reload=True,
+            log_level="info"
+        )
+    else:
+        # Readiness off on SIGTERM before the socket closes, bounded connection draining
+        config = uvicorn.Config(
+            app,
+            host="0.0.0.0",
+            port=8000,
+            log_level="info",
+            timeout_graceful_shutdown=int(settings.SHUTDOWN_DRAIN_SECONDS)
+        )
+        DrainingServer(config, lifecycle, settings.SHUTDOWN_READINESS_DELAY_SECONDS).run()
@@ -0,0 +1,128 @@
+"""
+Benchmark: tamaño y CPU de la compresión de una página de 100 usuarios
+
+Mide cada codificación y nivel (gzip 1/6/9 y brotli si está instalado) sobre
+el JSON de un UserList, y el coste de extremo a extremo del middleware
+atendiendo la misma respuesta con y sin Accept-Encoding.
+
+Uso:
+    python scripts/bench_compression.py [--page-size 100] [--iterations 500]
+"""
+import argparse
+import asyncio
+import gzip
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.responses import Response
+
+from app.core.compression import CompressedCache, CompressionMiddleware, brotli
+from app.repositories.records import UserRecord
+from app.schemas.user import UserList, UserResponse
+
+def user_page(page_size: int) -> UserList:
+    """Página de usuarios con datos realistas"""
+    now = datetime.utcnow()
+    users = [
+        UserResponse.model_validate(UserRecord(
+            i, f"user{i}@example.com", f"user{i}", f"Nombre{i}", f"Apellido{i}",
+            i % 10 != 0, False, "+34600000000", "Bio de prueba " * 10, None,
+            now - timedelta(minutes=i), None, now - timedelta(seconds=i)
+        ))
+        for i in range(page_size)
+    ]
+    return UserList(users=users, total=5000, page=1, size=page_size, pages=5000 // page_size)
+
+def measure_codecs(body: bytes, iterations: int) -> None:
+    """Tamaño, ratio y tiempo de CPU por compresión"""
+    codecs = [(f"gzip -{level}", lambda data, level=level: gzip.compress(data, compresslevel=level, mtime=0))
+              for level in (1, 6, 9)]
+    if brotli is not None:
+        codecs += [(f"br q{quality}", lambda data, quality=quality: brotli.compress(data, quality=quality))
+                   for quality in (1, 4, 11)]
+    else:
+        print("   (brotli no instalado: pip install brotli)")
+
+    print(f"   {'codificación':<12} {'bytes':>8} {'ratio':>7} {'µs/resp':>9} {'MB/s':>8}")
+    for name, compress in codecs:
+        compressed = compress(body)
+        start = time.process_time()
+        for _ in range(iterations):
+            compress(body)
+        cpu = (time.process_time() - start) / iterations
+        print(f"   {name:<12} {len(compressed):>8} {len(compressed) / len(body):>7.3f} "
+              f"{cpu * 1e6:>9.1f} {len(body) / cpu / 1e6:>8.1f}")
+
+async def measure_middleware(page: UserList, iterations: int) -> None:
+    """CPU por petición a través del middleware con y sin compresión"""
+    api = FastAPI()
+
+    # Las dos rutas serializan en cada petición: la diferencia es solo la compresión
+    @api.get("/users")
+    async def users():
+        return Response(page.model_dump_json(), media_type="application/json")
+
+    @api.get("/users-etag")
+    async def users_etag():
+        return Response(page.model_dump_json(), media_type="application/json", headers={"ETag": '"page-1"'})
+
+    cases = [
+        ("sin compresión", CompressionMiddleware(api), "/users", b"identity"),
+        ("gzip -6", CompressionMiddleware(api, gzip_level=6), "/users", b"gzip"),
+        ("gzip -6 + caché", CompressionMiddleware(api, gzip_level=6, cache=CompressedCache()), "/users-etag", b"gzip"),
+    ]
+    if brotli is not None:
+        cases.append(("br q4", CompressionMiddleware(api, brotli_quality=4), "/users", b"br"))
+
+    for name, app, path, accept in cases:
+        sent = 0
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            nonlocal sent
+            if message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+
+        scope = {
+            "type": "http", "method": "GET", "path": path, "raw_path": path.encode(),
+            "query_string": b"", "root_path": "", "scheme": "http", "http_version": "1.1",
+            "server": ("test", 80), "client": ("test", 1234),
+            "headers": [(b"host", b"test"), (b"accept-encoding", accept)],
+        }
+        for _ in range(10):
+            await app(scope, receive, send)
+
+        sent = 0
+        start_cpu, start = time.process_time(), time.perf_counter()
+        for _ in range(iterations):
+            await app(scope, receive, send)
+        cpu = (time.process_time() - start_cpu) / iterations
+        wall = time.perf_counter() - start
+        print(f"   {name:<16} {iterations / wall:9.1f} peticiones/s {cpu * 1000:7.3f} ms CPU/petición "
+              f"{sent // iterations:>8} bytes/respuesta")
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    page = user_page(args.page_size)
+    body = page.model_dump_json().encode()
+
+    print(f"📊 UserList de {args.page_size} usuarios: {len(body)} bytes sin comprimir")
+    measure_codecs(body, args.iterations)
+
+    print(f"📊 Middleware, {args.iterations} peticiones")
+    await measure_middleware(page, args.iterations)
+
+if __name__ == "__main__":
+    asyncio.run(main())
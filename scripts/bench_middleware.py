@@ -0,0 +1,152 @@
+"""
+Benchmark: coste por petición de cada capa de middleware
+
+Cada capa se mide sola sobre la misma aplicación (un endpoint trivial con los
+manejadores de excepciones de main.py) y, con menos ruido, envolviendo una
+aplicación ASGI vacía; se informa de su coste respecto a esa base. Al final se
+compara la pila completa de antes (CORS y TrustedHost de
+Starlette siempre instalados) con la actual.
+
+Uso:
+    python scripts/bench_middleware.py [--iterations 20000] [--hosts "*"]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware as StarletteCORSMiddleware
+from fastapi.middleware.trustedhost import TrustedHostMiddleware as StarletteTrustedHostMiddleware
+from fastapi.responses import JSONResponse
+
+from app.core.compression import CompressionMiddleware
+from app.core.exceptions import CustomException
+from app.core.middleware import CORSMiddleware, HostMatcher, TrustedHostMiddleware
+from app.core.profiling import ProfilingMiddleware, ProfileStore
+from app.core.tenancy import TenantMiddleware
+
+def build_app(layers) -> FastAPI:
+    """Aplicación de prueba con las capas indicadas (la primera es la más interna)"""
+    api = FastAPI()
+
+    @api.exception_handler(CustomException)
+    async def custom_exception_handler(request: Request, exc: CustomException):
+        return JSONResponse(status_code=exc.status_code, content={"error": exc.error_code})
+
+    @api.exception_handler(Exception)
+    async def general_exception_handler(request: Request, exc: Exception):
+        return JSONResponse(status_code=500, content={"error": "INTERNAL_SERVER_ERROR"})
+
+    @api.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    for middleware, options in layers:
+        api.add_middleware(middleware, **options)
+    return api
+
+def make_scope(headers) -> dict:
+    return {
+        "type": "http", "method": "GET", "path": "/ping", "raw_path": b"/ping",
+        "query_string": b"", "root_path": "", "scheme": "http", "http_version": "1.1",
+        "server": ("api.example.com", 80), "client": ("test", 1234),
+        "headers": headers,
+    }
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+async def send(message):
+    pass
+
+async def run(app, scope: dict, rounds: int) -> float:
+    """Microsegundos de CPU por petición llamando a la aplicación ASGI directamente"""
+    start = time.process_time()
+    for _ in range(rounds):
+        await app(dict(scope), receive, send)
+    return (time.process_time() - start) / rounds * 1e6
+
+async def compare(base, app, headers, iterations: int, repeats: int = 10) -> tuple:
+    """
+    Mejor tiempo de la base y de la aplicación, en rondas alternas
+
+    Alternar las rondas reparte por igual el ruido (GC, otros procesos)
+    y quedarse con la mejor de cada una lo descarta.
+    """
+    scope = make_scope(headers)
+    await run(base, scope, 200)
+    await run(app, scope, 200)
+    rounds = max(iterations // repeats, 1)
+    base_best = app_best = float("inf")
+    for _ in range(repeats):
+        base_best = min(base_best, await run(base, scope, rounds))
+        app_best = min(app_best, await run(app, scope, rounds))
+    return base_best, app_best
+
+async def bare_app(scope, receive, send):
+    """Respuesta mínima: aísla el coste propio de cada middleware"""
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", b"11")]})
+    await send({"type": "http.response.body", "body": b'{"ok":true}'})
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--hosts", default="*", help="ALLOWED_HOSTS separados por comas")
+    args = parser.parse_args()
+
+    hosts = [host.strip() for host in args.hosts.split(",") if host.strip()]
+    cors = {"allow_origins": hosts, "allow_credentials": True, "allow_methods": ["*"], "allow_headers": ["*"]}
+    request_headers = [
+        (b"host", b"api.example.com"), (b"user-agent", b"bench"), (b"accept", b"application/json"),
+        (b"accept-encoding", b"gzip"), (b"authorization", b"Bearer x.y.z"),
+    ]
+    cross_origin = request_headers + [(b"origin", b"https://app.example.com")]
+
+    # (nombre, capas, cabeceras de la petición)
+    layers = [
+        ("CORS Starlette, mismo origen", [(StarletteCORSMiddleware, cors)], request_headers),
+        ("CORS propio, mismo origen", [(CORSMiddleware, cors)], request_headers),
+        ("CORS Starlette, otro origen", [(StarletteCORSMiddleware, cors)], cross_origin),
+        ("CORS propio, otro origen", [(CORSMiddleware, cors)], cross_origin),
+        ("TrustedHost Starlette", [(StarletteTrustedHostMiddleware, {"allowed_hosts": hosts})], request_headers),
+        ("TrustedHost precompilado", [(TrustedHostMiddleware, {"allowed_hosts": hosts})], request_headers),
+        ("Compresión (cuerpo pequeño)", [(CompressionMiddleware, {})], request_headers),
+        ("Tenant (sin cabecera)", [(TenantMiddleware, {})], request_headers),
+        ("Profiling (muestreo 0)", [(ProfilingMiddleware, {"store": ProfileStore("./profiles", 1)})], request_headers),
+    ]
+
+    before = [(StarletteTrustedHostMiddleware, {"allowed_hosts": hosts}), (StarletteCORSMiddleware, cors)]
+    after = [(CORSMiddleware, cors)]
+    if not HostMatcher(hosts).allow_any:
+        after.insert(0, (TrustedHostMiddleware, {"allowed_hosts": hosts}))
+
+    print(f"📊 {args.iterations} peticiones por caso, ALLOWED_HOSTS={hosts} (µs de CPU por petición)")
+    base = build_app([])
+    router_only, with_handlers = await compare(base.router, base, request_headers, args.iterations)
+    print(f"   {'solo el router':<32} {router_only:8.1f}")
+    print(f"   {'+ manejadores de excepciones':<32} {with_handlers:8.1f}  ({with_handlers - router_only:+.1f})")
+
+    print("📊 Coste de cada capa sobre la base")
+    for name, stack, headers in layers:
+        base_cost, cost = await compare(base, build_app(stack), headers, args.iterations)
+        print(f"   {name:<32} {cost:8.1f}  ({cost - base_cost:+.1f})")
+
+    print("📊 Cada capa aislada, sobre una aplicación ASGI vacía")
+    for name, stack, headers in layers:
+        (middleware, options), = stack
+        base_cost, cost = await compare(bare_app, middleware(bare_app, **options), headers, args.iterations * 5)
+        print(f"   {name:<32} {cost:8.2f}  ({cost - base_cost:+.2f})")
+
+    print("📊 Pila de main.py (CORS + TrustedHost), petición del mismo origen")
+    old, new = await compare(build_app(before), build_app(after), request_headers, args.iterations)
+    print(f"   {'antes':<32} {old:8.1f}")
+    print(f"   {'ahora':<32} {new:8.1f}  ({new - old:+.1f})")
+
+if __name__ == "__main__":
+    asyncio.run(main())
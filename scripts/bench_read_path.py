@@ -0,0 +1,97 @@
+"""
+Benchmark: lectura ORM frente a lectura compacta sin ORM (páginas de 100 filas)
+
+Uso:
+    python scripts/bench_read_path.py [--rows 2000] [--page-size 100] [--iterations 200]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from app.core.database import Base
+from app.models.user import User
+from app.repositories.user_repository import UserRepository
+from app.schemas.user import UserResponse
+
+async def seed(engine, rows: int):
+    """Crear la tabla y cargar usuarios de prueba"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        now = datetime.utcnow()
+        await conn.execute(insert(User), [
+            {
+                "email": f"user{i}@example.com",
+                "username": f"user{i}",
+                "first_name": f"First{i}",
+                "last_name": f"Last{i}",
+                "hashed_password": "x" * 60,
+                "is_active": i % 10 != 0,
+                "is_superuser": False,
+                "bio": "Bio de prueba " * 20,
+                "created_at": now - timedelta(minutes=i),
+            }
+            for i in range(rows)
+        ])
+
+async def orm_page(session_factory, page_size: int):
+    async with session_factory() as db:
+        users, total = await UserRepository(db).get_all(skip=0, limit=page_size)
+        return [UserResponse.model_validate(user) for user in users]
+
+async def compact_page(session_factory, page_size: int):
+    async with session_factory() as db:
+        records, total = await UserRepository(db).get_records(skip=0, limit=page_size)
+        return [UserResponse.model_validate(record) for record in records]
+
+async def measure(name, fn, session_factory, page_size, iterations):
+    """Medir páginas por segundo y memoria pico por página"""
+    # Calentamiento (cachés de compilación de SQLAlchemy)
+    for _ in range(5):
+        await fn(session_factory, page_size)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await fn(session_factory, page_size)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    await fn(session_factory, page_size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"   {name:<10} {iterations / elapsed:10.1f} páginas/s "
+          f"{elapsed / iterations * 1000:8.2f} ms/página {peak / 1024:10.1f} KiB pico")
+    return iterations / elapsed
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp}/bench.db")
+        session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        await seed(engine, args.rows)
+
+        print(f"📊 {args.rows} usuarios, páginas de {args.page_size}, {args.iterations} iteraciones")
+        orm = await measure("ORM", orm_page, session_factory, args.page_size, args.iterations)
+        compact = await measure("compacta", compact_page, session_factory, args.page_size, args.iterations)
+        print(f"✅ Lectura compacta: {compact / orm:.2f}x páginas/s respecto a ORM")
+
+        await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
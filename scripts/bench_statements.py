@@ -0,0 +1,97 @@
+"""
+Micro-benchmark: sentencias construidas en cada llamada frente a precompiladas
+
+Mide el coste por llamada de construir el select() y generar su clave de
+caché, y el coste de ejecutar las búsquedas frecuentes de ambas formas.
+
+Uso:
+    python scripts/bench_statements.py [--iterations 20000]
+"""
+import argparse
+import os
+import sys
+import time
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, select, insert, or_, func
+
+from app.core.database import Base
+from app.models.user import User
+from app.repositories import statements as stmt
+from app.repositories.records import USER_RECORD_COLUMNS
+
+def timed(fn, iterations: int) -> float:
+    """Microsegundos por llamada"""
+    for _ in range(min(iterations, 1000)):
+        fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+def build_list_query(search: str, is_active: bool):
+    """Construcción por llamada, como hacía el repositorio antes del registro"""
+    query = select(*USER_RECORD_COLUMNS)
+    search_filter = or_(
+        User.username.ilike(f"%{search}%"),
+        User.email.ilike(f"%{search}%"),
+        User.first_name.ilike(f"%{search}%"),
+        User.last_name.ilike(f"%{search}%")
+    )
+    query = query.where(search_filter).where(User.is_active == is_active)
+    return query.offset(0).limit(20).order_by(User.created_at.desc())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[User.__table__])
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"email": f"u{i}@example.com", "username": f"u{i}", "first_name": "F",
+             "last_name": "L", "hashed_password": "x", "is_active": True}
+            for i in range(100)
+        ])
+
+    print(f"📊 {n} iteraciones (µs por llamada)")
+
+    rows = [
+        ("construir + clave (por ID)",
+         lambda: select(*USER_RECORD_COLUMNS).where(User.id == 1)._generate_cache_key(),
+         lambda: stmt.RECORD_BY_ID._generate_cache_key()),
+        ("construir + clave (listado)",
+         lambda: build_list_query("u1", True)._generate_cache_key(),
+         lambda: stmt.list_statements(True, True, True)[0]._generate_cache_key()),
+    ]
+
+    with engine.connect() as conn:
+        rows += [
+            ("ejecutar get_record_by_id",
+             lambda: conn.execute(select(*USER_RECORD_COLUMNS).where(User.id == 7)).first(),
+             lambda: conn.execute(stmt.RECORD_BY_ID, {"user_id": 7}).first()),
+            ("ejecutar email disponible",
+             lambda: conn.execute(select(User.id).where(User.email == "u7@example.com")).first(),
+             lambda: conn.execute(stmt.EMAIL_TAKEN, {"email": "u7@example.com"}).first()),
+            ("ejecutar listado con filtros",
+             lambda: conn.execute(build_list_query("u1", True)).all(),
+             lambda: conn.execute(
+                 stmt.list_statements(True, True, True)[0],
+                 stmt.list_parameters(0, 20, "u1", True)
+             ).all()),
+        ]
+
+        print(f"   {'operación':<32}{'por llamada':>14}{'precompilada':>14}{'ahorro':>10}")
+        for name, dynamic, cached in rows:
+            dynamic_us = timed(dynamic, n)
+            cached_us = timed(cached, n)
+            print(f"   {name:<32}{dynamic_us:14.1f}{cached_us:14.1f}{dynamic_us - cached_us:10.1f}")
+
+    engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark: coste de las trazas por span y por petición
+
+Mide, en µs de CPU:
+- un punto de instrumentación sin petición muestreada (solo la búsqueda de
+  la variable de contexto) frente a la llamada sin instrumentar;
+- un span muestreado completo (ids, reloj, variable de contexto y anillo en memoria);
+- una sentencia SQL con y sin los hooks de trazas, dentro de un span;
+- el middleware sobre una aplicación ASGI vacía, sin muestrear y muestreado.
+
+Uso:
+    python scripts/bench_tracing.py [--iterations 200000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.tracing import Tracer, TracingMiddleware, install_db_tracing, traced
+
+def best_of(func, rounds: int, repeats: int = 5) -> float:
+    """Mejor tiempo en µs de CPU por llamada entre varias rondas"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.process_time()
+        for _ in range(rounds):
+            func()
+        best = min(best, (time.process_time() - start) / rounds * 1e6)
+    return best
+
+async def best_of_async(func, rounds: int, repeats: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.process_time()
+        for _ in range(rounds):
+            await func()
+        best = min(best, (time.process_time() - start) / rounds * 1e6)
+    return best
+
+async def bare_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-length", b"2")]})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+async def send(message):
+    pass
+
+def make_scope(headers) -> dict:
+    return {
+        "type": "http", "method": "GET", "path": "/ping", "raw_path": b"/ping",
+        "query_string": b"", "root_path": "", "scheme": "http", "http_version": "1.1",
+        "server": ("test", 80), "client": ("test", 1234), "headers": headers,
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    tracer = Tracer(sample_rate=1.0, memory_spans=10000)
+
+    def plain():
+        return None
+
+    instrumented = traced("bench")(plain)
+
+    print(f"📊 Por span ({n} iteraciones, µs de CPU)")
+    base = best_of(plain, n)
+    unsampled = best_of(instrumented, n)
+    print(f"   {'llamada sin instrumentar':<36} {base:8.3f}")
+    print(f"   {'instrumentada, sin muestrear':<36} {unsampled:8.3f}  ({unsampled - base:+.3f})")
+
+    root = tracer.start_trace("bench")
+    with root:
+        sampled = best_of(instrumented, n)
+    print(f"   {'instrumentada, muestreada':<36} {sampled:8.3f}  ({sampled - base:+.3f})")
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.connect() as conn:
+        statement = text("SELECT 1")
+
+        async def execute():
+            await conn.execute(statement)
+
+        rounds = max(n // 50, 100)
+        root = tracer.start_trace("bench")
+        with root:
+            without_hooks = await best_of_async(execute, rounds)
+            install_db_tracing(engine)
+            with_hooks = await best_of_async(execute, rounds)
+    await engine.dispose()
+    print(f"📊 Sentencia SQL ({rounds} iteraciones, µs de CPU)")
+    print(f"   {'SELECT 1 sin hooks':<36} {without_hooks:8.1f}")
+    print(f"   {'SELECT 1 con span de cliente':<36} {with_hooks:8.1f}  ({with_hooks - without_hooks:+.1f})")
+
+    rounds = max(n // 10, 100)
+    print(f"📊 Middleware sobre ASGI vacía ({rounds} peticiones, µs de CPU)")
+    scope = make_scope([(b"host", b"test"), (b"accept", b"application/json")])
+    base = await best_of_async(lambda: bare_app(dict(scope), receive, send), rounds)
+    for name, rate in (("sin muestrear", 0.0), ("muestreada", 1.0)):
+        app = TracingMiddleware(bare_app, Tracer(sample_rate=rate, memory_spans=10000))
+        cost = await best_of_async(lambda: app(dict(scope), receive, send), rounds)
+        print(f"   {name:<36} {cost:8.2f}  ({cost - base:+.2f})")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,194 @@
+"""
+Benchmark: validaciones por segundo de UserCreate, UserUpdate y PasswordChange
+
+Compara los esquemas anteriores (validadores @validator de estilo v1 con
+patrones sin compilar, copiados aquí como referencia) con los actuales de
+app/schemas/user.py, uno a uno y en lote con TypeAdapter. Antes de medir
+comprueba que ambos producen exactamente los mismos errores.
+
+Uso:
+    python scripts/bench_validation.py [--payloads 2000] [--repeat 5]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+import warnings
+from typing import Optional
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import BaseModel, EmailStr, Field, TypeAdapter, ValidationError
+
+from app.schemas.user import PasswordChange, UserCreate, UserUpdate
+from app.schemas.validators import validate_many
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    from pydantic import validator
+
+    class LegacyUserBase(BaseModel):
+        email: EmailStr = Field(...)
+        username: str = Field(..., min_length=3, max_length=50)
+        first_name: str = Field(..., min_length=1, max_length=50)
+        last_name: str = Field(..., min_length=1, max_length=50)
+        phone: Optional[str] = Field(None, max_length=20)
+        bio: Optional[str] = Field(None, max_length=500)
+        avatar_url: Optional[str] = Field(None, max_length=500)
+
+        @validator('username')
+        def validate_username(cls, v):
+            if not re.match(r'^[a-zA-Z0-9_]+$', v):
+                raise ValueError('Username can only contain letters, numbers and underscores')
+            return v
+
+        @validator('phone')
+        def validate_phone(cls, v):
+            if v and not re.match(r'^\+?[\d\s\-()]+$', v):
+                raise ValueError('Invalid phone format')
+            return v
+
+    class LegacyUserCreate(LegacyUserBase):
+        password: str = Field(..., min_length=8)
+        confirm_password: str = Field(...)
+
+        @validator('password')
+        def validate_password(cls, v):
+            if len(v) < 8:
+                raise ValueError('Password must be at least 8 characters long')
+            if not re.search(r'[A-Z]', v):
+                raise ValueError('Password must contain at least one uppercase letter')
+            if not re.search(r'[a-z]', v):
+                raise ValueError('Password must contain at least one lowercase letter')
+            if not re.search(r'\d', v):
+                raise ValueError('Password must contain at least one number')
+            return v
+
+        @validator('confirm_password')
+        def passwords_match(cls, v, values):
+            if 'password' in values and v != values['password']:
+                raise ValueError('Passwords do not match')
+            return v
+
+    class LegacyUserUpdate(BaseModel):
+        first_name: Optional[str] = Field(None, min_length=1, max_length=50)
+        last_name: Optional[str] = Field(None, min_length=1, max_length=50)
+        phone: Optional[str] = Field(None, max_length=20)
+        bio: Optional[str] = Field(None, max_length=500)
+        avatar_url: Optional[str] = Field(None, max_length=500)
+
+        @validator('phone')
+        def validate_phone(cls, v):
+            if v and not re.match(r'^\+?[\d\s\-()]+$', v):
+                raise ValueError('Invalid phone format')
+            return v
+
+    class LegacyPasswordChange(BaseModel):
+        current_password: str = Field(...)
+        new_password: str = Field(..., min_length=8)
+        confirm_password: str = Field(...)
+
+        @validator('new_password')
+        def validate_password(cls, v):
+            if len(v) < 8:
+                raise ValueError('Password must be at least 8 characters long')
+            if not re.search(r'[A-Z]', v):
+                raise ValueError('Password must contain at least one uppercase letter')
+            if not re.search(r'[a-z]', v):
+                raise ValueError('Password must contain at least one lowercase letter')
+            if not re.search(r'\d', v):
+                raise ValueError('Password must contain at least one number')
+            return v
+
+        @validator('confirm_password')
+        def passwords_match(cls, v, values):
+            if 'new_password' in values and v != values['new_password']:
+                raise ValueError('Passwords do not match')
+            return v
+
+def create_payloads(count: int) -> list:
+    """Altas válidas con datos variados"""
+    return [
+        {
+            "email": f"user{i}@example.com", "username": f"user_{i}",
+            "first_name": f"Nombre{i}", "last_name": f"Apellido{i}",
+            "phone": f"+34 600 {i:06d}", "bio": "Bio de prueba",
+            "password": f"Segura{i}Pass", "confirm_password": f"Segura{i}Pass",
+        }
+        for i in range(count)
+    ]
+
+# Entradas inválidas: los errores (tipo, ubicación y mensaje) deben coincidir
+INVALID = [
+    (LegacyUserCreate, UserCreate, {"username": "bad name!", "password": "alllowercase1"}),
+    (LegacyUserCreate, UserCreate, {"password": "NOLOWERCASE1", "confirm_password": "x"}),
+    (LegacyUserCreate, UserCreate, {"password": "NoDigitsHere", "phone": "abc"}),
+    (LegacyUserCreate, UserCreate, {"password": "Short1", "confirm_password": "Short1"}),
+    (LegacyUserCreate, UserCreate, {"confirm_password": "Different1"}),
+    (LegacyUserUpdate, UserUpdate, {"phone": "12-ab"}),
+    (LegacyPasswordChange, PasswordChange, {"new_password": "nouppercase1", "confirm_password": "nouppercase1"}),
+    (LegacyPasswordChange, PasswordChange, {"new_password": "Valid1Pass", "confirm_password": "Other1Pass"}),
+]
+
+def errors_of(model, payload) -> list:
+    try:
+        model.model_validate(payload)
+    except ValidationError as exc:
+        return [(e["type"], e["loc"], e["msg"]) for e in exc.errors()]
+    return []
+
+def check_same_errors(valid_payload: dict) -> None:
+    for legacy, current, changes in INVALID:
+        payload = {**valid_payload, "current_password": "Old1Password", "new_password": "Valid1Pass",
+                   "confirm_password": valid_payload["password"], **changes}
+        if current is PasswordChange and "confirm_password" not in changes:
+            payload["confirm_password"] = payload["new_password"]
+        expected, got = errors_of(legacy, payload), errors_of(current, payload)
+        assert expected == got, f"{current.__name__} {changes}: {expected} != {got}"
+    print(f"✅ Mismos errores en los {len(INVALID)} casos inválidos")
+
+def rate(function, count: int, repeat: int) -> float:
+    """Validaciones por segundo (mejor de varias rondas)"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return count / best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--payloads", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payloads = create_payloads(args.payloads)
+    check_same_errors(payloads[0])
+
+    updates = [{"first_name": p["first_name"], "phone": p["phone"], "bio": p["bio"]} for p in payloads]
+    changes = [{"current_password": "Old1Password", "new_password": p["password"],
+                "confirm_password": p["password"]} for p in payloads]
+    legacy_batch = TypeAdapter(list[LegacyUserCreate])
+
+    cases = [
+        ("UserCreate", lambda: [LegacyUserCreate.model_validate(p) for p in payloads],
+         lambda: [UserCreate.model_validate(p) for p in payloads]),
+        ("UserUpdate", lambda: [LegacyUserUpdate.model_validate(p) for p in updates],
+         lambda: [UserUpdate.model_validate(p) for p in updates]),
+        ("PasswordChange", lambda: [LegacyPasswordChange.model_validate(p) for p in changes],
+         lambda: [PasswordChange.model_validate(p) for p in changes]),
+        ("UserCreate en lote", lambda: legacy_batch.validate_python(payloads),
+         lambda: validate_many(UserCreate, payloads)),
+    ]
+
+    print(f"📊 {args.payloads} payloads, validaciones/s (mejor de {args.repeat})")
+    print(f"   {'esquema':<20} {'antes':>10} {'ahora':>10} {'mejora':>8}")
+    for name, legacy, current in cases:
+        before = rate(legacy, args.payloads, args.repeat)
+        after = rate(current, args.payloads, args.repeat)
+        print(f"   {name:<20} {before:>10.0f} {after:>10.0f} {after / before:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
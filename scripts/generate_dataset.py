@@ -0,0 +1,228 @@
+"""
+Script para generar una base de datos de usuarios sintética a gran escala
+
+Genera N usuarios con distribuciones realistas: nombres y dominios de email
+con sesgo tipo Zipf (unos pocos muy frecuentes y una cola larga), altas que
+crecen con el tiempo, usuarios antiguos con más probabilidad de estar
+inactivos, últimos logins recientes para la mayoría de los activos y
+biografías y teléfonos opcionales.
+
+No pasa por la API ni por el ORM: la contraseña se hashea una sola vez con
+bcrypt y se comparte, y las filas se escriben con executemany en lotes
+grandes dentro de una única transacción, sin journal. Los índices
+secundarios se crean al final, que es más rápido que mantenerlos fila a
+fila. Un millón de usuarios tarda menos de un minuto.
+
+Uso:
+    python scripts/generate_dataset.py --rows 1000000 [--output users.db] [--force]
+        [--inactive-ratio 0.15] [--days 1095] [--skew 1.1] [--seed 42]
+        [--password Password123] [--batch-size 50000]
+
+Todos los usuarios tienen la misma contraseña (--password); el primero es
+superusuario (admin@example.com).
+"""
+import argparse
+import math
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.schema import CreateTable
+
+from app.core.config import settings
+from app.core.database import create_missing_indexes, get_sqlite_path, user_tables
+from app.core.security import get_password_hash
+from app.models.user import User
+
+FIRST_NAMES = [
+    "María", "José", "Antonio", "Carmen", "Juan", "Ana", "Manuel", "Laura", "Francisco", "Isabel",
+    "David", "Lucía", "Javier", "Marta", "Daniel", "Paula", "Carlos", "Elena", "Miguel", "Sara",
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "William", "Emma",
+    "Pablo", "Sofía", "Alejandro", "Cristina", "Sergio", "Raquel", "Jorge", "Pilar", "Alberto", "Nuria",
+    "Luca", "Giulia", "Hugo", "Chloé", "Noah", "Olivia", "Liam", "Amelia", "Mateo", "Valentina",
+    "Ahmed", "Fatima", "Wei", "Mei", "Hiroshi", "Yuki", "Ivan", "Olga", "Rahul", "Priya",
+]
+LAST_NAMES = [
+    "García", "Rodríguez", "González", "Fernández", "López", "Martínez", "Sánchez", "Pérez", "Gómez", "Martín",
+    "Jiménez", "Ruiz", "Hernández", "Díaz", "Moreno", "Muñoz", "Álvarez", "Romero", "Alonso", "Gutiérrez",
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Miller", "Davis", "Wilson", "Taylor", "Clark",
+    "Navarro", "Torres", "Domínguez", "Vázquez", "Ramos", "Gil", "Ramírez", "Serrano", "Blanco", "Molina",
+    "Rossi", "Russo", "Dubois", "Martin", "Müller", "Schmidt", "Silva", "Santos", "Kowalski", "Novak",
+    "Khan", "Ali", "Wang", "Li", "Tanaka", "Sato", "Ivanov", "Petrov", "Sharma", "Patel",
+]
+DOMAINS = [
+    "gmail.com", "hotmail.com", "yahoo.com", "outlook.com", "icloud.com", "proton.me",
+    "telefonica.net", "gmx.de", "live.com", "empresa.es", "example.org", "universidad.edu",
+]
+BIO_WORDS = (
+    "desarrollador diseñadora backend frontend datos producto café viajes música fotografía montaña "
+    "ciclismo lectura python sql cloud startup marketing ventas soporte madrid barcelona remoto "
+    "open source seguridad móvil ux devops equipo aprendiendo mentor"
+).split()
+
+# Tabla de caracteres para los nombres de usuario y emails (sin tildes)
+ASCII = str.maketrans("áéíóúÁÉÍÓÚñÑüÜçÇ", "aeiouAEIOUnNuUcC")
+TIMESTAMP = "%Y-%m-%d %H:%M:%S.%f"
+
+USER_COLUMNS = [
+    "id", "email", "username", "first_name", "last_name", "hashed_password", "is_active",
+    "is_superuser", "phone", "bio", "avatar_url", "created_at", "updated_at", "last_login",
+]
+
+def zipf_weights(count: int, skew: float) -> list:
+    """Pesos 1/rango^skew: el primero es el más frecuente"""
+    return [1 / math.pow(rank, skew) for rank in range(1, count + 1)]
+
+def generate_users(rows: int, args, password_hash: str):
+    """Lotes de filas (tuplas en el orden de USER_COLUMNS)"""
+    rng = random.Random(args.seed)
+    end = datetime.utcnow().replace(microsecond=0)
+    span = timedelta(days=args.days).total_seconds()
+    start = end - timedelta(days=args.days)
+
+    first_weights = zipf_weights(len(FIRST_NAMES), args.skew)
+    last_weights = zipf_weights(len(LAST_NAMES), args.skew)
+    domain_weights = zipf_weights(len(DOMAINS), args.skew * 1.5)
+    ascii_first = [name.translate(ASCII).lower() for name in FIRST_NAMES]
+    ascii_last = [name.translate(ASCII).lower() for name in LAST_NAMES]
+
+    for offset in range(0, rows, args.batch_size):
+        size = min(args.batch_size, rows - offset)
+        # Elecciones en bloque: random.choices en C es mucho más rápido que fila a fila
+        firsts = rng.choices(range(len(FIRST_NAMES)), first_weights, k=size)
+        lasts = rng.choices(range(len(LAST_NAMES)), last_weights, k=size)
+        domains = rng.choices(DOMAINS, domain_weights, k=size)
+        styles = rng.choices(range(4), (40, 25, 20, 15), k=size)
+        batch = []
+        for index in range(size):
+            user_id = offset + index + 1
+            first, last = firsts[index], lasts[index]
+            f, l = ascii_first[first], ascii_last[last]
+
+            # El ID como sufijo garantiza la unicidad (también sin distinguir mayúsculas)
+            style = styles[index]
+            if style == 0:
+                local, username = f"{f}.{l}{user_id}", f"{f}_{l}{user_id}"
+            elif style == 1:
+                local, username = f"{f[0]}{l}{user_id}", f"{f[0]}{l}{user_id}"
+            elif style == 2:
+                local, username = f"{f}{user_id}", f"{f.capitalize()}{user_id}"
+            else:
+                local, username = f"{l}.{f}{user_id}", f"{l}_{f[:3]}{user_id}"
+
+            # Altas con crecimiento: la densidad aumenta hacia el presente
+            position = math.sqrt((user_id - rng.random()) / rows)
+            created = start + timedelta(seconds=span * position)
+
+            # Las cuentas antiguas se abandonan más; con altas ~ sqrt la media
+            # de (1 - position) es 1/3, así que la proporción global es inactive_ratio
+            is_active = rng.random() >= args.inactive_ratio * 3 * (1 - position)
+            age = (end - created).total_seconds()
+            roll = rng.random()
+            if roll < 0.1:
+                last_login = None
+            elif is_active and roll < 0.8:
+                # Activos: casi todos entraron hace pocos días
+                last_login = end - timedelta(seconds=min(rng.expovariate(1 / 259200), age))
+            else:
+                last_login = created + timedelta(seconds=rng.random() * age)
+            updated = created + timedelta(seconds=rng.random() * age) if rng.random() < 0.3 else None
+
+            bio = None
+            if rng.random() < 0.4:
+                bio = " ".join(rng.choices(BIO_WORDS, k=rng.randint(3, 40))).capitalize()
+            phone = f"+34 6{rng.randint(0, 99999999):08d}" if rng.random() < 0.5 else None
+
+            batch.append((
+                user_id, f"{local}@{domains[index]}", username[:50],
+                FIRST_NAMES[first], LAST_NAMES[last], password_hash, is_active, False,
+                phone, bio, None, created.strftime(TIMESTAMP),
+                updated.strftime(TIMESTAMP) if updated else None,
+                last_login.strftime(TIMESTAMP) if last_login else None,
+            ))
+        if offset == 0:
+            # Primer usuario: superusuario conocido para probar la API
+            batch[0] = batch[0][:1] + ("admin@example.com", "admin", "Admin", "Sistema") + batch[0][5:6] \
+                + (True, True) + batch[0][8:]
+        yield batch
+
+def create_schema(path: str) -> None:
+    """Tablas de usuarios sin índices secundarios (se crean después de la carga)"""
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        for table in user_tables():
+            conn.execute(CreateTable(table))
+    engine.dispose()
+
+def create_indexes(path: str) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        create_missing_indexes(conn, user_tables())
+        conn.exec_driver_sql("ANALYZE")
+    engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description="Generar una base de datos de usuarios sintética")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--output", default=get_sqlite_path() or "./users.db", help="Fichero SQLite de destino")
+    parser.add_argument("--force", action="store_true", help="Sobrescribir el fichero si existe")
+    parser.add_argument("--inactive-ratio", type=float, default=0.15)
+    parser.add_argument("--days", type=int, default=3 * 365, help="Antigüedad de la primera alta")
+    parser.add_argument("--skew", type=float, default=1.1, help="Sesgo Zipf de nombres y dominios")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--password", default="Password123")
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    args = parser.parse_args()
+
+    if os.path.exists(args.output):
+        if not args.force:
+            print(f"❌ {args.output} ya existe (usa --force para sobrescribirlo)")
+            sys.exit(1)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.output + suffix):
+                os.remove(args.output + suffix)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+
+    started = time.perf_counter()
+    create_schema(args.output)
+    password_hash = get_password_hash(args.password)
+
+    conn = sqlite3.connect(args.output, isolation_level=None)
+    # Carga masiva: sin journal ni fsync; el fichero se descarta si falla
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -262144")
+    insert = (
+        f"INSERT INTO {User.__tablename__} ({', '.join(USER_COLUMNS)}) "
+        f"VALUES ({', '.join('?' for _ in USER_COLUMNS)})"
+    )
+    written = 0
+    try:
+        conn.execute("BEGIN")
+        for batch in generate_users(args.rows, args, password_hash):
+            conn.executemany(insert, batch)
+            written += len(batch)
+            print(f"   {written}/{args.rows} usuarios ({time.perf_counter() - started:.1f}s)", end="\r")
+        conn.execute("COMMIT")
+        conn.execute(f"PRAGMA journal_mode = {settings.SQLITE_JOURNAL_MODE}")
+    finally:
+        conn.close()
+    print()
+    loaded = time.perf_counter() - started
+
+    create_indexes(args.output)
+    elapsed = time.perf_counter() - started
+    size_mb = os.path.getsize(args.output) / 1024 / 1024
+    print(f"✅ {written} usuarios en {args.output} ({size_mb:.0f} MB): "
+          f"carga {loaded:.1f}s, índices {elapsed - loaded:.1f}s, total {elapsed:.1f}s")
+    print(f"🔑 Contraseña de todos los usuarios: {args.password} (superusuario: admin@example.com)")
+
+if __name__ == "__main__":
+    main()
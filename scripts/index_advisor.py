@@ -0,0 +1,205 @@
+"""
+Asesor de índices: EXPLAIN QUERY PLAN de cada forma de consulta del repositorio
+
+Crea una base de datos temporal con datos generados, ejecuta todas las
+combinaciones de filtros y orden que expone la API (listados con y sin
+búsqueda y estado, conteos, búsquedas puntuales y change feed) e informa de
+las que recorren la tabla completa o ordenan en un B-tree temporal, con el
+índice que lo evitaría.
+
+Uso:
+    python scripts/index_advisor.py [--rows 20000] [--bare] [--verbose]
+
+--bare crea las tablas sin los índices secundarios del modelo (solo claves
+primarias y restricciones UNIQUE) para ver el punto de partida. Sale con
+código 1 si alguna consulta indexable no tiene índice.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, select, func, delete, insert
+from sqlalchemy.orm import aliased
+from sqlalchemy.schema import CreateTable
+
+from app.core.database import Base, user_tables
+from app.models.user import User
+from app.models.user_change import UserChange
+from app.repositories import statements as stmt
+
+class Shape:
+    """Una forma de consulta: sentencia, parámetros y columnas que usa"""
+
+    def __init__(self, name, statement, params, equality=(), order=None, wildcard=False):
+        self.name = name
+        self.statement = statement
+        self.params = params
+        self.equality = list(equality)
+        self.order = order
+        self.wildcard = wildcard
+
+    @property
+    def table(self) -> str:
+        return "user_changes" if self.name.startswith("changes") else "users"
+
+    def suggested_index(self):
+        """Columnas de igualdad seguidas de la columna de orden"""
+        columns = self.equality + ([self.order] if self.order else [])
+        return columns or None
+
+def query_shapes():
+    """Todas las formas de consulta que el repositorio puede emitir"""
+    shapes = []
+    for with_search in (False, True):
+        for with_active in (False, True):
+            query, count_query = stmt.list_statements(True, with_search, with_active)
+            params = stmt.list_parameters(40, 20, "user1" if with_search else None,
+                                          True if with_active else None)
+            label = " + ".join(filter(None, ["search" if with_search else "", "is_active" if with_active else ""])) or "sin filtros"
+            equality = ["is_active"] if with_active else []
+            shapes.append(Shape(f"listado ({label})", query, params, equality, "created_at", with_search))
+            shapes.append(Shape(f"conteo ({label})", count_query, params, equality, None, with_search))
+
+    shapes += [
+        Shape("por id", stmt.RECORD_BY_ID, {"user_id": 7}, ["id"]),
+        Shape("por ids", stmt.RECORDS_BY_IDS, {"user_ids": [1, 5, 9]}, ["id"]),
+        Shape("auth por email", stmt.AUTH_BY_EMAIL, {"email": "user7@example.com"}, ["email"]),
+        Shape("email en uso", stmt.EMAIL_TAKEN, {"email": "user7@example.com"}, ["email"]),
+        Shape("username en uso", stmt.USERNAME_TAKEN, {"username": "user7"}, ["username"]),
+        Shape("por username", stmt.USER_COLUMNS_BY_USERNAME, {"username": "user7"}, ["username"]),
+    ]
+
+    newer = aliased(UserChange)
+    shapes += [
+        Shape("changes desde seq",
+              select(UserChange).where(UserChange.seq > 100).order_by(UserChange.seq).limit(500),
+              {}, [], "seq"),
+        Shape("changes último seq", select(func.max(UserChange.seq)), {}),
+        Shape("changes compactación",
+              delete(UserChange).where(
+                  UserChange.changed_at < datetime.utcnow(),
+                  select(newer.seq).where(newer.user_id == UserChange.user_id, newer.seq > UserChange.seq).exists()
+              ), {}, ["user_id"], "seq"),
+    ]
+    return shapes
+
+def populate(engine, rows: int) -> None:
+    """Usuarios con estados y fechas variados, y su registro de cambios"""
+    random.seed(42)
+    start = datetime(2023, 1, 1)
+    users = [
+        {
+            "email": f"user{i}@example.com", "username": f"user{i}",
+            "first_name": f"Nombre{i % 500}", "last_name": f"Apellido{i % 700}",
+            "hashed_password": "x", "is_active": random.random() < 0.8, "is_superuser": False,
+            "created_at": start + timedelta(minutes=random.randint(0, 500000)),
+        }
+        for i in range(rows)
+    ]
+    changes = [
+        {"user_id": random.randint(1, rows), "operation": "update", "payload": None,
+         "changed_at": start + timedelta(minutes=i)}
+        for i in range(rows * 2)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(User), users)
+        conn.execute(insert(UserChange), changes)
+        conn.exec_driver_sql("ANALYZE")
+
+def explain(engine, shape: Shape):
+    """Plan de la sentencia tal y como la envía SQLAlchemy (mismo SQL y parámetros)"""
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    with engine.connect() as conn:
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            trans = conn.begin()
+            conn.execute(shape.statement, shape.params)
+            trans.rollback()
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+
+        sql, parameters = captured[-1]
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)
+            return [row[-1] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+def diagnose(shape: Shape, plan):
+    """Problemas del plan y el índice que los resuelve"""
+    problems = []
+    if any(step.startswith("SCAN") and "INDEX" not in step and shape.table in step for step in plan):
+        problems.append("recorre la tabla completa")
+    if any("USE TEMP B-TREE" in step for step in plan):
+        problems.append("ordena en un B-tree temporal")
+    if not problems:
+        return problems, None
+    if shape.wildcard and not shape.equality:
+        # LIKE '%texto%' no puede usar un índice B-tree
+        return problems, "no indexable (LIKE con comodín inicial; valorar FTS5)"
+    columns = shape.suggested_index()
+    if not columns:
+        return problems, None
+    return problems, f"CREATE INDEX ix_{shape.table}_{'_'.join(columns)} ON {shape.table} ({', '.join(columns)})"
+
+def main():
+    parser = argparse.ArgumentParser(description="Asesor de índices")
+    parser.add_argument("--rows", type=int, default=20000, help="Usuarios generados")
+    parser.add_argument("--bare", action="store_true", help="Sin los índices secundarios del modelo")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar el plan de todas las consultas")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'advisor.db')}")
+        tables = user_tables()
+        if args.bare:
+            # Solo claves primarias y UNIQUE, como estaba el modelo originalmente
+            with engine.begin() as conn:
+                for table in tables:
+                    conn.execute(CreateTable(table))
+                    for index in table.indexes:
+                        if index.unique:
+                            index.create(conn)
+        else:
+            Base.metadata.create_all(engine, tables=tables)
+
+        print(f"🚀 Generando {args.rows} usuarios...")
+        populate(engine, args.rows)
+
+        missing = 0
+        print(f"📊 Formas de consulta ({'sin índices del modelo' if args.bare else 'modelo actual'}):")
+        for shape in query_shapes():
+            plan = explain(engine, shape)
+            problems, advice = diagnose(shape, plan)
+            icon = "✅" if not problems else ("⚠️ " if advice and advice.startswith("no indexable") else "❌")
+            print(f"{icon} {shape.name}")
+            if problems or args.verbose:
+                for step in plan:
+                    print(f"      {step}")
+            if problems:
+                print(f"      Problema: {', '.join(problems)}")
+                if advice:
+                    print(f"      Sugerencia: {advice}")
+                if advice and not advice.startswith("no indexable"):
+                    missing += 1
+
+        engine.dispose()
+
+    if missing:
+        print(f"❌ {missing} consultas indexables sin índice")
+        sys.exit(1)
+    print("✅ Todas las consultas indexables usan un índice")
+
+if __name__ == "__main__":
+    main()
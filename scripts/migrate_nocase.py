@@ -0,0 +1,118 @@
+"""
+Migración: email y username únicos sin distinguir mayúsculas (índices NOCASE)
+
+Para cada base de datos con usuarios (la principal, cada shard y cada
+tenant, y el directorio de shards) busca emails y usernames que solo se
+diferencian en mayúsculas. Si no hay ninguno crea los índices únicos
+COLLATE NOCASE del modelo y borra los índices exactos anteriores
+(ix_users_email, ix_users_username), que ya no usa ninguna consulta.
+
+No hay nada que rellenar: los valores se guardan tal cual y la
+intercalación se aplica al comparar. Las colisiones no se resuelven
+automáticamente (qué cuenta conservar es una decisión de negocio): se
+listan y el script sale con código 1 sin tocar esa base de datos.
+
+Uso:
+    python scripts/migrate_nocase.py [--dry-run] [--database ruta.db ...]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from typing import Dict, List, Tuple
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+
+from app.core.config import settings
+from app.core.database import create_missing_indexes, get_sqlite_path
+from app.core.sharding import shard_path
+from app.core.tenancy import tenant_registry
+from app.models.user import User
+from app.models.user_directory import UserDirectoryEntry
+
+# Tablas con email y username, e índices exactos que reemplazan los NOCASE
+TABLES = {
+    User.__tablename__: (User.__table__, ["ix_users_email", "ix_users_username"]),
+    UserDirectoryEntry.__tablename__: (UserDirectoryEntry.__table__, []),
+}
+
+def databases() -> List[str]:
+    """Ficheros con tablas de usuarios según la configuración"""
+    paths = [get_sqlite_path()]
+    paths += [shard_path(index) for index in range(settings.SHARD_COUNT)]
+    if settings.TENANCY_ENABLED:
+        paths += [tenant_registry.path_for(tenant) for tenant in tenant_registry.list_tenants()]
+    return [path for path in paths if path and os.path.exists(path)]
+
+def find_collisions(conn: sqlite3.Connection, table: str) -> Dict[str, List[Tuple[str, str]]]:
+    """Valores repetidos sin distinguir mayúsculas, por columna: [(valor, ids)]"""
+    collisions = {}
+    for column in ("email", "username"):
+        rows = conn.execute(
+            f"SELECT lower({column}), group_concat(id, ',') FROM {table} "
+            f"GROUP BY {column} COLLATE NOCASE HAVING count(*) > 1"
+        ).fetchall()
+        if rows:
+            collisions[column] = rows
+    return collisions
+
+def existing_tables(conn: sqlite3.Connection) -> List[str]:
+    rows = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+    return [name for (name,) in rows if name in TABLES]
+
+def migrate(path: str, dry_run: bool) -> bool:
+    """Crear los índices NOCASE de una base de datos; False si hay colisiones"""
+    conn = sqlite3.connect(path)
+    try:
+        tables = existing_tables(conn)
+        collisions = {table: find_collisions(conn, table) for table in tables}
+    finally:
+        conn.close()
+
+    found = False
+    for table, by_column in collisions.items():
+        for column, rows in by_column.items():
+            found = True
+            print(f"❌ {path}: {table}.{column} repetido sin distinguir mayúsculas")
+            for value, ids in rows:
+                print(f"   {value}: IDs {ids}")
+    if found:
+        return False
+    if dry_run:
+        print(f"✅ {path}: sin colisiones ({', '.join(tables) or 'sin tablas de usuarios'})")
+        return True
+
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        with engine.begin() as conn:
+            create_missing_indexes(conn, [TABLES[table][0] for table in tables])
+            for table in tables:
+                for legacy in TABLES[table][1]:
+                    conn.exec_driver_sql(f"DROP INDEX IF EXISTS {legacy}")
+    finally:
+        engine.dispose()
+    print(f"✅ {path}: índices NOCASE creados en {', '.join(tables)}")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Índices únicos NOCASE para email y username")
+    parser.add_argument("--dry-run", action="store_true", help="Solo buscar colisiones")
+    parser.add_argument("--database", action="append", dest="paths",
+                        help="Fichero SQLite (repetible; por defecto los de la configuración)")
+    args = parser.parse_args()
+
+    paths = args.paths or databases()
+    if not paths:
+        print("❌ No se encontró ninguna base de datos")
+        sys.exit(1)
+
+    results = [migrate(path, args.dry_run) for path in paths]
+    if not all(results):
+        print("⚠️  Resuelve las colisiones (renombrar o fusionar cuentas) y vuelve a ejecutar el script")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Script para cambiar el número de shards de usuarios
+
+Mueve cada usuario (y sus entradas del registro de cambios) al shard que le
+corresponde con el nuevo número de shards. Con hash consistente solo se
+mueven los usuarios cuyo shard cambia: al pasar de N a N+1 shards, más o
+menos 1/(N+1) de ellos.
+
+Uso:
+    python scripts/reshard.py --to 4 [--from 3] [--dry-run]
+
+Debe ejecutarse con la aplicación detenida; después hay que actualizar
+SHARD_COUNT en la configuración. Cada pareja de shards se mueve en una
+transacción atómica sobre los dos ficheros (con el WAL desactivado durante
+el paso), así que es seguro repetirlo si se interrumpe.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from collections import Counter
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+
+from app.core.config import settings
+from app.core.database import Base, get_sqlite_path
+from app.core.sharding import jump_hash, shard_path
+from app.models.user import User
+from app.models.user_change import UserChange
+from app.models.user_directory import UserDirectoryEntry
+
+USER_TABLES = [User.__table__, UserChange.__table__]
+USER_COLUMNS = ", ".join(column.name for column in User.__table__.columns)
+# El seq se vuelve a asignar en el shard destino
+CHANGE_COLUMNS = "user_id, operation, payload, changed_at"
+
+def ensure_shard(index: int) -> str:
+    """Crear el fichero y las tablas de un shard si no existen"""
+    path = shard_path(index)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine, tables=USER_TABLES)
+    engine.dispose()
+    return path
+
+def count_users(path: str) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    finally:
+        conn.close()
+
+def plan(source_count: int, target_count: int) -> Counter:
+    """Usuarios a mover por pareja (origen, destino)"""
+    moves = Counter()
+    for source in range(source_count):
+        conn = sqlite3.connect(shard_path(source))
+        try:
+            for (user_id,) in conn.execute("SELECT id FROM users"):
+                target = jump_hash(user_id, target_count)
+                if target != source:
+                    moves[(source, target)] += 1
+        finally:
+            conn.close()
+    return moves
+
+def move(source: int, target: int, target_count: int) -> int:
+    """
+    Mover de source a target los usuarios que ahora pertenecen a target
+
+    Copia y borrado van en la misma transacción sobre las dos bases de datos
+    (ATTACH). SQLite solo confirma a la vez varios ficheros en modo rollback
+    journal, no en WAL (el de los shards creados por la aplicación): durante
+    el paso ambos ficheros pasan a journal_mode=DELETE y después recuperan su
+    modo. Así un corte nunca deja los cambios copiados sin borrar del origen,
+    que al repetir el paso se duplicarían con un seq nuevo; INSERT OR REPLACE
+    hace además que repetir el paso no duplique usuarios.
+    """
+    conn = sqlite3.connect(shard_path(source), isolation_level=None)
+    conn.create_function("target_shard", 1, lambda user_id: jump_hash(user_id, target_count), deterministic=True)
+    journal_modes = {}
+    try:
+        conn.execute("ATTACH DATABASE ? AS target", (shard_path(target),))
+        for schema in ("main", "target"):
+            journal_modes[schema] = conn.execute(f"PRAGMA {schema}.journal_mode").fetchone()[0]
+            if conn.execute(f"PRAGMA {schema}.journal_mode = DELETE").fetchone()[0] != "delete":
+                raise RuntimeError(f"No se pudo desactivar el WAL de {schema} (¿la aplicación está en marcha?)")
+        conn.execute("BEGIN IMMEDIATE")
+        moved = conn.execute(
+            f"INSERT OR REPLACE INTO target.users ({USER_COLUMNS}) "
+            f"SELECT {USER_COLUMNS} FROM main.users WHERE target_shard(id) = ?", (target,)
+        ).rowcount
+        conn.execute(
+            f"INSERT INTO target.user_changes ({CHANGE_COLUMNS}) "
+            f"SELECT {CHANGE_COLUMNS} FROM main.user_changes WHERE target_shard(user_id) = ? ORDER BY seq",
+            (target,)
+        )
+        conn.execute("DELETE FROM main.user_changes WHERE target_shard(user_id) = ?", (target,))
+        conn.execute("DELETE FROM main.users WHERE target_shard(id) = ?", (target,))
+        conn.execute("COMMIT")
+        return moved
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        for schema, mode in journal_modes.items():
+            conn.execute(f"PRAGMA {schema}.journal_mode = {mode}")
+        conn.close()
+
+def directory_count() -> int:
+    """Usuarios registrados en el directorio de la base principal"""
+    path = get_sqlite_path()
+    if path is None or not os.path.exists(path):
+        return -1
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {UserDirectoryEntry.__tablename__}").fetchone()[0]
+    except sqlite3.OperationalError:
+        return -1
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Cambiar el número de shards de usuarios")
+    parser.add_argument("--to", type=int, required=True, dest="target_count", help="Nuevo número de shards")
+    parser.add_argument("--from", type=int, default=settings.SHARD_COUNT, dest="source_count",
+                        help="Número de shards actual (por defecto SHARD_COUNT)")
+    parser.add_argument("--dry-run", action="store_true", help="Solo mostrar cuántos usuarios se moverían")
+    args = parser.parse_args()
+
+    if args.source_count < 1 or args.target_count < 1:
+        print("❌ El número de shards debe ser mayor a 0 (configura SHARD_COUNT o usa --from)")
+        sys.exit(1)
+
+    for index in range(max(args.source_count, args.target_count)):
+        ensure_shard(index)
+
+    moves = plan(args.source_count, args.target_count)
+    print(f"📊 {args.source_count} -> {args.target_count} shards: {sum(moves.values())} usuarios a mover")
+    for (source, target), count in sorted(moves.items()):
+        print(f"   shard_{source} -> shard_{target}: {count}")
+
+    if args.dry_run:
+        return
+
+    for source, target in sorted(moves):
+        moved = move(source, target, args.target_count)
+        print(f"✅ shard_{source} -> shard_{target}: {moved} usuarios movidos")
+
+    counts = [count_users(shard_path(index)) for index in range(args.target_count)]
+    leftover = sum(count_users(shard_path(index)) for index in range(args.target_count, args.source_count))
+    print(f"📊 Usuarios por shard: {counts}")
+    if leftover:
+        print(f"❌ Quedan {leftover} usuarios en shards retirados")
+        sys.exit(1)
+
+    registered = directory_count()
+    if registered >= 0 and registered != sum(counts):
+        print(f"⚠️  El directorio tiene {registered} usuarios y los shards {sum(counts)}")
+
+    print(f"✅ Listo: configura SHARD_COUNT={args.target_count} y reinicia la aplicación")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Script para copias de seguridad en caliente y restauración de la base de datos SQLite
+
+Uso:
+    python scripts/sqlite_backup.py create
+    python scripts/sqlite_backup.py list
+    python scripts/sqlite_backup.py verify <nombre>
+    python scripts/sqlite_backup.py restore <nombre|ruta> [--target users.db] [--yes]
+
+La restauración debe hacerse con la aplicación detenida.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.backup import backup_manager, BackupError
+
+def resolve_path(name: str) -> str:
+    """Aceptar el nombre de una copia registrada o una ruta a un fichero"""
+    if os.path.isfile(name):
+        return name
+    return backup_manager.resolve(name)
+
+def main():
+    parser = argparse.ArgumentParser(description="Copias de seguridad de SQLite")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("create", help="Crear una copia en caliente")
+    subparsers.add_parser("list", help="Listar las copias registradas")
+
+    verify_parser = subparsers.add_parser("verify", help="Verificar una copia")
+    verify_parser.add_argument("name")
+
+    restore_parser = subparsers.add_parser("restore", help="Restaurar una copia")
+    restore_parser.add_argument("name")
+    restore_parser.add_argument("--target", default=None, help="Base de datos destino")
+    restore_parser.add_argument("--yes", action="store_true", help="No pedir confirmación")
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == "create":
+            print("🚀 Creando copia de seguridad en caliente...")
+            manifest = asyncio.run(backup_manager.create_backup(label="cli"))
+            print(f"✅ Copia creada: {manifest['name']}")
+            print(f"   Tamaño: {manifest['size_bytes']} bytes")
+            print(f"   SHA-256: {manifest['sha256']}")
+            print(f"   Duración: {manifest['duration_seconds']}s en {manifest['steps']} pasos")
+
+        elif args.command == "list":
+            backups = backup_manager.list_backups()
+            print(f"📊 Copias registradas: {len(backups)}")
+            for manifest in backups:
+                print(f"   - {manifest['name']} ({manifest['size_bytes']} bytes, {manifest['created_at']})")
+
+        elif args.command == "verify":
+            result = backup_manager.verify(resolve_path(args.name))
+            icon = "✅" if result["valid"] else "❌"
+            print(f"{icon} {result['name']}: checksum {'correcto' if result['checksum_ok'] else 'INCORRECTO'}, "
+                  f"integrity_check: {result['integrity_check']}")
+            if not result["valid"]:
+                sys.exit(1)
+
+        elif args.command == "restore":
+            path = resolve_path(args.name)
+            target = args.target or backup_manager.db_path
+            if not args.yes:
+                answer = input(f"⚠️  Se reemplazará {target} con {path}. ¿Continuar? [s/N] ")
+                if answer.strip().lower() not in ("s", "si", "sí", "y", "yes"):
+                    print("❌ Restauración cancelada")
+                    return
+            result = backup_manager.restore(path, target)
+            print(f"✅ Base de datos restaurada en {result['target']}")
+            if result["previous_copy"]:
+                print(f"   Copia de la base anterior: {result['previous_copy']}")
+
+    except BackupError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
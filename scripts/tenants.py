@@ -0,0 +1,67 @@
+"""
+Script para dar de alta y de baja tenants (una base de datos SQLite por tenant)
+
+Uso:
+    python scripts/tenants.py list
+    python scripts/tenants.py provision <tenant>
+    python scripts/tenants.py teardown <tenant> [--yes]
+
+teardown debe ejecutarse con la aplicación detenida: el registro de este
+proceso está vacío, así que no puede cerrar el engine que el servidor tenga
+abierto sobre esos ficheros, y lo escrito después por el servidor se
+perdería con el fichero borrado.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.exceptions import CustomException
+from app.core.tenancy import tenant_registry
+
+def main():
+    parser = argparse.ArgumentParser(description="Gestión de tenants")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("list", help="Listar los tenants dados de alta")
+
+    provision_parser = subparsers.add_parser("provision", help="Crear la base de datos de un tenant")
+    provision_parser.add_argument("tenant")
+
+    teardown_parser = subparsers.add_parser("teardown", help="Eliminar la base de datos de un tenant")
+    teardown_parser.add_argument("tenant")
+    teardown_parser.add_argument("--yes", action="store_true", help="No pedir confirmación")
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == "list":
+            tenants = tenant_registry.list_tenants()
+            print(f"📊 Tenants: {len(tenants)}")
+            for tenant in tenants:
+                size = os.path.getsize(tenant_registry.path_for(tenant))
+                print(f"   - {tenant} ({size} bytes)")
+
+        elif args.command == "provision":
+            path = asyncio.run(tenant_registry.provision(args.tenant))
+            print(f"✅ Tenant {args.tenant} creado en {path}")
+            print(f"   Crea su administrador con la cabecera X-Tenant-ID: {args.tenant}")
+
+        elif args.command == "teardown":
+            if not args.yes:
+                answer = input(f"⚠️  Se eliminarán todos los datos del tenant {args.tenant}. ¿Continuar? [s/N] ")
+                if answer.strip().lower() not in ("s", "si", "sí", "y", "yes"):
+                    print("❌ Operación cancelada")
+                    return
+            removed = asyncio.run(tenant_registry.teardown(args.tenant))
+            print(f"✅ Tenant {args.tenant} eliminado ({len(removed)} ficheros)")
+
+    except CustomException as e:
+        print(f"❌ {e.message}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Tests para el registro de auditoría con escritura en lotes
+"""
+import asyncio
+import threading
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import update
+
+from app.core.audit import AuditEvent, AuditLog, JsonlAuditSink, SQLiteAuditSink, audit_log
+from app.models.user import User
+from tests.test_changes import create_and_login
+
+@pytest.fixture
+async def running_audit_log(tmp_path, monkeypatch):
+    monkeypatch.setattr(audit_log, "sink", SQLiteAuditSink(str(tmp_path / "audit.db")))
+    audit_log.start()
+    yield audit_log
+    await audit_log.stop()
+
+@pytest.mark.asyncio
+async def test_mutations_are_audited_with_actor(client: AsyncClient, test_db, running_audit_log):
+    """Test cada mutación queda registrada con su autor y los campos cambiados"""
+    admin_id, _ = await create_and_login(client, "auditadmin")
+    await test_db.execute(update(User).where(User.id == admin_id).values(is_superuser=True))
+    await test_db.commit()
+    # Nuevo token: is_superuser viaja en las claims
+    login = await client.post("/api/v1/auth/login", json={
+        "email": "auditadmin@example.com", "password": "ChangePass123!"
+    })
+    admin_headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    target_id, target_headers = await create_and_login(client, "audittarget")
+
+    response = await client.get("/api/v1/admin/audit", headers=target_headers)
+    assert response.status_code == 403
+
+    await client.put("/api/v1/users/me", json={"bio": "Auditada", "phone": "+34 600 000 000"},
+                     headers=target_headers)
+    await client.delete(f"/api/v1/users/{target_id}", headers=admin_headers)
+
+    # Los cambios solo encolan eventos: se escriben al consultar o en segundo plano
+    assert running_audit_log.stats()["pending"] >= 3
+
+    response = await client.get(f"/api/v1/admin/audit?user_id={target_id}", headers=admin_headers)
+    assert response.status_code == 200
+    events = [(e["action"], e["actor_id"], e["fields"]) for e in response.json()["events"]]
+    assert events == [
+        ("deactivate", admin_id, "is_active"),
+        ("update", target_id, "bio,phone"),
+        ("create", None, None),
+    ]
+    assert running_audit_log.stats()["pending"] == 0
+
+    response = await client.get(f"/api/v1/admin/audit?actor_id={admin_id}&action=deactivate",
+                                headers=admin_headers)
+    assert [e["user_id"] for e in response.json()["events"]] == [target_id]
+
+def test_jsonl_segments_are_a_time_index(tmp_path):
+    """Test las consultas por rango solo leen los segmentos que lo cubren"""
+    sink = JsonlAuditSink(str(tmp_path), segment_bytes=1)
+    for day in (1, 2, 3):
+        sink.write([
+            AuditEvent(f"2026-01-0{day}T10:00:00.000000", 1, day, "update", "bio"),
+            AuditEvent(f"2026-01-0{day}T11:00:00.000000", 1, day, "activate", "is_active"),
+        ])
+    assert sink.segments()[0] == "audit-2026-01-01T10-00-00.000000.jsonl"
+    assert len(sink.segments()) == 3
+
+    events = sink.query(start="2026-01-02T00:00:00.000000", end="2026-01-03T10:30:00.000000")
+    assert [(e["user_id"], e["action"]) for e in events] == [(3, "update"), (2, "activate"), (2, "update")]
+    assert [e["user_id"] for e in sink.query(action="activate", limit=2)] == [3, 2]
+
+@pytest.mark.asyncio
+async def test_full_buffer_applies_backpressure_then_drops():
+    """Test con el buffer lleno la mutación espera al escritor y, si no llega, se descarta"""
+    release = threading.Event()
+    written = []
+
+    class SlowSink:
+        name = "slow"
+
+        def write(self, events):
+            release.wait(5)
+            written.extend(events)
+
+        def close(self):
+            pass
+
+    log = AuditLog(SlowSink(), max_pending=2, batch_size=2, flush_interval=3600, block_seconds=0.05)
+    log.start()
+    try:
+        assert await log.record("update", 1, 1)
+        assert await log.record("update", 2, 1)
+        await asyncio.sleep(0.05)  # el escritor toma el lote y se queda bloqueado
+        assert await log.record("update", 3, 1)
+        assert await log.record("update", 4, 1)
+        assert not await log.record("update", 5, 1)
+        assert log.stats()["dropped"] == 1 and log.stats()["blocked"] == 1
+    finally:
+        release.set()
+        await log.stop()
+
+    assert [event.user_id for event in written] == [1, 2, 3, 4]
+    assert log.stats()["written"] == 4
@@ -55,3 +55,28 @@ async def test_protected_endpoint_without_token(client: AsyncClient):
     """Test endpoint protegido sin token"""
     response = await client.get("/api/v1/users/me")
     assert response.status_code == 403
+
+@pytest.mark.asyncio
+async def test_email_and_username_are_case_insensitive(client: AsyncClient):
+    """Test el login no distingue mayúsculas y no se admiten duplicados que solo difieren en ellas"""
+    user_data = {
+        "email": "Mixed.Case@example.com",
+        "username": "MixedCase",
+        "first_name": "Mixed",
+        "last_name": "Case",
+        "password": "MixedPass123!",
+        "confirm_password": "MixedPass123!"
+    }
+    response = await client.post("/api/v1/users/", json=user_data)
+    assert response.status_code == 201
+    
+    login_response = await client.post("/api/v1/auth/login", json={
+        "email": "mixed.case@EXAMPLE.com",
+        "password": "MixedPass123!"
+    })
+    assert login_response.status_code == 200
+    
+    response = await client.post("/api/v1/users/", json={**user_data, "email": "MIXED.CASE@example.com", "username": "other"})
+    assert response.status_code == 422
+    response = await client.post("/api/v1/users/", json={**user_data, "email": "other@example.com", "username": "mixedcase"})
+    assert response.status_code == 422
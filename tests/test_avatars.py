@@ -0,0 +1,79 @@
+"""
+Tests para la subida y descarga de avatares
+"""
+import pytest
+from httpx import AsyncClient
+
+from app.core.avatars import avatar_store, parse_range
+from tests.test_changes import create_and_login
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 40
+
+@pytest.fixture(autouse=True)
+def avatar_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(avatar_store, "directory", str(tmp_path))
+
+def test_parse_range():
+    """Test rangos simples, abiertos y de sufijo"""
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+
+@pytest.mark.asyncio
+async def test_upload_is_content_addressed(client: AsyncClient):
+    """Test la misma imagen se guarda una vez y avatar_url apunta a ella"""
+    _, headers = await create_and_login(client, "avatara")
+    _, other_headers = await create_and_login(client, "avatarb")
+
+    response = await client.put("/api/v1/users/me/avatar", content=PNG, headers=headers)
+    assert response.status_code == 200
+    url = response.json()["avatar_url"]
+    assert url.startswith("/api/v1/users/avatars/") and url.endswith(".png")
+
+    deduplicated = avatar_store.deduplicated
+    response = await client.put("/api/v1/users/me/avatar", content=PNG, headers=other_headers)
+    assert response.json()["avatar_url"] == url
+    assert avatar_store.deduplicated == deduplicated + 1
+
+@pytest.mark.asyncio
+async def test_avatar_served_with_etag_and_ranges(client: AsyncClient):
+    """Test ETag, caché de larga duración, 304 y respuestas parciales"""
+    _, headers = await create_and_login(client, "avatarc")
+    url = (await client.put("/api/v1/users/me/avatar", content=PNG, headers=headers)).json()["avatar_url"]
+
+    response = await client.get(url)
+    assert response.status_code == 200
+    assert response.content == PNG
+    assert response.headers["content-type"] == "image/png"
+    assert "immutable" in response.headers["cache-control"]
+    etag = response.headers["etag"]
+
+    response = await client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    response = await client.get(url, headers={"Range": "bytes=8-15"})
+    assert response.status_code == 206
+    assert response.content == PNG[8:16]
+    assert response.headers["content-range"] == f"bytes 8-15/{len(PNG)}"
+
+    response = await client.get(url, headers={"Range": f"bytes={len(PNG)}-"})
+    assert response.status_code == 416
+
+@pytest.mark.asyncio
+async def test_oversized_and_unsupported_uploads_rejected(client: AsyncClient, monkeypatch):
+    """Test 413 al superar el tamaño máximo y 422 si no es una imagen"""
+    _, headers = await create_and_login(client, "avatard")
+    monkeypatch.setattr(avatar_store, "max_bytes", 1024)
+
+    response = await client.put("/api/v1/users/me/avatar", content=PNG, headers=headers)
+    assert response.status_code == 413
+    assert response.json()["details"]["max_bytes"] == 1024
+
+    response = await client.put("/api/v1/users/me/avatar", content=b"<svg></svg>", headers=headers)
+    assert response.status_code == 422
+
+    response = await client.get("/api/v1/users/avatars/" + "0" * 64 + ".png")
+    assert response.status_code == 404
@@ -0,0 +1,100 @@
+"""
+Tests para las copias de seguridad en caliente
+"""
+import sqlite3
+import pytest
+
+from app.core.backup import BackupManager, BackupError
+
+def make_database(path: str, rows: int = 500):
+    """Crear una base de datos con datos suficientes para varios pasos"""
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, bio TEXT)")
+    conn.executemany("INSERT INTO users (bio) VALUES (?)", [("x" * 500,) for _ in range(rows)])
+    conn.commit()
+    conn.close()
+
+@pytest.mark.asyncio
+async def test_backup_verify_and_retention(tmp_path):
+    """Test la copia se hace por pasos, se verifica y respeta la retención"""
+    db_path = str(tmp_path / "users.db")
+    make_database(db_path)
+    manager = BackupManager(db_path, str(tmp_path / "backups"), retention=2,
+                            pages_per_step=8, step_sleep_ms=0)
+
+    for _ in range(3):
+        manifest = await manager.create_backup()
+
+    assert manifest["steps"] > 1
+    backups = manager.list_backups()
+    assert len(backups) == 2
+    assert manager.verify(manager.resolve(backups[0]["name"]))["valid"] is True
+
+@pytest.mark.asyncio
+async def test_restore_rejects_corrupted_backup(tmp_path):
+    """Test la restauración valida la copia antes de reemplazar la base"""
+    db_path = str(tmp_path / "users.db")
+    make_database(db_path, rows=10)
+    manager = BackupManager(db_path, str(tmp_path / "backups"), retention=5)
+    manifest = await manager.create_backup()
+    backup_path = manager.resolve(manifest["name"])
+
+    # Cambios posteriores a la copia
+    conn = sqlite3.connect(db_path)
+    conn.execute("DELETE FROM users")
+    conn.commit()
+    conn.close()
+
+    with open(backup_path, "r+b") as f:
+        original = f.read()
+        f.seek(len(original) // 2)
+        f.write(b"corrupted")
+
+    with pytest.raises(BackupError):
+        manager.restore(backup_path)
+
+    with open(backup_path, "wb") as f:
+        f.write(original)
+
+    result = manager.restore(backup_path)
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 10
+    conn.close()
+    assert result["previous_copy"] is not None
+
+@pytest.mark.asyncio
+async def test_pre_restore_copy_keeps_wal_commits(tmp_path):
+    """Test la copia previa a restaurar incluye los commits que solo están en el -wal"""
+    db_path = str(tmp_path / "users.db")
+    make_database(db_path, rows=10)
+    manager = BackupManager(db_path, str(tmp_path / "backups"), retention=5)
+    manifest = await manager.create_backup()
+
+    # Conexión abierta y sin checkpoint automático: los cambios quedan en el -wal
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA wal_autocheckpoint = 0")
+    conn.executemany("INSERT INTO users (bio) VALUES (?)", [("wal",) for _ in range(5)])
+    conn.commit()
+    try:
+        result = manager.restore(manager.resolve(manifest["name"]))
+    finally:
+        conn.close()
+
+    previous = sqlite3.connect(result["previous_copy"])
+    assert previous.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 15
+    previous.close()
+
+@pytest.mark.asyncio
+async def test_unavailable_backups_are_refused(tmp_path):
+    """Test con shards las copias se rechazan en vez de cubrir solo la base principal"""
+    db_path = str(tmp_path / "users.db")
+    make_database(db_path, rows=1)
+    manager = BackupManager(db_path, str(tmp_path / "backups"), retention=5, unavailable="shards")
+
+    with pytest.raises(BackupError):
+        await manager.create_backup()
+    with pytest.raises(BackupError):
+        manager.restore(db_path)
+    assert manager.status()["available"] is False
+    assert manager.list_backups() == []
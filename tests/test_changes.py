@@ -0,0 +1,108 @@
+"""
+Tests para el change feed de usuarios
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.change_feed import change_notifier
+from app.core.config import settings
+from app.models.user_change import UserChange
+from app.services.change_service import ChangeService
+
+async def create_and_login(client: AsyncClient, name: str) -> tuple[int, dict]:
+    """Crear un usuario, hacer login y devolver su ID y cabeceras"""
+    response = await client.post("/api/v1/users/", json={
+        "email": f"{name}@example.com",
+        "username": name,
+        "first_name": "Change",
+        "last_name": "Feed",
+        "password": "ChangePass123!",
+        "confirm_password": "ChangePass123!"
+    })
+    login_response = await client.post("/api/v1/auth/login", json={
+        "email": f"{name}@example.com",
+        "password": "ChangePass123!"
+    })
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+    return response.json()["id"], headers
+
+@pytest.mark.asyncio
+async def test_changes_since(client: AsyncClient):
+    """Test cada mutación queda registrada con un seq creciente"""
+    user_id, headers = await create_and_login(client, "feeduser")
+
+    await client.put("/api/v1/users/me", json={"bio": "Nueva bio"}, headers=headers)
+
+    response = await client.get("/api/v1/users/changes?since=0", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+
+    changes = [change for change in data["changes"] if change["user_id"] == user_id]
+    assert [change["operation"] for change in changes] == ["create", "update"]
+    assert changes[0]["seq"] < changes[1]["seq"]
+    assert changes[1]["data"]["bio"] == "Nueva bio"
+    assert "hashed_password" not in changes[1]["data"]
+
+    # Sin cambios nuevos después del último seq
+    response = await client.get(
+        f"/api/v1/users/changes?since={data['latest_seq']}", headers=headers
+    )
+    assert response.json()["changes"] == []
+    assert response.json()["has_more"] is False
+
+@pytest.mark.asyncio
+async def test_changes_pagination(client: AsyncClient):
+    """Test lotes encadenados con next_since"""
+    _, headers = await create_and_login(client, "feedpager")
+
+    response = await client.get("/api/v1/users/changes?since=0&limit=1", headers=headers)
+    data = response.json()
+    assert len(data["changes"]) == 1
+    assert data["has_more"] is True
+
+    response = await client.get(
+        f"/api/v1/users/changes?since={data['next_since']}&limit=1", headers=headers
+    )
+    assert response.json()["changes"][0]["seq"] > data["next_since"]
+
+@pytest.mark.asyncio
+async def test_compact_requires_superuser(client: AsyncClient):
+    """Test la compactación está restringida a superusuarios"""
+    _, headers = await create_and_login(client, "feedcompact")
+
+    response = await client.post("/api/v1/users/changes/compact", headers=headers)
+    assert response.status_code == 403
+
+@pytest.mark.asyncio
+async def test_stream_uses_short_sessions_and_sees_racing_change(client: AsyncClient, test_engine, monkeypatch):
+    """Test el stream no retiene sesión entre consultas ni pierde un cambio notificado durante la consulta"""
+    user_id, _ = await create_and_login(client, "streamuser")
+    monkeypatch.setattr(settings, "CHANGE_FEED_HEARTBEAT_SECONDS", 30)
+    session_factory = async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
+    opened = []
+
+    @asynccontextmanager
+    async def sessions():
+        opened.append(True)
+        async with session_factory() as session:
+            yield session
+        if len(opened) == 1:
+            # Un cambio confirmado entre la primera consulta y la espera
+            async with session_factory() as session:
+                session.add(UserChange(user_id=user_id, operation="update"))
+                await session.commit()
+            change_notifier.notify()
+        opened[-1] = False
+
+    stream = ChangeService(AsyncSession(test_engine)).stream(sessions)
+    events = []
+    racing = f'"user_id":{user_id},"operation":"update"'
+    while not any(racing in event for event in events):
+        events.append(await asyncio.wait_for(stream.__anext__(), 2))
+        assert not any(opened)
+    await stream.aclose()
+    assert len(opened) == 2
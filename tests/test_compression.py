@@ -0,0 +1,115 @@
+"""
+Tests para la compresión de respuestas
+"""
+import gzip
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from httpx import AsyncClient
+
+from app.core.compression import CompressedCache, CompressionMiddleware, brotli, parse_accept_encoding
+
+PAYLOAD = {"users": [{"id": i, "email": f"user{i}@example.com", "bio": "Bio de prueba " * 5} for i in range(100)]}
+
+def build_client(**options) -> AsyncClient:
+    api = FastAPI()
+
+    @api.get("/big")
+    async def big():
+        return PAYLOAD
+
+    @api.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @api.get("/etag")
+    async def etag():
+        return JSONResponse(PAYLOAD, headers={"ETag": '"v1"'})
+
+    @api.get("/image")
+    async def image():
+        return Response(b"\x89PNG" + b"0" * 5000, media_type="image/png")
+
+    @api.get("/stream")
+    async def stream():
+        async def events():
+            for i in range(3):
+                yield f"id: {i}\ndata: evento {i}\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return AsyncClient(app=CompressionMiddleware(api, **options), base_url="http://test")
+
+def test_accept_encoding_q_values():
+    """Test q=0 excluye una codificación"""
+    assert parse_accept_encoding(b"gzip;q=0, br;q=0.5, *") == {"gzip": 0.0, "br": 0.5, "*": 1.0}
+
+@pytest.mark.asyncio
+async def test_large_json_is_gzipped():
+    """Test una respuesta grande se comprime y se declara en Vary"""
+    async with build_client(minimum_size=500) as client:
+        response = await client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert response.json() == PAYLOAD
+
+@pytest.mark.asyncio
+async def test_small_unaccepted_and_binary_responses_pass_through():
+    """Test bajo el umbral, sin Accept-Encoding o con tipos binarios no se comprime"""
+    async with build_client(minimum_size=500) as client:
+        small = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+        identity = await client.get("/big", headers={"Accept-Encoding": "identity"})
+        image = await client.get("/image", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    assert "content-encoding" not in identity.headers
+    assert "content-encoding" not in image.headers
+
+@pytest.mark.asyncio
+async def test_streamed_response_is_compressed_incrementally():
+    """Test las respuestas en streaming se comprimen por fragmentos"""
+    async with build_client(minimum_size=500) as client:
+        response = await client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text.count("data: evento") == 3
+
+@pytest.mark.asyncio
+async def test_etag_responses_reuse_cached_compression():
+    """Test el cuerpo comprimido de una respuesta con ETag se reutiliza"""
+    cache = CompressedCache(max_entries=4)
+    async with build_client(minimum_size=500, cache=cache) as client:
+        first = await client.get("/etag", headers={"Accept-Encoding": "gzip"})
+        second = await client.get("/etag", headers={"Accept-Encoding": "gzip"})
+    assert first.headers["etag"] == 'W/"v1"'
+    assert second.json() == PAYLOAD
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_gzip_body_is_deterministic():
+    """Test el mismo cuerpo comprime a los mismos bytes (sin marca de tiempo)"""
+    middleware = CompressionMiddleware(None)
+    body = b"x" * 4096
+    assert middleware.compress(body, "gzip") == middleware.compress(body, "gzip")
+    assert gzip.decompress(middleware.compress(body, "gzip")) == body
+
+def test_encoding_follows_q_values():
+    """Test gana la codificación con mayor q; brotli solo desempata"""
+    middleware = CompressionMiddleware(None)
+
+    def choose(value: bytes):
+        return middleware.choose_encoding({"headers": [(b"accept-encoding", value)]})
+
+    assert choose(b"gzip;q=1, br;q=0.1") == "gzip"
+    assert choose(b"br;q=0, gzip") == "gzip"
+    assert choose(b"identity") is None
+    if brotli is not None:
+        assert choose(b"gzip, br") == "br"
+
+@pytest.mark.asyncio
+async def test_cache_key_includes_query_string():
+    """Test dos URLs con distinta query no comparten el cuerpo comprimido"""
+    cache = CompressedCache(max_entries=4)
+    async with build_client(minimum_size=500, cache=cache) as client:
+        await client.get("/etag?page=1", headers={"Accept-Encoding": "gzip"})
+        await client.get("/etag?page=2", headers={"Accept-Encoding": "gzip"})
+    assert cache.stats()["misses"] == 2 and cache.stats()["hits"] == 0
@@ -0,0 +1,63 @@
+"""
+Tests para la cobertura de índices de las consultas de listado
+"""
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.schema import CreateTable
+
+from app.core.database import Base, create_missing_indexes, user_tables
+from app.models.user import User
+from app.repositories import statements as stmt
+
+def query_plan(conn, statement, params) -> str:
+    """EXPLAIN QUERY PLAN de una sentencia con sus parámetros enlazados"""
+    compiled = statement.compile(dialect=conn.dialect)
+    values = compiled.construct_params(params)
+    positional = [values[name] for name in compiled.positiontup]
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", tuple(positional)).fetchall()
+    return " | ".join(row[-1] for row in rows)
+
+def test_list_queries_use_indexes():
+    """Test los listados filtrados y ordenados no recorren la tabla ni ordenan en memoria"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=user_tables())
+
+    with engine.connect() as conn:
+        query, count_query = stmt.list_statements(True, False, True)
+        params = stmt.list_parameters(0, 20, None, True)
+        plan = query_plan(conn, query, params)
+        assert "ix_users_is_active_created_at" in plan
+        assert "TEMP B-TREE" not in plan
+        assert "ix_users_is_active_created_at" in query_plan(conn, count_query, params)
+
+        query, _ = stmt.list_statements(True, False, False)
+        plan = query_plan(conn, query, stmt.list_parameters(0, 20, None, None))
+        assert "ix_users_created_at" in plan
+        assert "TEMP B-TREE" not in plan
+    engine.dispose()
+
+def test_missing_indexes_added_to_existing_tables():
+    """Test los índices nuevos del modelo se crean en tablas ya existentes"""
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(CreateTable(User.__table__))
+        create_missing_indexes(conn, [User.__table__])
+        # Repetirlo no falla: checkfirst
+        create_missing_indexes(conn, [User.__table__])
+
+    names = {index["name"] for index in inspect(engine).get_indexes("users")}
+    assert {"ix_users_created_at", "ix_users_is_active_created_at"} <= names
+    engine.dispose()
+
+def test_email_and_username_lookups_use_nocase_indexes():
+    """Test login, alta y disponibilidad buscan sin distinguir mayúsculas por índice"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=user_tables())
+
+    with engine.connect() as conn:
+        for statement in (stmt.AUTH_BY_EMAIL, stmt.EMAIL_TAKEN, stmt.USER_COLUMNS_BY_EMAIL):
+            plan = query_plan(conn, statement, {"email": "John@Example.com"})
+            assert "ix_users_email_nocase" in plan, plan
+        for statement in (stmt.USERNAME_TAKEN, stmt.USER_COLUMNS_BY_USERNAME):
+            plan = query_plan(conn, statement, {"username": "John"})
+            assert "ix_users_username_nocase" in plan, plan
+    engine.dispose()
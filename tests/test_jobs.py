@@ -0,0 +1,165 @@
+"""
+Tests para la cola persistente de trabajos
+"""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.core.database import Base
+from app.core.jobs import JobQueue
+from app.models.job import Job
+from app.repositories.user_repository import UserRepository
+from app.schemas.user import UserCreate
+from app.services import job_handlers
+from tests.test_changes import create_and_login
+
+@pytest.fixture
+async def queue(tmp_path):
+    # Fichero propio: los workers usan conexiones concurrentes
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'jobs.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    @asynccontextmanager
+    async def data_sessions(tenant):
+        yield sessions
+
+    queue = JobQueue(sessions, data_sessions, workers=1, poll_seconds=0.05, batch_size=2)
+    job_handlers.register_all(queue)
+    yield queue
+    await queue.stop()
+    await engine.dispose()
+
+async def wait_for(queue, job_id, condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        job = await queue.get(job_id)
+        if condition(job):
+            return job
+        assert asyncio.get_running_loop().time() < deadline, f"job {job_id}: {job.status}"
+        await asyncio.sleep(0.02)
+
+@pytest.mark.asyncio
+async def test_export_job_runs_in_batches(queue, tmp_path, monkeypatch):
+    """Test la exportación escribe un usuario por línea e informa del progreso"""
+    monkeypatch.setattr(settings, "JOBS_EXPORT_DIR", str(tmp_path))
+    async with queue.sessions() as session:
+        repository = UserRepository(session)
+        for i in range(5):
+            await repository.create(UserCreate(
+                email=f"export{i}@example.com", username=f"export{i}",
+                first_name="Export", last_name="User",
+                password="Password123", confirm_password="Password123"
+            ))
+    total = 5
+
+    await queue.start()
+    try:
+        job = await queue.submit("export_users")
+        job = await wait_for(queue, job.id, lambda job: job.status not in ("pending", "running"))
+    finally:
+        await queue.stop()
+
+    assert job.status == "succeeded", job.error
+    assert job.progress_done == job.progress_total == total
+    lines = (tmp_path / f"users_job_{job.id}.jsonl").read_text().splitlines()
+    ids = [json.loads(line)["id"] for line in lines]
+    assert ids == sorted(set(ids)) and len(ids) == total
+    assert json.loads(job.result)["exported"] == total
+
+@pytest.mark.asyncio
+async def test_interrupted_job_resumes_from_checkpoint(queue):
+    """Test un trabajo interrumpido al apagar vuelve a la cola y continúa desde su checkpoint"""
+    starts = []
+    gate = asyncio.Event()
+
+    async def steps(ctx):
+        starts.append(ctx.checkpoint.get("step", 0))
+        for step in range(ctx.checkpoint.get("step", 0), 4):
+            await ctx.progress(step + 1, 4, {"step": step + 1})
+            if step == 1 and len(starts) == 1:
+                gate.set()
+                await asyncio.sleep(3600)
+        return {"steps": 4}
+
+    queue.register("steps", steps)
+    await queue.start()
+    job = await queue.submit("steps")
+    await asyncio.wait_for(gate.wait(), timeout=5)
+    await queue.stop()
+
+    job = await queue.get(job.id)
+    assert job.status == "pending"
+    assert json.loads(job.checkpoint) == {"step": 2}
+
+    await queue.start()
+    try:
+        job = await wait_for(queue, job.id, lambda job: job.status == "succeeded")
+    finally:
+        await queue.stop()
+    assert starts == [0, 2]
+    assert job.attempts == 2
+
+@pytest.mark.asyncio
+async def test_cancel_running_and_pending_jobs(queue):
+    """Test cancelar detiene un trabajo en ejecución en su siguiente progreso"""
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def waits(ctx):
+        started.set()
+        await release.wait()
+        await ctx.progress(1, 2, {"step": 1})
+        return {"never": True}
+
+    queue.register("waits", waits)
+    await queue.start()
+    try:
+        running = await queue.submit("waits")
+        pending = await queue.submit("waits")
+        await asyncio.wait_for(started.wait(), timeout=5)
+
+        assert (await queue.cancel(pending.id)).status == "cancelled"
+        assert (await queue.cancel(running.id)).cancel_requested is True
+        release.set()
+        job = await wait_for(queue, running.id, lambda job: job.status == "cancelled")
+    finally:
+        await queue.stop()
+    assert job.result is None
+
+@pytest.mark.asyncio
+async def test_stale_running_jobs_are_requeued(queue):
+    """Test los trabajos de un proceso caído (sin heartbeat) vuelven a la cola"""
+    job = await queue.submit("reindex")
+    async with queue.sessions() as session:
+        await session.execute(
+            update(Job).where(Job.id == job.id).values(
+                status="running", attempts=1, heartbeat_at=datetime.utcnow() - timedelta(hours=1)
+            )
+        )
+        await session.commit()
+
+    assert await queue.requeue_stale() >= 1
+    assert (await queue.get(job.id)).status == "pending"
+
+@pytest.mark.asyncio
+async def test_invalid_job_parameters_rejected(queue):
+    """Test los parámetros se validan antes de encolar"""
+    with pytest.raises(Exception) as error:
+        await queue.submit("deactivate_users", {})
+    assert "ids" in str(error.value)
+
+@pytest.mark.asyncio
+async def test_jobs_require_superuser(client: AsyncClient):
+    """Test los trabajos están restringidos a superusuarios"""
+    _, headers = await create_and_login(client, "jobsuser")
+
+    response = await client.post("/api/v1/jobs/", json={"type": "reindex"}, headers=headers)
+    assert response.status_code == 403
@@ -0,0 +1,90 @@
+"""
+Tests para el apagado ordenado: drenado de peticiones, pasos y checkpoint del WAL
+"""
+import asyncio
+import os
+import sqlite3
+import pytest
+from httpx import AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.core.lifecycle import DrainMiddleware, Lifecycle, checkpoint_truncate, run_shutdown
+
+def build_app(lifecycle: Lifecycle, release: asyncio.Event) -> DrainMiddleware:
+    async def slow(request):
+        await release.wait()
+        return PlainTextResponse("ok")
+
+    async def livez(request):
+        return PlainTextResponse("alive")
+
+    app = Starlette(routes=[Route("/slow", slow), Route("/livez", livez)])
+    return DrainMiddleware(app, lifecycle, probe_paths=["/livez"])
+
+@pytest.mark.asyncio
+async def test_drain_rejects_new_requests_and_waits_for_running_ones():
+    """Test al drenar las peticiones nuevas reciben 503 y las que corren terminan"""
+    lifecycle, release = Lifecycle(), asyncio.Event()
+    lifecycle.mark_ready()
+    async with AsyncClient(app=build_app(lifecycle, release), base_url="http://test") as client:
+        running = asyncio.create_task(client.get("/slow"))
+        await asyncio.sleep(0.05)
+        assert lifecycle.in_flight == 1
+
+        assert lifecycle.begin_drain()
+        assert not lifecycle.ready
+        response = await client.get("/slow")
+        assert response.status_code == 503
+        assert response.headers["connection"] == "close"
+        assert lifecycle.rejected == 1
+        # La liveness sigue respondiendo mientras se espera a las peticiones en curso
+        assert (await client.get("/livez")).status_code == 200
+        assert lifecycle.in_flight == 1
+
+        assert not await lifecycle.wait_drained(0.05)
+        release.set()
+        assert await lifecycle.wait_drained(1)
+        assert (await running).status_code == 200
+
+@pytest.mark.asyncio
+async def test_shutdown_steps_continue_after_failures():
+    """Test un paso que falla o se pasa de tiempo no detiene los siguientes"""
+    done = []
+
+    async def fails():
+        raise RuntimeError("boom")
+
+    async def hangs():
+        await asyncio.sleep(10)
+
+    async def works():
+        done.append(True)
+        return {"flushed": 3}
+
+    report = await run_shutdown([("fails", fails, 1), ("hangs", hangs, 0.05), ("works", works, 1)])
+    assert [(entry["step"], entry["status"]) for entry in report] == [
+        ("fails", "error"), ("hangs", "timeout"), ("works", "ok")
+    ]
+    assert report[0]["error"] == "RuntimeError: boom"
+    assert report[2]["result"] == {"flushed": 3} and done == [True]
+    assert all(entry["ms"] >= 0 for entry in report)
+
+def test_checkpoint_truncates_wal(tmp_path):
+    """Test el checkpoint final deja el fichero -wal vacío"""
+    path = str(tmp_path / "users.db")
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("CREATE TABLE t (x)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(1000)])
+    conn.commit()
+    try:
+        assert os.path.getsize(path + "-wal") > 0
+        result = checkpoint_truncate(path)
+        assert result["wal_bytes_before"] > 0
+        assert not result["busy"] and result["log_frames"] == result["checkpointed"]
+        assert os.path.getsize(path + "-wal") == 0
+    finally:
+        conn.close()
+    assert checkpoint_truncate(str(tmp_path / "missing.db")) == {"path": str(tmp_path / "missing.db"), "exists": False}
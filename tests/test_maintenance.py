@@ -0,0 +1,95 @@
+"""
+Tests para el planificador de mantenimiento de la base de datos
+"""
+import asyncio
+from datetime import datetime
+from functools import partial
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core import tenancy
+from app.core.maintenance import MaintenanceScheduler
+from app.core.tenancy import TenantRegistry
+
+@pytest.mark.asyncio
+async def test_incremental_vacuum_releases_free_pages(tmp_path):
+    """Test el vacuum incremental devuelve las páginas libres tras borrar"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'users.db'}")
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_auto_vacuum(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql("CREATE TABLE users (id INTEGER PRIMARY KEY, bio TEXT)")
+        for _ in range(200):
+            await conn.exec_driver_sql("INSERT INTO users (bio) VALUES (?)", ("x" * 1000,))
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql("DELETE FROM users")
+
+    scheduler = MaintenanceScheduler({"main": engine})
+    scheduler.register("incremental_vacuum", partial(scheduler.incremental_vacuum, engine), 60)
+    scheduler.register("optimize", partial(scheduler.optimize, engine), 60)
+
+    result = await scheduler.run_task("incremental_vacuum")
+    assert result["last_error"] is None
+    assert result["last_result"]["released_pages"] > 0
+    assert result["last_result"]["freelist_pages"] == 0
+
+    result = await scheduler.run_task("optimize")
+    assert result["runs"] == 1
+    assert result["last_duration_ms"] is not None
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_task_budget_and_window():
+    """Test una tarea que supera su presupuesto se corta y la ventana admite medianoche"""
+    async def slow_task():
+        await asyncio.sleep(1)
+
+    engine = create_async_engine("sqlite+aiosqlite://")
+    scheduler = MaintenanceScheduler({"main": engine}, budget_seconds=0.05,
+                                     window_start_hour=22, window_end_hour=6)
+    scheduler.register("slow", slow_task, 60)
+
+    result = await scheduler.run_task("slow")
+    assert "budget" in result["last_error"]
+
+    assert scheduler.in_window(datetime(2024, 1, 1, 23)) is True
+    assert scheduler.in_window(datetime(2024, 1, 1, 3)) is True
+    assert scheduler.in_window(datetime(2024, 1, 1, 12)) is False
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_tenant_tasks_cover_every_tenant(tmp_path, monkeypatch):
+    """Test las tareas por tenant recorren todos los tenants y retoman tras cortarse por el presupuesto"""
+    registry = TenantRegistry(str(tmp_path / "{tenant}.db"), max_engines=1)
+    monkeypatch.setattr(tenancy, "tenant_registry", registry)
+    for tenant in ("acme", "globex", "initech"):
+        await registry.provision(tenant)
+
+    engine = create_async_engine("sqlite+aiosqlite://")
+    scheduler = MaintenanceScheduler({"main": engine}, budget_seconds=0.5)
+    visited = []
+
+    async def slow_on_globex(sessions):
+        visited.append(str(sessions.kw["bind"].url).rsplit("/", 1)[1])
+        if visited == ["acme.db", "globex.db"]:
+            await asyncio.sleep(1)
+
+    scheduler.register("slow", partial(scheduler.for_each_tenant, "slow", slow_on_globex), 60)
+    result = await scheduler.run_task("slow")
+    assert "budget" in result["last_error"]
+    # El siguiente intento empieza por el tenant que no terminó
+    result = await scheduler.run_task("slow")
+    assert result["last_result"] == {"tenants": 2, "errors": {}}
+    assert visited == ["acme.db", "globex.db", "globex.db", "initech.db"]
+
+    scheduler.register("compact_changes", partial(scheduler.for_each_tenant, "compact_changes", scheduler.compact_changes), 60)
+    result = await scheduler.run_task("compact_changes")
+    assert result["last_result"] == {"tenants": 3, "errors": {}}
+
+    await registry.stop()
+    await engine.dispose()
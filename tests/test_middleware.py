@@ -0,0 +1,50 @@
+"""
+Tests para los middleware de host y CORS
+"""
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+
+from app.core.middleware import CORSMiddleware, HostMatcher, TrustedHostMiddleware
+
+def build_client(middleware, **options) -> AsyncClient:
+    api = FastAPI()
+
+    @api.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return AsyncClient(app=middleware(api, **options), base_url="http://api.example.com")
+
+def test_host_matcher():
+    """Test hosts exactos, comodines de subdominio y *"""
+    matcher = HostMatcher(["api.example.com", "*.internal.net"])
+    assert matcher.matches("API.example.com")
+    assert matcher.matches("db.internal.net")
+    assert not matcher.matches("internal.net")
+    assert not matcher.matches("evil.com")
+    assert HostMatcher(["*"]).allow_any
+
+@pytest.mark.asyncio
+async def test_untrusted_host_rejected():
+    """Test un Host fuera de la lista recibe 400"""
+    async with build_client(TrustedHostMiddleware, allowed_hosts=["api.example.com"]) as client:
+        allowed = await client.get("/ping")
+        rejected = await client.get("/ping", headers={"Host": "evil.com"})
+    assert allowed.status_code == 200
+    assert rejected.status_code == 400
+    assert rejected.text == "Invalid host header"
+
+@pytest.mark.asyncio
+async def test_cors_only_for_requests_with_origin():
+    """Test las peticiones sin Origin no llevan cabeceras CORS; las de otro origen sí"""
+    options = {"allow_origins": ["https://app.example.com"], "allow_methods": ["*"]}
+    async with build_client(CORSMiddleware, **options) as client:
+        same_origin = await client.get("/ping")
+        cross_origin = await client.get("/ping", headers={"Origin": "https://app.example.com"})
+        preflight = await client.options("/ping", headers={
+            "Origin": "https://evil.com", "Access-Control-Request-Method": "GET"
+        })
+    assert "access-control-allow-origin" not in same_origin.headers
+    assert cross_origin.headers["access-control-allow-origin"] == "https://app.example.com"
+    assert preflight.status_code == 400
@@ -0,0 +1,105 @@
+"""
+Tests para las sondas de liveness/readiness servidas desde memoria
+"""
+import asyncio
+import pytest
+from httpx import AsyncClient
+
+from app.core.lifecycle import Lifecycle
+from app.core.probes import HealthProber, health_prober
+from app.core.tenancy import TenantRegistry
+
+@pytest.fixture
+def test_prober(test_engine, monkeypatch):
+    lifecycle = Lifecycle()
+    monkeypatch.setattr(health_prober, "engines", {"main": test_engine})
+    monkeypatch.setattr(health_prober, "lifecycle", lifecycle)
+    monkeypatch.setattr(health_prober, "snapshot", None)
+    return health_prober
+
+@pytest.mark.asyncio
+async def test_readyz_follows_lifecycle_and_probe(client: AsyncClient, test_prober):
+    """Test /livez siempre responde; /readyz solo cuando la instancia está lista y la sonda sana"""
+    response = await client.get("/api/v1/livez")
+    assert response.status_code == 200
+
+    response = await client.get("/api/v1/readyz")
+    assert response.status_code == 503
+    assert response.json()["reasons"] == ["lifecycle starting"]
+
+    test_prober.lifecycle.mark_ready()
+    test_prober.start()
+    try:
+        await asyncio.sleep(0.05)
+        response = await client.get("/api/v1/readyz")
+        assert response.status_code == 200
+        assert response.json()["status"] == "ready"
+
+        test_prober.lifecycle.begin_drain()
+        response = await client.get("/api/v1/readyz")
+        assert response.status_code == 503
+        assert response.json()["reasons"] == ["lifecycle draining"]
+    finally:
+        await test_prober.stop()
+
+@pytest.mark.asyncio
+async def test_detailed_serves_cached_snapshot(client: AsyncClient, test_prober):
+    """Test /health/detailed devuelve la instantánea con su antigüedad sin volver a sondear"""
+    await test_prober.refresh()
+    probes = test_prober.probes
+
+    response = await client.get("/api/v1/health/detailed")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "healthy"
+    assert data["checks"]["database"]["status"] == "healthy"
+    assert "latency_ms" in data["checks"]["database"]
+    assert "max_ms" in data["checks"]["event_loop_lag"]
+    assert data["probe"]["age_seconds"] >= 0
+    assert test_prober.probes == probes
+
+@pytest.mark.asyncio
+async def test_stale_or_failing_probe_is_not_ready(test_engine):
+    """Test una instantánea caducada o una base de datos caída quitan la readiness"""
+    lifecycle = Lifecycle()
+    lifecycle.mark_ready()
+    prober = HealthProber({"main": test_engine}, lifecycle, interval=0.01)
+    prober._tasks = [asyncio.create_task(asyncio.sleep(3600))]  # como si el bucle estuviera en marcha
+    try:
+        assert prober.readiness() == (False, ["no probe yet"])
+        await prober.refresh()
+        assert prober.readiness() == (True, [])
+        await asyncio.sleep(0.05)
+        assert prober.readiness()[1][0].startswith("probe stale")
+
+        class BrokenEngine:
+            url = "sqlite+aiosqlite:///:memory:"
+            pool = None
+
+            def connect(self):
+                raise RuntimeError("disk I/O error")
+
+        prober.engines = {"main": BrokenEngine()}
+        snapshot = await prober.refresh()
+        assert snapshot["status"] == "unhealthy"
+        assert prober.readiness() == (False, ["database main unhealthy"])
+    finally:
+        await prober.stop()
+
+@pytest.mark.asyncio
+async def test_open_tenants_are_probed_apart(tmp_path, test_engine):
+    """Test con tenants se sondean los engines abiertos sin afectar a la readiness de la instancia"""
+    registry = TenantRegistry(str(tmp_path / "{tenant}.db"))
+    for tenant in ("acme", "globex"):
+        await registry.provision(tenant)
+    await registry.sessionmaker_for("acme")
+
+    lifecycle = Lifecycle()
+    lifecycle.mark_ready()
+    prober = HealthProber({"main": test_engine}, lifecycle, tenants=registry)
+    snapshot = await prober.refresh()
+    assert list(snapshot["tenants"]) == ["acme"]
+    assert snapshot["tenants"]["acme"]["status"] == "healthy"
+    assert registry.open_tenants() == ["acme"]
+    assert prober.readiness() == (True, [])
+    await registry.stop()
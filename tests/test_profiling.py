@@ -0,0 +1,50 @@
+"""
+Tests para el perfilado de peticiones bajo demanda
+"""
+import pytest
+from httpx import AsyncClient
+from fastapi import FastAPI
+
+from app.core.profiling import ProfilingMiddleware, ProfileStore
+
+def build_app(store: ProfileStore, **options) -> FastAPI:
+    """Aplicación mínima con el middleware de perfilado"""
+    app = FastAPI()
+
+    @app.get("/work")
+    async def work():
+        return {"total": sum(range(1000))}
+
+    app.add_middleware(ProfilingMiddleware, store=store, **options)
+    return app
+
+@pytest.mark.asyncio
+async def test_profile_with_admin_header(tmp_path):
+    """Test solo se perfilan las peticiones con el token correcto"""
+    store = ProfileStore(str(tmp_path), max_files=10)
+    app = build_app(store, token="secret")
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.get("/work")
+        await client.get("/work", headers={"X-Profile-Token": "wrong"})
+        response = await client.get("/work", headers={"X-Profile-Token": "secret"})
+
+    assert response.status_code == 200
+    profiles = store.list()
+    assert len(profiles) == 1
+    assert profiles[0]["method"] == "GET"
+    assert profiles[0]["status_code"] == 200
+    assert "work" in store.render(profiles[0]["name"])
+
+@pytest.mark.asyncio
+async def test_profile_ring_is_bounded(tmp_path):
+    """Test el anillo en disco conserva solo los perfiles más recientes"""
+    store = ProfileStore(str(tmp_path), max_files=3)
+    app = build_app(store, sample_rate=1.0)
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        for _ in range(5):
+            await client.get("/work")
+
+    assert len(store.list()) == 3
+    assert store.path_for("../etc/passwd") is None
@@ -0,0 +1,36 @@
+"""
+Tests para el registro de consultas lentas
+"""
+from sqlalchemy import create_engine, text
+
+from app.core.query_log import SlowQueryLog, normalize_sql, redact_parameters
+
+def test_normalize_sql():
+    """Test literales y listas IN se normalizan"""
+    sql = normalize_sql("SELECT *\n  FROM users WHERE id IN (?, ?, ?) AND name = 'x' LIMIT 10")
+    assert sql == "SELECT * FROM users WHERE id IN (?...) AND name = ? LIMIT ?"
+
+def test_parameters_are_redacted():
+    """Test los valores de los parámetros nunca se guardan"""
+    assert redact_parameters(("secret@example.com", 3)) == ["<str>", "<int>"]
+    assert redact_parameters([(1,), (2,)], executemany=True) == "<executemany: 2 rows>"
+
+def test_full_scan_is_flagged():
+    """Test una consulta sin índice se registra con su plan y se marca"""
+    engine = create_engine("sqlite://")
+    log = SlowQueryLog(threshold_ms=0, top_n=10)
+    log.install(engine)
+
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, bio TEXT)"))
+        conn.execute(text("SELECT id FROM users WHERE bio = :bio"), {"bio": "private"})
+        conn.execute(text("SELECT id FROM users WHERE id = :id"), {"id": 1})
+
+    entries = {entry["sql"]: entry for entry in log.top()}
+    scan = entries["SELECT id FROM users WHERE bio = ?"]
+    assert scan["full_scan"] is True
+    assert scan["plan"]
+    assert "private" not in str(scan["last_parameters"])
+
+    lookup = entries["SELECT id FROM users WHERE id = ?"]
+    assert lookup["full_scan"] is False
@@ -0,0 +1,120 @@
+"""
+Tests para el almacenamiento particionado (sharding)
+"""
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+
+from app.core.database import Base
+from app.core.exceptions import ConflictException
+from app.core.sharding import jump_hash, make_sharded_sessionmaker, shard_for
+from app.models.user_directory import UserDirectoryEntry
+from app.repositories.user_repository import UserRepository
+from app.services.job_handlers import reindex
+from app.schemas.user import UserCreate
+
+def new_user(index: int) -> UserCreate:
+    return UserCreate(
+        email=f"shard{index}@example.com",
+        username=f"shard{index}",
+        first_name="Shard",
+        last_name=f"User{index}",
+        password="Password123",
+        confirm_password="Password123"
+    )
+
+@pytest.fixture
+async def sharded_sessions(tmp_path):
+    """Tres shards y el directorio en ficheros temporales"""
+    directory_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'directory.db'}")
+    shard_engines = {
+        f"shard_{index}": create_async_engine(f"sqlite+aiosqlite:///{tmp_path / f'users_{index}.db'}")
+        for index in range(3)
+    }
+    user_tables = [table for table in Base.metadata.sorted_tables if table is not UserDirectoryEntry.__table__]
+    async with directory_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[UserDirectoryEntry.__table__])
+    for engine in shard_engines.values():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=user_tables)
+
+    directory_sessions = async_sessionmaker(directory_engine, class_=AsyncSession, expire_on_commit=False)
+    yield make_sharded_sessionmaker(shard_engines, directory_sessions), shard_engines
+
+    for engine in [directory_engine, *shard_engines.values()]:
+        await engine.dispose()
+
+def test_jump_hash_moves_few_keys():
+    """Test al pasar de 3 a 4 shards solo se mueve aproximadamente una cuarta parte"""
+    moved = sum(1 for key in range(10000) if jump_hash(key, 3) != jump_hash(key, 4))
+    assert 2000 < moved < 3000
+    assert all(jump_hash(key, 4) in (jump_hash(key, 3), 3) for key in range(1000))
+
+@pytest.mark.asyncio
+async def test_sharded_repository(sharded_sessions):
+    """Test IDs globales, unicidad, búsquedas y listado mezclado entre shards"""
+    session_factory, shard_engines = sharded_sessions
+
+    async with session_factory() as session:
+        repository = UserRepository(session)
+        users = [await repository.create(new_user(index)) for index in range(6)]
+        assert [user.id for user in users] == [1, 2, 3, 4, 5, 6]
+
+        with pytest.raises(ConflictException):
+            await repository.create(new_user(0))
+
+    # Cada usuario está solo en el fichero de su shard
+    for name, engine in shard_engines.items():
+        async with engine.connect() as conn:
+            stored = {row[0] for row in await conn.exec_driver_sql("SELECT id FROM users")}
+        assert stored == {user.id for user in users if shard_for(user.id, 3) == name}
+
+    async with session_factory() as session:
+        repository = UserRepository(session)
+        assert (await repository.get_by_email("shard4@example.com")).id == 5
+        assert (await repository.get_auth_by_email("shard2@example.com")).id == 3
+        assert await repository.is_username_taken("shard5") is True
+        assert {record.id for record in await repository.get_records_by_ids([1, 4, 6])} == {1, 4, 6}
+
+        records, total = await repository.get_records(skip=1, limit=3)
+        assert total == 6
+        assert len(records) == 3
+        ordered, _ = await repository.get_records(skip=0, limit=6)
+        assert [record.id for record in records] == [record.id for record in ordered[1:4]]
+
+        records, total = await repository.get_records(search="shard3")
+        assert total == 1 and records[0].username == "shard3"
+
+        await repository.hard_delete(3)
+        assert await repository.get_by_id(3) is None
+        assert await repository.is_email_taken("shard2@example.com") is False
+
+@pytest.mark.asyncio
+async def test_reindex_runs_on_every_shard(sharded_sessions):
+    """Test REINDEX y ANALYZE llegan a cada shard y al directorio, no solo al primero"""
+    session_factory, shard_engines = sharded_sessions
+    async with session_factory() as session:
+        repository = UserRepository(session)
+        for index in range(6):
+            await repository.create(new_user(index))
+
+    class Context:
+        sessions = session_factory
+        checkpoint = {"step": 1}
+        progressed = []
+
+        async def progress(self, done, total=None, checkpoint=None):
+            self.progressed.append((done, total))
+
+    context = Context()
+    result = await reindex(context)
+    assert result["databases"] == ["directory", *shard_engines]
+    assert context.progressed[-1] == (8, 8)
+
+    directory_sessions = session_factory.kw["info"]["directory_sessions"]
+    async with directory_sessions() as session:
+        assert (await session.execute(text("SELECT count(*) FROM sqlite_stat1"))).scalar() > 0
+    for engine in shard_engines.values():
+        async with engine.connect() as conn:
+            tables = {row[0] for row in await conn.exec_driver_sql("SELECT tbl FROM sqlite_stat1")}
+        assert "users" in tables
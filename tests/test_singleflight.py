@@ -0,0 +1,93 @@
+"""
+Tests para el agrupamiento de lecturas concurrentes (single-flight)
+"""
+import asyncio
+import pytest
+
+from app.core.singleflight import SingleFlight
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    """Test llamadas concurrentes con la misma clave ejecutan una sola consulta"""
+    group = SingleFlight("test")
+    executions = 0
+
+    async def query():
+        nonlocal executions
+        executions += 1
+        await asyncio.sleep(0.01)
+        return {"id": 1}
+
+    results = await asyncio.gather(*[group.do(("id", 1), query) for _ in range(10)])
+
+    assert executions == 1
+    assert all(result == {"id": 1} for result in results)
+    assert group.stats()["coalesced"] == 9
+    assert group.stats()["in_flight"] == 0
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_and_key_released():
+    """Test los errores llegan a todos los que esperan y la clave se libera"""
+    group = SingleFlight("test")
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(
+        *[group.do("key", failing) for _ in range(3)],
+        return_exceptions=True
+    )
+    assert all(isinstance(result, ValueError) for result in results)
+
+    async def ok():
+        return "ok"
+
+    assert await group.do("key", ok) == "ok"
+    assert group.stats()["executions"] == 2
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_hands_over_to_followers():
+    """Test si se cancela el líder, los demás no fallan: uno repite la consulta"""
+    group = SingleFlight("test")
+    started = asyncio.Event()
+    executions = 0
+
+    async def query():
+        nonlocal executions
+        executions += 1
+        started.set()
+        await asyncio.sleep(0.05)
+        return {"id": 1}
+
+    leader = asyncio.create_task(group.do("key", query))
+    await started.wait()
+    followers = [asyncio.create_task(group.do("key", query)) for _ in range(3)]
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await asyncio.gather(*followers) == [{"id": 1}] * 3
+    assert leader.cancelled()
+    assert executions == 2
+    assert group.stats()["retries"] == 3
+    assert group.stats()["in_flight"] == 0
+
+@pytest.mark.asyncio
+async def test_cancelled_follower_leaves_leader_running():
+    """Test cancelar un seguidor no afecta al líder ni a los demás"""
+    group = SingleFlight("test")
+
+    async def query():
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    leader = asyncio.create_task(group.do("key", query))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(group.do("key", query))
+    other = asyncio.create_task(group.do("key", query))
+    await asyncio.sleep(0)
+    follower.cancel()
+
+    assert await leader == "ok" and await other == "ok"
+    assert follower.cancelled()
+    assert group.stats()["retries"] == 0
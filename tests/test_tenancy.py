@@ -0,0 +1,129 @@
+"""
+Tests para el aislamiento por tenant (una base de datos por tenant)
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from app.core import tenancy
+from app.core.exceptions import NotFoundException, ValidationException
+from app.core.tenancy import TenantMiddleware, TenantRegistry, current_tenant
+from app.core.security import create_access_token
+from app.repositories.write_behind import LastLoginBuffer
+
+@pytest.mark.asyncio
+async def test_registry_lru_and_isolation(tmp_path):
+    """Test cada tenant tiene su fichero y el número de engines abiertos está acotado"""
+    registry = TenantRegistry(str(tmp_path / "{tenant}.db"), max_engines=2, idle_seconds=300)
+    for tenant in ("acme", "globex", "initech"):
+        await registry.provision(tenant)
+    assert registry.list_tenants() == ["acme", "globex", "initech"]
+
+    sessions = await registry.sessionmaker_for("acme")
+    async with sessions() as session:
+        await session.execute(text(
+            "INSERT INTO users (email, username, first_name, last_name, hashed_password) "
+            "VALUES ('a@acme.com', 'a', 'A', 'A', 'x')"
+        ))
+        await session.commit()
+
+    await registry.sessionmaker_for("globex")
+    await registry.sessionmaker_for("acme")
+    # globex es el menos usado recientemente y se cierra al abrir initech
+    initech = await registry.sessionmaker_for("initech")
+    assert registry.stats()["open_engines"] == 2
+    assert registry.evicted == 1
+
+    async with initech() as session:
+        assert (await session.execute(text("SELECT COUNT(*) FROM users"))).scalar() == 0
+
+    with pytest.raises(NotFoundException):
+        await registry.sessionmaker_for("unknown")
+    with pytest.raises(ValidationException):
+        await registry.sessionmaker_for("../users")
+    with pytest.raises(ValidationException):
+        await registry.sessionmaker_for(None)
+
+    registry.idle_seconds = 0
+    assert await registry.evict_idle() == 2
+    await registry.teardown("acme")
+    assert registry.list_tenants() == ["globex", "initech"]
+    await registry.stop()
+
+@pytest.mark.asyncio
+async def test_leased_engines_are_not_evicted(tmp_path):
+    """Test un engine en uso por una petición no se cierra por LRU ni por inactividad"""
+    registry = TenantRegistry(str(tmp_path / "{tenant}.db"), max_engines=1, idle_seconds=0)
+    for tenant in ("acme", "globex"):
+        await registry.provision(tenant)
+
+    async with registry.lease("acme") as acme:
+        assert await registry.evict_idle() == 0
+        # Todos los engines en uso: se supera el límite en vez de cerrar acme
+        async with registry.lease("globex"):
+            assert registry.open_tenants() == ["acme", "globex"]
+            assert registry.stats()["leased_engines"] == 2
+        async with acme() as session:
+            assert (await session.execute(text("SELECT COUNT(*) FROM users"))).scalar() == 0
+        assert await registry.evict_idle() == 1
+        assert registry.open_tenants() == ["acme"]
+
+    assert registry.stats()["leased_engines"] == 0
+    assert await registry.evict_idle() == 1
+    await registry.stop()
+
+@pytest.mark.asyncio
+async def test_pending_logins_survive_engine_eviction(tmp_path, monkeypatch):
+    """Test los last_login pendientes de un tenant se escriben aunque su engine se haya cerrado"""
+    registry = TenantRegistry(str(tmp_path / "{tenant}.db"), max_engines=2, idle_seconds=0)
+    monkeypatch.setattr(tenancy, "tenant_registry", registry)
+    await registry.provision("acme")
+    async with registry.lease("acme") as sessions:
+        async with sessions() as session:
+            await session.execute(text(
+                "INSERT INTO users (email, username, first_name, last_name, hashed_password) "
+                "VALUES ('a@acme.com', 'a', 'A', 'A', 'x')"
+            ))
+            await session.commit()
+
+    buffer = LastLoginBuffer()
+    when = datetime(2030, 1, 1)
+    buffer.record("acme", 1, when)
+    assert await registry.evict_idle() == 1
+    # Otro engine para el mismo tenant sigue viendo el valor pendiente
+    assert buffer.pending_for("acme", 1) == when
+
+    assert await buffer.flush() == 1
+    assert registry.open_tenants() == ["acme"]
+    async with registry.lease("acme") as sessions:
+        async with sessions() as session:
+            stored = (await session.execute(text("SELECT last_login FROM users WHERE id = 1"))).scalar()
+    assert stored.startswith("2030-01-01")
+
+    await registry.teardown("acme")
+    buffer.record("acme", 1, when)
+    # Tenant dado de baja: se descartan sin reintentar para siempre
+    assert await buffer.flush() == 0 and buffer.stats()["pending"] == 0
+    await registry.stop()
+
+@pytest.mark.asyncio
+async def test_middleware_resolves_tenant():
+    """Test el tenant sale de la cabecera o, si no está, del claim del token"""
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(current_tenant.get())
+
+    middleware = TenantMiddleware(app)
+    token = create_access_token({"user_id": 1, "tenant": "globex"})
+    requests = [
+        [(b"x-tenant-id", b"Acme")],
+        [(b"authorization", f"Bearer {token}".encode())],
+        [(b"authorization", b"Bearer invalid")],
+    ]
+    for headers in requests:
+        await middleware({"type": "http", "headers": headers}, None, None)
+
+    assert seen == ["acme", "globex", None]
+    assert current_tenant.get() is None
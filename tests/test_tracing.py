@@ -0,0 +1,114 @@
+"""
+Tests para las trazas de peticiones (spans por capa, traceparent y exportadores)
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from httpx import AsyncClient
+
+from app.core.tracing import OtlpHttpExporter, Tracer, TracingMiddleware, install_db_tracing
+from main import app
+from tests.test_changes import create_and_login
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+@pytest.fixture(scope="module")
+def traced_engine(test_engine):
+    # Los hooks no hacen nada fuera de una petición muestreada
+    install_db_tracing(test_engine)
+    return test_engine
+
+@pytest.mark.asyncio
+async def test_request_spans_every_layer(client: AsyncClient, traced_engine):
+    """Test una petición muestreada produce spans de router, servicio, repositorio, SQL y bcrypt"""
+    user_id, headers = await create_and_login(client, "traced")
+    tracer = Tracer(sample_rate=1.0)
+
+    async with AsyncClient(app=TracingMiddleware(app, tracer), base_url="http://test") as traced:
+        response = await traced.get(f"/api/v1/users/{user_id}", headers={
+            **headers, "traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"
+        })
+        assert response.status_code == 200
+        _, trace_id, server_span_id, flags = response.headers["traceresponse"].split("-")
+        assert trace_id == TRACE_ID and flags == "01"
+
+        spans = {span["name"]: span for span in tracer.memory.trace(TRACE_ID)}
+        server = spans["GET /api/v1/users/{user_id}"]
+        assert server["span_id"] == server_span_id
+        assert server["parent_id"] == PARENT_ID
+        assert server["attributes"]["http.status_code"] == 200
+
+        router = spans["router.get_user"]
+        assert router["parent_id"] == server["span_id"]
+        service = spans["UserService.get_user_by_id"]
+        assert service["parent_id"] == router["span_id"]
+        assert spans["AuthService.get_current_user"]["parent_id"] == router["span_id"]
+        db_spans = [span for span in tracer.memory.trace(TRACE_ID) if span["kind"] == "client"]
+        assert db_spans and all(span["attributes"]["db.system"] == "sqlite" for span in db_spans)
+        assert all(str(user_id) not in span["attributes"]["db.statement"] for span in db_spans)
+
+        response = await traced.post("/api/v1/auth/login", json={
+            "email": "traced@example.com", "password": "ChangePass123!"
+        })
+        trace_id = response.headers["traceresponse"].split("-")[1]
+        names = [span["name"] for span in tracer.memory.trace(trace_id)]
+        assert "bcrypt.verify" in names and "AuthService.authenticate_user" in names
+
+    assert tracer.memory.traces()[0]["trace_id"] == trace_id
+    assert tracer.stats()["traces"] == 2
+
+@pytest.mark.asyncio
+async def test_unsampled_parent_is_not_traced(client: AsyncClient, traced_engine):
+    """Test un traceparent no muestreado (o la tasa 0) no crea spans"""
+    tracer = Tracer(sample_rate=1.0)
+    async with AsyncClient(app=TracingMiddleware(app, tracer), base_url="http://test") as traced:
+        response = await traced.get("/api/v1/health", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"})
+        assert "traceresponse" not in response.headers
+    assert tracer.stats()["spans"] == 0 and tracer.stats()["unsampled"] == 1
+
+    tracer = Tracer(sample_rate=0.0)
+    async with AsyncClient(app=TracingMiddleware(app, tracer), base_url="http://test") as traced:
+        # traceparent inválido: se ignora y decide la tasa de muestreo
+        await traced.get("/api/v1/health", headers={"traceparent": "00-xyz-01"})
+    assert tracer.stats()["spans"] == 0
+
+@pytest.mark.asyncio
+async def test_otlp_exporter_posts_batches():
+    """Test los spans se envían en lotes al colector OTLP/HTTP en JSON"""
+    received = []
+
+    class Collector(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Collector)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        exporter = OtlpHttpExporter(f"http://127.0.0.1:{server.server_port}/v1/traces", "user-api")
+        tracer = Tracer(exporter, sample_rate=1.0, batch_size=2)
+        root = tracer.start_trace("GET /x")
+        with root:
+            with root.child("db.SELECT", "client", rows=1):
+                pass
+            with root.child("bcrypt.hash"):
+                pass
+        assert await tracer.flush() == 3
+    finally:
+        server.shutdown()
+
+    assert len(received) == 2
+    spans = [span for batch in received for span in batch["resourceSpans"][0]["scopeSpans"][0]["spans"]]
+    assert {span["traceId"] for span in spans} == {root.trace_id}
+    client_span = next(span for span in spans if span["name"] == "db.SELECT")
+    assert client_span["kind"] == 3 and client_span["parentSpanId"] == root.span_id
+    assert client_span["attributes"] == [{"key": "rows", "value": {"intValue": "1"}}]
+    assert tracer.stats()["exported"] == 3
@@ -4,6 +4,11 @@ Tests para endpoints de usuarios
 import pytest
 from httpx import AsyncClient
 
+from app.repositories import statements as stmt
+from app.repositories.records import record_projection
+from app.schemas.user import sparse_user_models
+from tests.test_changes import create_and_login
+
 @pytest.mark.asyncio
 async def test_create_user(client: AsyncClient):
     """Test crear usuario"""
@@ -107,3 +112,92 @@ async def test_get_current_user(client: AsyncClient):
     data = response.json()
     assert data["email"] == "current@example.com"
     assert data["username"] == "currentuser"
+
+@pytest.mark.asyncio
+async def test_batch_get_users(client: AsyncClient):
+    """Test obtener varios usuarios por ID en una sola petición"""
+    ids = []
+    for name in ("batcha", "batchb"):
+        response = await client.post("/api/v1/users/", json={
+            "email": f"{name}@example.com",
+            "username": name,
+            "first_name": "Batch",
+            "last_name": "User",
+            "password": "BatchPass123!",
+            "confirm_password": "BatchPass123!"
+        })
+        ids.append(response.json()["id"])
+    
+    login_response = await client.post("/api/v1/auth/login", json={
+        "email": "batcha@example.com",
+        "password": "BatchPass123!"
+    })
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+    
+    # Orden de la petición conservado e IDs inexistentes informados
+    response = await client.post(
+        "/api/v1/users/batch-get",
+        json={"ids": [ids[1], 999999, ids[0]]},
+        headers=headers
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [user["id"] for user in data["users"]] == [ids[1], ids[0]]
+    assert data["missing"] == [999999]
+    
+    # Variante GET
+    response = await client.get(
+        f"/api/v1/users/batch-get?ids={ids[0]},{ids[1]}",
+        headers=headers
+    )
+    assert response.status_code == 200
+    assert [user["id"] for user in response.json()["users"]] == ids
+
+@pytest.mark.asyncio
+async def test_sparse_fieldsets(client: AsyncClient):
+    """Test ?fields= devuelve solo los campos pedidos"""
+    user_id, headers = await create_and_login(client, "sparseuser")
+    
+    response = await client.get(f"/api/v1/users/{user_id}?fields=id,full_name", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"id": user_id, "full_name": "Change Feed"}
+    
+    response = await client.get("/api/v1/users/?fields=username,email&size=5", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data) == {"users", "total", "page", "size", "pages"}
+    assert all(set(user) == {"username", "email"} for user in data["users"])
+    assert "sparseuser" in [user["username"] for user in data["users"]]
+    
+    # Campos fuera de la lista permitida
+    response = await client.get("/api/v1/users/?fields=id,hashed_password", headers=headers)
+    assert response.status_code == 422
+    assert response.json()["details"]["unknown"] == ["hashed_password"]
+
+@pytest.mark.asyncio
+async def test_user_list_etag(client: AsyncClient):
+    """Test la lista lleva un ETag estable y If-None-Match devuelve 304"""
+    _, headers = await create_and_login(client, "etaguser")
+    
+    first = await client.get("/api/v1/users/?size=100", headers=headers)
+    second = await client.get("/api/v1/users/?size=100", headers=headers)
+    assert first.status_code == 200
+    assert first.headers["etag"] == second.headers["etag"]
+    
+    # La versión comprimida lleva el ETag débil: la comparación es débil
+    response = await client.get(
+        "/api/v1/users/?size=100", headers={**headers, "If-None-Match": first.headers["etag"]}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+    
+    response = await client.get("/api/v1/users/?size=5", headers={**headers, "If-None-Match": first.headers["etag"]})
+    assert response.status_code == 200
+
+def test_sparse_fieldsets_narrow_select():
+    """Test la proyección solo lee las columnas necesarias"""
+    columns = record_projection(frozenset({"full_name"}))
+    assert columns == ("id", "first_name", "last_name", "created_at")
+    sql = str(stmt.record_by_id_statement(columns))
+    assert "bio" not in sql and "hashed_password" not in sql
+    assert sparse_user_models(frozenset({"id"})) is sparse_user_models(frozenset({"id"}))
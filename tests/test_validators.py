@@ -0,0 +1,52 @@
+"""
+Tests para las reglas de validación compartidas de los esquemas de usuario
+"""
+import pytest
+from pydantic import ValidationError
+
+from app.schemas.user import PasswordChange, UserCreate, UserUpdate
+from app.schemas.validators import check_password, validate_many
+
+VALID = {
+    "email": "valid@example.com", "username": "valid_user",
+    "first_name": "Valid", "last_name": "User",
+    "password": "Password123", "confirm_password": "Password123",
+}
+
+@pytest.mark.parametrize("password, message", [
+    ("alllowercase1", "uppercase letter"),
+    ("ALLUPPERCASE1", "lowercase letter"),
+    ("NoDigitsHere", "number"),
+])
+def test_password_policy_reports_first_missing_class(password, message):
+    """Test la política informa de la primera clase de carácter que falta"""
+    with pytest.raises(ValueError) as error:
+        check_password(password)
+    assert str(error.value) == f"Password must contain at least one {message}"
+
+def test_schemas_share_the_policy():
+    """Test UserCreate, UserUpdate y PasswordChange aplican las mismas reglas"""
+    with pytest.raises(ValidationError) as error:
+        UserCreate(**{**VALID, "username": "bad name", "phone": "abc"})
+    messages = {e["loc"][0]: e["msg"] for e in error.value.errors()}
+    assert messages == {
+        "username": "Value error, Username can only contain letters, numbers and underscores",
+        "phone": "Value error, Invalid phone format",
+    }
+
+    with pytest.raises(ValidationError, match="Invalid phone format"):
+        UserUpdate(phone="abc")
+
+    with pytest.raises(ValidationError, match="Passwords do not match"):
+        PasswordChange(current_password="x", new_password="Password123", confirm_password="Password124")
+
+def test_validate_many_reports_errors_by_position():
+    """Test la validación en lote devuelve los válidos y los errores por posición"""
+    payloads = [VALID, {**VALID, "username": "b@d"}, {**VALID, "email": "valid2@example.com"}]
+    valid, errors = validate_many(UserCreate, payloads)
+    assert [user.email for user in valid] == ["valid@example.com", "valid2@example.com"]
+    assert list(errors) == [1]
+    assert errors[1][0]["loc"] == ("username",)
+
+    valid, errors = validate_many(UserCreate, [VALID] * 3)
+    assert len(valid) == 3 and errors == {}
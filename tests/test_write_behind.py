@@ -0,0 +1,98 @@
+"""
+Tests para la escritura diferida de last_login
+"""
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+
+from app.repositories import statements as stmt
+from app.repositories.user_repository import UserRepository
+from app.repositories.write_behind import LastLoginBuffer, last_login_buffer
+from app.schemas.user import UserCreate
+
+async def stored_last_login(engine, user_id):
+    async with engine.connect() as conn:
+        row = (await conn.execute(stmt.RECORD_BY_ID, {"user_id": user_id})).first()
+        return row.last_login
+
+@pytest.mark.asyncio
+async def test_login_is_buffered_and_reads_merge_pending(test_db, test_engine):
+    """Test el login no escribe en la base de datos pero las lecturas lo ven"""
+    repository = UserRepository(test_db)
+    user = await repository.create(UserCreate(
+        email="writebehind@example.com", username="writebehind",
+        first_name="Write", last_name="Behind",
+        password="Password123", confirm_password="Password123"
+    ))
+    when = datetime.utcnow()
+
+    last_login_buffer.start()
+    try:
+        await repository.touch_last_login(user.id, when)
+        # Un login anterior no pisa al más reciente
+        await repository.touch_last_login(user.id, when - timedelta(minutes=1))
+
+        assert await stored_last_login(test_engine, user.id) is None
+        assert (await repository.get_record_by_id(user.id)).last_login == when
+        assert (await repository.get_by_id(user.id)).last_login == when
+        stats = last_login_buffer.stats()
+        assert stats["pending"] == 1
+        assert stats["flush_lag_seconds"] >= 0
+    finally:
+        await last_login_buffer.stop()
+
+    # Al detenerse se escribe lo pendiente
+    assert await stored_last_login(test_engine, user.id) == when
+    assert last_login_buffer.stats()["pending"] == 0
+    assert last_login_buffer.stats()["flushed_rows"] >= 1
+
+@pytest.mark.asyncio
+async def test_full_buffer_flushes_before_interval(test_db, test_engine):
+    """Test al llegar al máximo de pendientes se escribe sin esperar al intervalo"""
+    repository = UserRepository(test_db)
+    users = [
+        await repository.create(UserCreate(
+            email=f"batch{i}@example.com", username=f"batch{i}",
+            first_name="Batch", last_name="User",
+            password="Password123", confirm_password="Password123"
+        ))
+        for i in range(3)
+    ]
+    buffer = LastLoginBuffer(max_pending=3, flush_interval=3600)
+    when = datetime.utcnow()
+
+    buffer.start()
+    try:
+        for user in users:
+            buffer.record(test_engine, user.id, when)
+        for _ in range(50):
+            if buffer.flushed_rows == 3:
+                break
+            await asyncio.sleep(0.01)
+        assert buffer.flushes == 1
+        assert buffer.flushed_rows == 3
+    finally:
+        await buffer.stop()
+
+    for user in users:
+        assert await stored_last_login(test_engine, user.id) == when
+
+@pytest.mark.asyncio
+async def test_failing_database_backs_off():
+    """Test con la base de datos caída se conservan las filas y se reintenta cada vez más tarde"""
+    class LockedEngine:
+        def begin(self):
+            raise RuntimeError("database is locked")
+
+    engine = LockedEngine()
+    buffer = LastLoginBuffer(max_pending=1, flush_interval=0.05, max_backoff=0.2)
+    buffer.start()
+    try:
+        buffer.record(engine, 1, datetime.utcnow())
+        await asyncio.sleep(0.4)
+        # Sin espera serían miles de intentos: 0.05 + 0.1 + 0.2 + 0.2 ...
+        assert 1 <= buffer.errors <= 5
+        assert buffer.stats()["pending"] == 1
+        assert buffer.stats()["retry_backoff_seconds"] == 0.2
+    finally:
+        await buffer.stop()